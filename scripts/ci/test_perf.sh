@@ -18,3 +18,8 @@ pip freeze
 echo '=== Test Module Loading Performance'
 unset AZURE_CLI_DIAGNOSTICS_TELEMETRY
 azdev verify module-load-perf
+
+echo '=== Benchmark CLI Hot Paths'
+# the baseline wasn't recorded on the CI runners, whose timings vary from run to run, so regressions are only
+# reported. The build still fails if a benchmark breaks.
+python ./scripts/performance/benchmark.py --compare --report-only
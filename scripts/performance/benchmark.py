@@ -0,0 +1,321 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""Offline benchmarks of the CLI hot paths.
+
+Runs in-process against the recordings of the scenario tests, so no live installation, credentials or network access
+is needed. Timings are stored relative to a fixed calibration workload, which keeps a baseline recorded on one machine
+usable on another.
+
+    python scripts/performance/benchmark.py                    # run all benchmarks
+    python scripts/performance/benchmark.py -k format          # run the benchmarks whose name contains 'format'
+    python scripts/performance/benchmark.py --save-baseline    # store the results as the baseline
+    python scripts/performance/benchmark.py --compare          # exit with 1 if a benchmark regressed
+    python scripts/performance/benchmark.py --compare --report-only    # only report the regressions, as CI does
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from collections import OrderedDict
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_THRESHOLD = 0.5
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name, rounds=20):
+    """Registers a benchmark. The function receives a Benchmark and calls its measure() with the code to time."""
+    def _decorator(func):
+        BENCHMARKS[name] = (func, rounds)
+        return func
+    return _decorator
+
+
+class Benchmark(object):
+
+    def __init__(self, name, rounds):
+        self.name = name
+        self.rounds = rounds
+        self.timings = []
+
+    def measure(self, func, setup=None, teardown=None, warmup=1):
+        """Times func(state) over the rounds, where state is what setup() returns. Only func is timed."""
+        for i in range(warmup + self.rounds):
+            state = setup() if setup else None
+            try:
+                start = timeit.default_timer()
+                func(state)
+                elapsed = timeit.default_timer() - start
+            finally:
+                if teardown:
+                    teardown(state)
+            if i >= warmup:
+                self.timings.append(elapsed)
+
+    @property
+    def stats(self):
+        timings = sorted(self.timings)
+        middle = len(timings) // 2
+        median = timings[middle] if len(timings) % 2 else (timings[middle - 1] + timings[middle]) / 2.0
+        return OrderedDict([('min', timings[0]), ('median', median), ('max', timings[-1]),
+                            ('rounds', len(timings))])
+
+
+# region data shared by the benchmarks
+
+def _get_invocation(command_string=''):
+    """An invocation with nothing loaded yet, as at the start of AzCliCommandInvoker.execute()."""
+    from azure.cli.core import MainCommandsLoader
+    from azure.cli.core.commands import AzCliCommandInvoker
+    from azure.cli.core.mock import DummyCli
+    from azure.cli.core.parser import AzCliCommandParser
+    from azure.cli.core._help import AzCliHelp
+    cli = DummyCli()
+    cli.invocation = AzCliCommandInvoker(cli_ctx=cli, parser_cls=AzCliCommandParser,
+                                         commands_loader_cls=MainCommandsLoader, help_cls=AzCliHelp)
+    cli.invocation.data['command_string'] = command_string
+    return cli.invocation
+
+
+def _get_resources(count=2000):
+    """A `resource list` like result, as SDK models."""
+    from azure.mgmt.resource.resources.models import GenericResource
+    locations = ['westus', 'eastus', 'westeurope', 'southeastasia']
+    return [GenericResource(location=locations[i % len(locations)],
+                            tags={'env': 'test', 'owner': 'user{}'.format(i % 7)},
+                            kind='StorageV2' if i % 3 else None)
+            for i in range(count)]
+
+
+def _get_result(count=2000):
+    from knack.util import todict
+    result = todict(_get_resources(count))
+    for i, item in enumerate(result):
+        item['id'] = '/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/rg{}/providers/' \
+                     'Microsoft.Storage/storageAccounts/account{}'.format(i % 10, i)
+        item['name'] = 'account{}'.format(i)
+        item['type'] = 'Microsoft.Storage/storageAccounts'
+    return result
+
+
+def _get_recording(module, recording_name):
+    return os.path.join(REPO_ROOT, 'src', 'command_modules', 'azure-cli-{}'.format(module), 'azure', 'cli',
+                        'command_modules', module, 'tests', 'latest', 'recordings', '{}.yaml'.format(recording_name))
+
+
+def _replay(bench, module, recording_name, command):
+    """Runs a command through the in-process ScenarioTest path, replaying the recording of a scenario test."""
+    from azure.cli.testsdk import ScenarioTest
+
+    recording_file = _get_recording(module, recording_name)
+    if not os.path.isfile(recording_file):
+        raise ValueError('Recording {} not found.'.format(recording_file))
+
+    class ReplayBenchmark(ScenarioTest):
+
+        def __init__(self):
+            super(ReplayBenchmark, self).__init__('run_command')
+            if self.is_live:
+                raise ValueError('Benchmarks only replay recordings. Unset the live test mode.')
+            self.recording_file = recording_file
+            self.in_recording = False
+
+        def run_command(self):
+            self.cmd(command)
+
+    def _setup():
+        test = ReplayBenchmark()
+        test.setUp()
+        return test
+
+    def _teardown(test):
+        test.doCleanups()
+        test.tearDown()
+
+    bench.measure(lambda test: test.run_command(), setup=_setup, teardown=_teardown)
+
+# endregion
+
+
+@benchmark('calibration')
+def calibration(bench):
+    """A fixed workload the other timings are expressed relative to."""
+    data = [{'name': 'item{}'.format(i), 'value': i, 'tags': {'a': str(i)}} for i in range(2000)]
+
+    def _run(_):
+        json.loads(json.dumps(data))
+        sum(i * i for i in range(200000))
+    bench.measure(_run)
+
+
+@benchmark('command_table_load_modules', rounds=10)
+def command_table_load_modules(bench):
+    """Loads the command tables of a fixed set of modules, so the result doesn't depend on what else is installed."""
+    from azure.cli.core.commands import _load_module_command_loader
+
+    def _load(invocation):
+        for mod in ['resource', 'storage', 'vm']:
+            _load_module_command_loader(invocation.commands_loader, None, mod)
+    bench.measure(_load, setup=_get_invocation)
+
+
+@benchmark('command_table_load_vm')
+def command_table_load_vm(bench):
+    bench.measure(lambda invocation: invocation.commands_loader.load_command_table(['vm', 'list']),
+                  setup=_get_invocation)
+
+
+@benchmark('parse_vm_create')
+def parse_vm_create(bench):
+    """Loads the arguments of a command, builds the parser and parses the command line, as the invoker does."""
+    args = ['vm', 'create', '-g', 'rg', '-n', 'vm1', '--image', 'UbuntuLTS', '--admin-username', 'azureuser',
+            '--generate-ssh-keys', '--size', 'Standard_DS1_v2', '--tags', 'env=test']
+
+    def _setup():
+        invocation = _get_invocation('vm create')
+        loader = invocation.commands_loader
+        loader.load_command_table(args)
+        loader.command_table = {'vm create': loader.command_table['vm create']}
+        return invocation
+
+    def _parse(invocation):
+        invocation.commands_loader.load_arguments('vm create')
+        invocation.parser.cli_ctx = invocation.cli_ctx
+        invocation.parser.load_command_table(invocation.commands_loader)
+        invocation.parser.parse_args(args)
+    bench.measure(_parse, setup=_setup)
+
+
+@benchmark('todict')
+def todict_resources(bench):
+    from knack.util import todict
+    from azure.cli.core.commands import AzCliCommandInvoker
+    resources = _get_resources()
+    bench.measure(lambda _: todict(resources, AzCliCommandInvoker.remove_additional_prop_layer))
+
+
+@benchmark('jmespath_query')
+def jmespath_query(bench):
+    from collections import OrderedDict as _OrderedDict
+    from jmespath import compile as compile_jmespath, Options
+    result = _get_result()
+
+    def _query(_):
+        # --query is compiled once when the arguments are parsed and then applied to the result
+        query = compile_jmespath("[?location=='westus' && tags.env=='test'].{name:name, id:id, kind:kind}")
+        query.search(result, Options(_OrderedDict))
+    bench.measure(_query)
+
+
+@benchmark('format_table')
+def format_table(bench):
+    from knack.output import format_table as _format_table
+    from knack.util import CommandResultItem
+    result = _get_result()
+    bench.measure(lambda _: _format_table(CommandResultItem(result, table_transformer=None, is_query_active=False)))
+
+
+@benchmark('format_tsv')
+def format_tsv(bench):
+    from knack.output import format_tsv as _format_tsv
+    from knack.util import CommandResultItem
+    result = _get_result()
+    bench.measure(lambda _: _format_tsv(CommandResultItem(result)))
+
+
+@benchmark('replay_feature_list_table', rounds=10)
+def replay_feature_list_table(bench):
+    _replay(bench, 'resource', 'test_feature_list', 'feature list -o table')
+
+
+@benchmark('replay_vm_list_usage_query', rounds=10)
+def replay_vm_list_usage_query(bench):
+    _replay(bench, 'vm', 'test_vm_usage',
+            'vm list-usage --location westus --query "[].[name.value, currentValue, limit]" -o tsv')
+
+
+def run_benchmarks(name_filter=None):
+    results = OrderedDict()
+    for name, (func, rounds) in BENCHMARKS.items():
+        if name != 'calibration' and name_filter and name_filter not in name:
+            continue
+        bench = Benchmark(name, rounds)
+        func(bench)
+        results[name] = bench.stats
+    calibration_median = results['calibration']['median']
+    for stats in results.values():
+        stats['normalized'] = stats['median'] / calibration_median
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns the names of the benchmarks whose normalized median regressed by more than threshold."""
+    regressions = []
+    for name, stats in results.items():
+        expected = baseline['benchmarks'].get(name, {}).get('normalized')
+        if name == 'calibration' or expected is None:
+            continue
+        change = stats['normalized'] / expected - 1
+        stats['change'] = change
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def print_results(results):
+    print('{:<40} {:>12} {:>12} {:>12} {:>10}'.format('benchmark', 'median (ms)', 'min (ms)', 'normalized', 'change'))
+    for name, stats in results.items():
+        change = '{:+.1%}'.format(stats['change']) if 'change' in stats else ''
+        print('{:<40} {:>12.3f} {:>12.3f} {:>12.3f} {:>10}'.format(
+            name, stats['median'] * 1000, stats['min'] * 1000, stats['normalized'], change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmarks of the CLI hot paths.')
+    parser.add_argument('-k', dest='name_filter', help='Only run the benchmarks whose name contains this string.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file. Default: %(default)s')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the baseline.')
+    parser.add_argument('--compare', action='store_true',
+                        help='Compare against the baseline and exit with 1 if a benchmark regressed.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Relative slowdown of the normalized median counted as a regression. '
+                             'Default: %(default)s')
+    parser.add_argument('--report-only', action='store_true',
+                        help='Report the regressions found by --compare without exiting with 1.')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.name_filter)
+    regressions = []
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+    print_results(results)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(OrderedDict([('python', platform.python_version()),
+                                   ('benchmarks', OrderedDict((name, {'normalized': round(stats['normalized'], 4)})
+                                                              for name, stats in results.items()))]),
+                      f, indent=2)
+            f.write('\n')
+        print('Baseline stored in {}'.format(args.baseline))
+
+    if regressions:
+        print('Regressed by more than {:.0%}: {}'.format(args.threshold, ', '.join(regressions)), file=sys.stderr)
+        return 0 if args.report_only else 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,7 +3,10 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import json
+import os
 import sys
+import tempfile
 from subprocess import check_output, STDOUT, CalledProcessError
 
 def mean(data):
@@ -53,8 +56,37 @@ def scenario(command, loop=10):
     print('Syst: mean => {} \t pstdev => {}'.format(mean(syst), pstdev(syst)))
     print('')
 
+def phases(command, loop=10):
+    """Breaks the time of a command down into the phases recorded by --profile-startup."""
+    totals = {}
+    fd, profile_path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        for _ in range(loop):
+            try:
+                # the flag goes before the command words, e.g. 'az --profile-startup PATH vm list'
+                program, _, arguments = command.partition(' ')
+                check_output(['{} --profile-startup {} {}'.format(program, profile_path, arguments)], shell=True,
+                             stderr=STDOUT)
+            except CalledProcessError:
+                pass
+            with open(profile_path) as f:
+                profile = json.load(f)
+            for category, duration in list(profile['categories'].items()) + [('total', profile['duration'])]:
+                totals.setdefault(category, []).append(duration)
+    finally:
+        os.remove(profile_path)
+
+    print('Command: {}'.format(command))
+    for category, durations in sorted(totals.items()):
+        print('{}: mean => {:.3f} \t pstdev => {:.3f}'.format(category, mean(durations), pstdev(durations)))
+    print('')
+
 scenario('az')
 scenario('az cl')
 scenario('az cloud')
 scenario('az cloud list')
 scenario('az cloud show --this-does-not-exist')
+
+phases('az cloud list')
+phases('az cloud show --this-does-not-exist')
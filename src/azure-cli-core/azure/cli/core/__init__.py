@@ -37,7 +37,7 @@ class AzCli(CLI):
             register_ids_argument, register_global_subscription_argument)
         from azure.cli.core.cloud import get_active_cloud
         from azure.cli.core.commands.transform import register_global_transforms
-        from azure.cli.core._session import ACCOUNT, CONFIG, SESSION
+        from azure.cli.core._session import ACCOUNT, CONFIG, SESSION, INDEX
 
         from knack.util import ensure_dir
 
@@ -52,6 +52,7 @@ class AzCli(CLI):
         ACCOUNT.load(os.path.join(azure_folder, 'azureProfile.json'))
         CONFIG.load(os.path.join(azure_folder, 'az.json'))
         SESSION.load(os.path.join(azure_folder, 'az.sess'), max_age=3600)
+        INDEX.load(os.path.join(azure_folder, 'commandIndex.json'))
         self.cloud = get_active_cloud(self)
         logger.debug('Current cloud config:\n%s', str(self.cloud.name))
 
@@ -103,6 +104,8 @@ class MainCommandsLoader(CLICommandsLoader):
         super(MainCommandsLoader, self).__init__(cli_ctx)
         self.cmd_to_loader_map = {}
         self.loaders = []
+        # whether the last command table only has the commands of the modules the command index pointed at
+        self.loaded_from_command_index = False
 
     def _update_command_definitions(self):
         for cmd_name in self.command_table:
@@ -111,7 +114,7 @@ class MainCommandsLoader(CLICommandsLoader):
                 loader.command_table = self.command_table
                 loader._update_command_definitions()  # pylint: disable=protected-access
 
-    # pylint: disable=too-many-statements
+    # pylint: disable=too-many-statements,too-many-locals
     def load_command_table(self, args):
         from importlib import import_module
         import pkgutil
@@ -121,11 +124,7 @@ class MainCommandsLoader(CLICommandsLoader):
         from azure.cli.core.extension import (
             get_extensions, get_extension_path, get_extension_modname)
 
-        def _update_command_table_from_modules(args):
-            '''Loads command table(s)
-            When `module_name` is specified, only commands from that module will be loaded.
-            If the module is not found, all commands are loaded.
-            '''
+        def _get_installed_command_modules():
             installed_command_modules = []
             try:
                 mods_ns_pkg = import_module('azure.cli.command_modules')
@@ -134,15 +133,21 @@ class MainCommandsLoader(CLICommandsLoader):
                                              if modname not in BLACKLISTED_MODS]
             except ImportError as e:
                 logger.warning(e)
-
             logger.debug('Installed command modules %s', installed_command_modules)
+            return installed_command_modules
+
+        def _update_command_table_from_modules(args, command_modules):
+            '''Loads command table(s)
+            Only the commands from the given `command_modules` are loaded.
+            '''
             cumulative_elapsed_time = 0
-            for mod in [m for m in installed_command_modules if m not in BLACKLISTED_MODS]:
+            for mod in [m for m in command_modules if m not in BLACKLISTED_MODS]:
                 try:
                     start_time = timeit.default_timer()
                     module_command_table, module_group_table = _load_module_command_loader(self, args, mod)
                     for cmd in module_command_table.values():
                         cmd.command_source = mod
+                    module_command_tables[mod] = module_command_table
                     self.command_table.update(module_command_table)
                     self.command_group_table.update(module_group_table)
                     elapsed_time = timeit.default_timer() - start_time
@@ -160,7 +165,7 @@ class MainCommandsLoader(CLICommandsLoader):
                          "(note: there's always an overhead with the first module loaded)",
                          cumulative_elapsed_time)
 
-        def _update_command_table_from_extensions(ext_suppressions):
+        def _update_command_table_from_extensions(ext_suppressions, extension_names=None):
 
             def _handle_extension_suppressions(extensions):
                 filtered_extensions = []
@@ -174,6 +179,8 @@ class MainCommandsLoader(CLICommandsLoader):
                 return filtered_extensions
 
             extensions = get_extensions()
+            if extension_names is not None:
+                extensions = [ext for ext in extensions if ext.name in extension_names]
             if extensions:
                 logger.debug("Found %s extensions: %s", len(extensions), [e.name for e in extensions])
                 allowed_extensions = _handle_extension_suppressions(extensions)
@@ -197,6 +204,7 @@ class MainCommandsLoader(CLICommandsLoader):
                                 overrides_command=cmd_name in module_commands,
                                 preview=ext.preview)
 
+                        extension_command_tables[ext_name] = extension_command_table
                         self.command_table.update(extension_command_table)
                         self.command_group_table.update(extension_group_table)
                         elapsed_time = timeit.default_timer() - start_time
@@ -235,7 +243,45 @@ class MainCommandsLoader(CLICommandsLoader):
                             res.append(sup)
             return res
 
-        _update_command_table_from_modules(args)
+        def _reset_command_table():
+            self.command_table = {}
+            self.command_group_table = {}
+            self.cmd_to_loader_map = {}
+            self.loaders = []
+            module_command_tables.clear()
+            extension_command_tables.clear()
+
+        def _load_from_command_index(command_index):
+            index_result = command_index.get(args)
+            if not index_result:
+                return False
+            index_modules, index_extensions = index_result
+            _update_command_table_from_modules(args, index_modules)
+            try:
+                _update_command_table_from_extensions(_get_extension_suppressions(self.loaders),
+                                                      extension_names=index_extensions)
+            except Exception:  # pylint: disable=broad-except
+                logger.warning("Unable to load extensions. Use --debug for more information.")
+                logger.debug(traceback.format_exc())
+            if command_index.is_hit(args, self.command_table):
+                return True
+            # The index pointed at modules that no longer provide the command. Fall back to a full load.
+            logger.debug("Command index is stale for '%s'. Loading all command modules.", args[0])
+            _reset_command_table()
+            return False
+
+        module_command_tables = {}
+        extension_command_tables = {}
+        installed_command_modules = _get_installed_command_modules()
+        command_index = None
+        self.loaded_from_command_index = False
+        if self.cli_ctx.config.getboolean('core', 'use_command_index', fallback=True):
+            command_index = CommandIndex(self.cli_ctx, installed_command_modules)
+            if _load_from_command_index(command_index):
+                self.loaded_from_command_index = True
+                return self.command_table
+
+        _update_command_table_from_modules(args, installed_command_modules)
         try:
             ext_suppressions = _get_extension_suppressions(self.loaders)
             # We always load extensions even if the appropriate module has been loaded
@@ -245,6 +291,9 @@ class MainCommandsLoader(CLICommandsLoader):
             logger.warning("Unable to load extensions. Use --debug for more information.")
             logger.debug(traceback.format_exc())
 
+        if command_index:
+            command_index.update(module_command_tables, extension_command_tables)
+
         return self.command_table
 
     def load_arguments(self, command):
@@ -270,6 +319,83 @@ class MainCommandsLoader(CLICommandsLoader):
                 loader._update_command_definitions()  # pylint: disable=protected-access
 
 
+class CommandIndex(object):
+    """ Persisted mapping of top-level command names to the command modules and extensions providing them.
+
+    The index is stored in the config directory and is only trusted while the CLI version, the cloud profile and the
+    set of installed command modules and extensions are the same as when it was built.
+    """
+
+    _COMMAND_INDEX = 'commandIndex'
+    _COMMAND_INDEX_SIGNATURE = 'signature'
+
+    def __init__(self, cli_ctx, installed_command_modules):
+        from azure.cli.core._session import INDEX
+        self.INDEX = INDEX
+        self.cli_ctx = cli_ctx
+        self.installed_command_modules = installed_command_modules
+        self._signature = None
+
+    @property
+    def signature(self):
+        if self._signature is None:
+            from azure.cli.core.extension import get_extensions
+            try:
+                extensions = sorted('{}=={}'.format(ext.name, getattr(ext, 'version', None))
+                                    for ext in get_extensions())
+            except Exception:  # pylint: disable=broad-except
+                extensions = []
+            cloud = getattr(self.cli_ctx, 'cloud', None)
+            self._signature = {
+                'version': __version__,
+                'cloudProfile': cloud.profile if cloud else None,
+                'modules': sorted(self.installed_command_modules),
+                'extensions': extensions
+            }
+        return self._signature
+
+    def get(self, args):
+        """ Returns the (command modules, extension names) providing the top-level command in `args`, or None
+        if the index cannot be used for this invocation. """
+        # `az`, `az --help`, `az --version` and tab completion all need the complete command table.
+        if not args or args[0].startswith('-'):
+            return None
+        if self.INDEX.get(self._COMMAND_INDEX_SIGNATURE) != self.signature:
+            logger.debug("Command index is missing or out of date.")
+            return None
+        entry = self.INDEX.get(self._COMMAND_INDEX, {}).get(args[0])
+        if not entry:
+            logger.debug("Command '%s' not found in the command index.", args[0])
+            return None
+        logger.debug("Command index found modules %s and extensions %s for '%s'.",
+                     entry['modules'], entry['extensions'], args[0])
+        return entry['modules'], entry['extensions']
+
+    @staticmethod
+    def is_hit(args, command_table):
+        return any(cmd_name.split()[0] == args[0] for cmd_name in command_table)
+
+    def update(self, module_command_tables, extension_command_tables):
+        start_time = timeit.default_timer()
+        index = {}
+        for source_type, command_tables in (('modules', module_command_tables),
+                                            ('extensions', extension_command_tables)):
+            for source_name, command_table in command_tables.items():
+                for top_command in {cmd_name.split()[0] for cmd_name in command_table}:
+                    entry = index.setdefault(top_command, {'modules': [], 'extensions': []})
+                    entry[source_type].append(source_name)
+        for entry in index.values():
+            entry['modules'].sort()
+            entry['extensions'].sort()
+        self.INDEX.data[self._COMMAND_INDEX_SIGNATURE] = self.signature
+        self.INDEX.data[self._COMMAND_INDEX] = index
+        try:
+            self.INDEX.save_with_retry()
+        except (OSError, IOError):
+            logger.debug("Unable to save the command index.")
+        logger.debug("Updated command index in %.3f seconds.", timeit.default_timer() - start_time)
+
+
 class ModExtensionSuppress(object):  # pylint: disable=too-few-public-methods
 
     def __init__(self, mod_name, suppress_extension_name, suppress_up_to_version, reason=None, recommend_remove=False,
@@ -5,6 +5,10 @@
 
 from __future__ import print_function
 import argparse
+import hashlib
+import os
+
+import six
 from knack.help import (HelpFile as KnackHelpFile, CommandHelpFile as KnackCommandHelpFile,
                         GroupHelpFile as KnackGroupHelpFile, ArgumentGroupRegistry as KnackArgumentGroupRegistry,
                         HelpExample as KnackHelpExample, HelpParameter as KnackHelpParameter,
@@ -137,8 +141,17 @@ class AzCliHelp(CLIPrintMixin, CLIHelp):
 
         HelpObject._normalize_text = new_normalize_text  # pylint: disable=protected-access
 
+        self.help_cache = HelpCache(cli_ctx)
         self._register_help_loaders()
 
+    def show_help(self, cli_name, nouns, parser, is_group):
+        super(AzCliHelp, self).show_help(cli_name, nouns, parser, is_group)
+        self.help_cache.save()
+
+    def show_welcome(self, parser):
+        super(AzCliHelp, self).show_welcome(parser)
+        self.help_cache.save()
+
     def _register_help_loaders(self):
         import azure.cli.core._help_loaders as help_loaders
         import inspect
@@ -158,6 +171,70 @@ class AzCliHelp(CLIPrintMixin, CLIHelp):
         self.versioned_loaders = versioned_loaders
 
 
+class HelpCache(object):
+    """ Parsed help YAML of commands and groups, kept in the config directory so that showing help doesn't parse the
+    same YAML on every invocation.
+
+    Each entry keeps a hash of the YAML it was parsed from and is parsed again when that changes, e.g. after a command
+    module or extension was updated. The whole cache is dropped when the CLI version changes.
+    """
+
+    _HELP = 'help'
+    _HELP_SIGNATURE = 'signature'
+
+    def __init__(self, cli_ctx):
+        self.cli_ctx = cli_ctx
+        self._store = None
+        self._changed = False
+
+    @property
+    def enabled(self):
+        return self.cli_ctx.config.getboolean('core', 'use_help_cache', fallback=True)
+
+    def _get_store(self):
+        if self._store is None:
+            from azure.cli.core import __version__
+            from azure.cli.core._session import HELP
+            if HELP.filename is None:
+                HELP.load(os.path.join(self.cli_ctx.config.config_dir, 'helpCache.json'))
+            if HELP.get(self._HELP_SIGNATURE) != __version__:
+                HELP.data = {self._HELP_SIGNATURE: __version__, self._HELP: {}}
+                self._changed = True
+            self._store = HELP
+        return self._store
+
+    def load(self, delimiters, text):
+        """ Returns the parsed help YAML `text` of the command or group `delimiters`. """
+        import json
+        import yaml
+
+        if not text:
+            return None
+        if not self.enabled:
+            return yaml.load(text)
+
+        text_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
+        entries = self._get_store()[self._HELP]
+        entry = entries.get(delimiters)
+        if entry and entry['hash'] == text_hash:
+            return entry['data']
+
+        # dates, like the min_profile of examples, are stored as strings as they are used
+        data = json.loads(json.dumps(yaml.load(text), default=str))
+        entries[delimiters] = {'hash': text_hash, 'data': data}
+        self._changed = True
+        return data
+
+    def save(self):
+        if not self._changed:
+            return
+        try:
+            self._store.save_with_retry()
+            self._changed = False
+        except (OSError, IOError):
+            logger.debug("Unable to save the help cache.")
+
+
 class CliHelpFile(KnackHelpFile):
 
     def __init__(self, help_ctx, delimiters):
@@ -165,6 +242,12 @@ class CliHelpFile(KnackHelpFile):
         super(CliHelpFile, self).__init__(help_ctx, delimiters)
         self.links = []
 
+    def _load_from_file(self):
+        from knack.help_files import helps
+        file_data = self.help_ctx.help_cache.load(self.delimiters, helps.get(self.delimiters))
+        if file_data:
+            self._load_from_data(file_data)
+
     def _should_include_example(self, ex):
         min_profile = ex.get('min_profile')
         max_profile = ex.get('max_profile')
@@ -182,7 +265,7 @@ class CliHelpFile(KnackHelpFile):
         if not data:
             return
 
-        if isinstance(data, str):
+        if isinstance(data, six.string_types):
             self.long_summary = data
             return
 
@@ -216,6 +299,8 @@ class CliGroupHelpFile(KnackGroupHelpFile, CliHelpFile):
 class CliCommandHelpFile(KnackCommandHelpFile, CliHelpFile):
 
     def __init__(self, help_ctx, delimiters, parser):
+        if hasattr(parser, 'load_pending_arguments'):
+            parser.load_pending_arguments()
         super(CliCommandHelpFile, self).__init__(help_ctx, delimiters, parser)
         self.type = 'command'
         self.command_source = getattr(parser, 'command_source', None)
@@ -248,7 +333,7 @@ class CliCommandHelpFile(KnackCommandHelpFile, CliHelpFile):
     def _load_from_data(self, data):
         super(CliCommandHelpFile, self)._load_from_data(data)
 
-        if isinstance(data, str) or not self.parameters or not data.get('parameters'):
+        if isinstance(data, six.string_types) or not self.parameters or not data.get('parameters'):
             return
 
         loaded_params = []
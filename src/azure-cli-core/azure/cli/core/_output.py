@@ -27,6 +27,11 @@ class AzOutputProducer(knack.output.OutputProducer):
     def check_valid_format_type(self, format_type):
         return format_type in self._FORMAT_DICT
 
+    def out(self, obj, formatter=None, out_file=None):
+        from azure.cli.core.profiler import profile
+        with profile('format output', 'output'):
+            super(AzOutputProducer, self).out(obj, formatter=formatter, out_file=out_file)
+
 
 def get_output_format(cli_ctx):
     return cli_ctx.invocation.data.get("output", None)
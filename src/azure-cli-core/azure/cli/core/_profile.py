@@ -12,6 +12,7 @@ import os
 import os.path
 import re
 import string
+import threading
 from copy import deepcopy
 from enum import Enum
 from six.moves import BaseHTTPServer
@@ -72,9 +73,34 @@ _ASSIGNED_IDENTITY_INFO = 'assignedIdentityInfo'
 
 _AZ_LOGIN_MESSAGE = "Please run 'az login' to setup account."
 
+_SERVICE_PRINCIPAL_TOKEN_FILE_NAME = 'servicePrincipalAccessTokens.json'
+_TOKEN_ENTRY_RESOURCE = 'resource'
+_TOKEN_ENTRY_EXPIRES_ON = 'expiresOn'
+# Cached service principal tokens are refreshed this many seconds before they expire
+_SERVICE_PRINCIPAL_TOKEN_EXPIRATION_BUFFER = 300
+
+_PROFILE_LOCK = threading.Lock()
+
+
+def get_profile(cli_ctx):
+    """ Get the Profile shared by all clients and commands running on behalf of `cli_ctx`.
+
+    The profile is created once per CLI context, so the account and token files are only parsed once and the
+    credential objects it hands out share one token cache.
+    """
+    profile = getattr(cli_ctx, '_shared_profile', None)
+    if isinstance(profile, Profile):
+        return profile
+    with _PROFILE_LOCK:
+        profile = getattr(cli_ctx, '_shared_profile', None)
+        if not isinstance(profile, Profile):
+            profile = Profile(cli_ctx=cli_ctx)
+            setattr(cli_ctx, '_shared_profile', profile)
+    return profile
+
 
 def load_subscriptions(cli_ctx, all_clouds=False, refresh=False):
-    profile = Profile(cli_ctx=cli_ctx)
+    profile = get_profile(cli_ctx)
     if refresh:
         profile.refresh_accounts()
     subscriptions = profile.load_cached_subscriptions(all_clouds)
@@ -111,6 +137,22 @@ def _load_tokens_from_file(file_path):
     return []
 
 
+def _save_file_with_secure_permission(file_path, content):
+    with os.fdopen(os.open(file_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600), 'w+') as cred_file:
+        cred_file.write(content)
+
+
+def _is_token_entry_valid(token_entry, buffer_seconds=_SERVICE_PRINCIPAL_TOKEN_EXPIRATION_BUFFER):
+    import datetime
+    import dateutil.parser
+    try:
+        expires_on = dateutil.parser.parse(token_entry[_TOKEN_ENTRY_EXPIRES_ON])
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return False
+    now = datetime.datetime.now(expires_on.tzinfo) if expires_on.tzinfo else datetime.datetime.now()
+    return expires_on - datetime.timedelta(seconds=buffer_seconds) > now
+
+
 def _delete_file(file_path):
     try:
         os.remove(file_path)
@@ -159,6 +201,8 @@ class Profile(object):
         self._ad_resource_uri = self.cli_ctx.cloud.endpoints.active_directory_resource_id
         self._ad = self.cli_ctx.cloud.endpoints.active_directory
         self._msi_creds = None
+        self._login_credentials = {}
+        self._login_credentials_source = None
 
     def find_subscriptions_on_login(self,
                                     interactive,
@@ -508,10 +552,25 @@ class Profile(object):
         return None, None
 
     def get_login_credentials(self, resource=None, subscription_id=None, aux_subscriptions=None):
+        # The credential objects retrieve their tokens lazily through the shared creds cache, so the same object can
+        # be handed to every client that targets the same subscription and resource.
+        resource = resource or self.cli_ctx.cloud.endpoints.active_directory_resource_id
+        # every change to the accounts replaces the persisted subscription list, which makes the memo stale
+        subscriptions = self._storage.get(_SUBSCRIPTIONS)
+        if subscriptions is not self._login_credentials_source:
+            self._login_credentials = {}
+            self._login_credentials_source = subscriptions
+        key = (resource, subscription_id, tuple(aux_subscriptions or []))
+        login_credentials = self._login_credentials.get(key)
+        if login_credentials is None:
+            login_credentials = self._get_login_credentials(resource, subscription_id, aux_subscriptions)
+            self._login_credentials[key] = login_credentials
+        return login_credentials
+
+    def _get_login_credentials(self, resource, subscription_id, aux_subscriptions):
         account = self.get_subscription(subscription_id)
         user_type = account[_USER_ENTITY][_USER_TYPE]
         username_or_sp_id = account[_USER_ENTITY][_USER_NAME]
-        resource = resource or self.cli_ctx.cloud.endpoints.active_directory_resource_id
 
         identity_type, identity_id = Profile._try_parse_msi_account_name(account)
 
@@ -866,10 +925,14 @@ class CredsCache(object):
         # AZURE_ACCESS_TOKEN_FILE is used by Cloud Console and not meant to be user configured
         self._token_file = (os.environ.get('AZURE_ACCESS_TOKEN_FILE', None) or
                             os.path.join(get_config_dir(), 'accessTokens.json'))
+        self._sp_token_file = os.path.join(os.path.dirname(self._token_file), _SERVICE_PRINCIPAL_TOKEN_FILE_NAME)
         self._service_principal_creds = []
         self._auth_ctx_factory = auth_ctx_factory
         self._adal_token_cache_attr = None
+        self._sp_token_cache_attr = None
+        self._sp_token_lock = threading.Lock()
         self._should_flush_to_disk = False
+        self._should_flush_sp_tokens_to_disk = False
         self._async_persist = async_persist
         self._ctx = cli_ctx
         if async_persist:
@@ -882,20 +945,32 @@ class CredsCache(object):
             self.flush_to_disk()
         self.adal_token_cache.has_state_changed = False
 
+    def persist_cached_sp_tokens(self):
+        self._should_flush_sp_tokens_to_disk = True
+        if not self._async_persist:
+            self.flush_to_disk()
+
     def flush_to_disk(self):
         if self._should_flush_to_disk:
-            with os.fdopen(os.open(self._token_file, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600),
-                           'w+') as cred_file:
-                items = self.adal_token_cache.read_items()
-                all_creds = [entry for _, entry in items]
-
-                # trim away useless fields (needed for cred sharing with xplat)
-                for i in all_creds:
-                    for key in TOKEN_FIELDS_EXCLUDED_FROM_PERSISTENCE:
-                        i.pop(key, None)
-
-                all_creds.extend(self._service_principal_creds)
-                cred_file.write(json.dumps(all_creds))
+            items = self.adal_token_cache.read_items()
+            all_creds = [entry for _, entry in items]
+
+            # trim away useless fields (needed for cred sharing with xplat)
+            for i in all_creds:
+                for key in TOKEN_FIELDS_EXCLUDED_FROM_PERSISTENCE:
+                    i.pop(key, None)
+
+            all_creds.extend(self._service_principal_creds)
+            _save_file_with_secure_permission(self._token_file, json.dumps(all_creds))
+        if self._should_flush_sp_tokens_to_disk:
+            with self._sp_token_lock:
+                # expired tokens are of no use to later invocations
+                sp_tokens = [x for x in self.sp_token_cache.values() if _is_token_entry_valid(x, buffer_seconds=0)]
+            try:
+                _save_file_with_secure_permission(self._sp_token_file, json.dumps(sp_tokens))
+                self._should_flush_sp_tokens_to_disk = False
+            except (OSError, IOError) as ex:
+                logger.debug("Failed to persist service principal tokens to '%s': %s", self._sp_token_file, ex)
 
     def retrieve_token_for_user(self, username, tenant, resource):
         context = self._auth_ctx_factory(self._ctx, tenant, cache=self.adal_token_cache)
@@ -915,13 +990,62 @@ class CredsCache(object):
         if not matched:
             raise CLIError("Please run 'az account set' to select active account.")
         cred = matched[0]
-        context = self._auth_ctx_factory(self._ctx, cred[_SERVICE_PRINCIPAL_TENANT], None)
-        sp_auth = ServicePrincipalAuth(cred.get(_ACCESS_TOKEN, None) or
-                                       cred.get(_SERVICE_PRINCIPAL_CERT_FILE, None),
-                                       use_cert_sn_issuer)
-        token_entry = sp_auth.acquire_token(context, resource, sp_id)
+        token_entry = self._get_cached_sp_token(sp_id, tenant, resource)
+        if token_entry is None:
+            context = self._auth_ctx_factory(self._ctx, cred[_SERVICE_PRINCIPAL_TENANT], None)
+            sp_auth = ServicePrincipalAuth(cred.get(_ACCESS_TOKEN, None) or
+                                           cred.get(_SERVICE_PRINCIPAL_CERT_FILE, None),
+                                           use_cert_sn_issuer)
+            token_entry = sp_auth.acquire_token(context, resource, sp_id)
+            self._cache_sp_token(sp_id, tenant, resource, token_entry)
         return (token_entry[_TOKEN_ENTRY_TOKEN_TYPE], token_entry[_ACCESS_TOKEN], token_entry)
 
+    @property
+    def sp_token_cache(self):
+        if self._sp_token_cache_attr is None:
+            self._sp_token_cache_attr = {}
+            entries = []
+            if os.path.isfile(self._sp_token_file):
+                try:
+                    entries = get_file_json(self._sp_token_file, throw_on_empty=False) or []
+                except (CLIError, ValueError) as ex:
+                    # the cached tokens can always be re-acquired, so a corrupted file is simply discarded
+                    logger.debug("Failed to load service principal tokens from '%s': %s", self._sp_token_file, ex)
+            for entry in entries:
+                try:
+                    key = (entry[_SERVICE_PRINCIPAL_ID], entry[_SERVICE_PRINCIPAL_TENANT], entry[_TOKEN_ENTRY_RESOURCE])
+                except (KeyError, TypeError):
+                    continue
+                self._sp_token_cache_attr[key] = entry
+        return self._sp_token_cache_attr
+
+    def _get_cached_sp_token(self, sp_id, tenant, resource):
+        with self._sp_token_lock:
+            token_entry = self.sp_token_cache.get((sp_id, tenant, resource))
+        if token_entry and _is_token_entry_valid(token_entry):
+            logger.debug("Using cached access token of service principal '%s' for resource '%s'", sp_id, resource)
+            return token_entry
+        return None
+
+    def _cache_sp_token(self, sp_id, tenant, resource, token_entry):
+        entry = dict(token_entry)
+        entry.update({
+            _SERVICE_PRINCIPAL_ID: sp_id,
+            _SERVICE_PRINCIPAL_TENANT: tenant,
+            _TOKEN_ENTRY_RESOURCE: resource
+        })
+        with self._sp_token_lock:
+            self.sp_token_cache[(sp_id, tenant, resource)] = entry
+        self.persist_cached_sp_tokens()
+
+    def _remove_cached_sp_tokens(self, sp_id, tenant=None):
+        with self._sp_token_lock:
+            keys = [k for k in self.sp_token_cache if k[0] == sp_id and (tenant is None or k[1] == tenant)]
+            for key in keys:
+                del self.sp_token_cache[key]
+        if keys:
+            self.persist_cached_sp_tokens()
+
     def retrieve_secret_of_service_principal(self, sp_id):
         self.load_adal_token_cache()
         matched = [x for x in self._service_principal_creds if sp_id == x[_SERVICE_PRINCIPAL_ID]]
@@ -955,6 +1079,7 @@ class CredsCache(object):
                     sp_entry.get(_SERVICE_PRINCIPAL_CERT_FILE, None) != matched[0].get(_SERVICE_PRINCIPAL_CERT_FILE, None)):
                 self._service_principal_creds.remove(matched[0])
                 self._service_principal_creds.append(sp_entry)
+                self._remove_cached_sp_tokens(sp_entry[_SERVICE_PRINCIPAL_ID], sp_entry[_SERVICE_PRINCIPAL_TENANT])
                 state_changed = True
         else:
             self._service_principal_creds.append(sp_entry)
@@ -984,6 +1109,7 @@ class CredsCache(object):
             state_changed = True
             self._service_principal_creds = [x for x in self._service_principal_creds
                                              if x not in matched]
+        self._remove_cached_sp_tokens(user_or_sp)
 
         if state_changed:
             self.persist_cached_creds()
@@ -991,6 +1117,11 @@ class CredsCache(object):
     def remove_all_cached_creds(self):
         # we can clear file contents, but deleting it is simpler
         _delete_file(self._token_file)
+        with self._sp_token_lock:
+            self._sp_token_cache_attr = {}
+        self._should_flush_sp_tokens_to_disk = False
+        if os.path.isfile(self._sp_token_file):
+            _delete_file(self._sp_token_file)
 
 
 class ServicePrincipalAuth(object):
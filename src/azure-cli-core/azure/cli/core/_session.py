@@ -104,3 +104,15 @@ CONFIG = Session()
 
 # SESSION provides read-write session variables
 SESSION = Session()
+
+# INDEX contains the command index mapping top-level command names to the modules and extensions providing them
+INDEX = Session()
+
+# PROVIDERS caches the resource types and API versions of resource providers
+PROVIDERS = Session()
+
+# HELP caches the parsed help YAML of commands and groups
+HELP = Session()
+
+# COMPLETION caches the command tree and the values of completers for tab completion
+COMPLETION = Session()
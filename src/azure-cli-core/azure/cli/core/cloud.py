@@ -342,9 +342,9 @@ def set_cloud_subscription(cli_ctx, cloud_name, subscription):
 
 
 def _set_active_subscription(cli_ctx, cloud_name):
-    from azure.cli.core._profile import (Profile, _ENVIRONMENT_NAME, _SUBSCRIPTION_ID,
+    from azure.cli.core._profile import (get_profile, _ENVIRONMENT_NAME, _SUBSCRIPTION_ID,
                                          _STATE, _SUBSCRIPTION_NAME)
-    profile = Profile(cli_ctx=cli_ctx)
+    profile = get_profile(cli_ctx)
     subscription_to_use = get_cloud_subscription(cloud_name) or \
                           next((s[_SUBSCRIPTION_ID] for s in profile.load_cached_subscriptions()  # noqa
                                 if s[_STATE] == 'Enabled'),
@@ -11,6 +11,7 @@ import logging as logs
 import os
 import sys
 import time
+import timeit
 import copy
 from importlib import import_module
 import six
@@ -26,7 +27,8 @@ from knack.events import EVENT_INVOKER_TRANSFORM_RESULT
 # pylint: disable=unused-import
 from azure.cli.core.commands.constants import (
     BLACKLISTED_MODS, DEFAULT_QUERY_TIME_RANGE, CLI_COMMON_KWARGS, CLI_COMMAND_KWARGS, CLI_PARAM_KWARGS,
-    CLI_POSITIONAL_PARAM_KWARGS, CONFIRM_PARAM_NAME)
+    CLI_POSITIONAL_PARAM_KWARGS, CONFIRM_PARAM_NAME, DEFAULT_MAX_CONCURRENT_IDS, DEFAULT_PROGRESS_REPORT_INTERVAL,
+    MAX_PROGRESS_REPORT_INTERVAL)
 from azure.cli.core.commands.parameters import (
     AzArgumentContext, patch_arg_make_required, patch_arg_make_optional)
 from azure.cli.core.extension import get_extension
@@ -200,15 +202,22 @@ class AzCliCommandInvoker(CommandInvoker):
                                   EVENT_INVOKER_POST_PARSE_ARGS,
                                   EVENT_INVOKER_FILTER_RESULT)
         from azure.cli.core.commands.events import EVENT_INVOKER_PRE_CMD_TBL_TRUNCATE
+        from azure.cli.core.profiler import profile
 
         # TODO: Can't simply be invoked as an event because args are transformed
         args = _pre_command_table_create(self.cli_ctx, args)
 
         self.cli_ctx.raise_event(EVENT_INVOKER_PRE_CMD_TBL_CREATE, args=args)
-        self.commands_loader.load_command_table(args)
+        with profile('load command table', 'command_table'):
+            self.commands_loader.load_command_table(args)
         self.cli_ctx.raise_event(EVENT_INVOKER_PRE_CMD_TBL_TRUNCATE,
                                  load_cmd_tbl_func=self.commands_loader.load_command_table, args=args)
         command = self._rudimentary_get_command(args)
+        completion_command_names = None
+        if self.cli_ctx.data.get('completer_active'):
+            from azure.cli.core.completion_cache import get_visible_command_names
+            # taken before the command table is truncated
+            completion_command_names = get_visible_command_names(self.commands_loader)
         self.cli_ctx.invocation.data['command_string'] = command
         telemetry.set_raw_command_name(command)
 
@@ -248,14 +257,22 @@ class AzCliCommandInvoker(CommandInvoker):
 
         self.commands_loader.command_table = self.commands_loader.command_table  # update with the truncated table
         self.commands_loader.command_name = command
-        self.commands_loader.load_arguments(command)
+        with profile('load arguments', 'arguments'):
+            self.commands_loader.load_arguments(command)
         self.cli_ctx.raise_event(EVENT_INVOKER_POST_CMD_TBL_CREATE, commands_loader=self.commands_loader)
         self.parser.cli_ctx = self.cli_ctx
-        self.parser.load_command_table(self.commands_loader)
+        with profile('build parser', 'parser'):
+            self.parser.load_command_table(self.commands_loader)
 
         self.cli_ctx.raise_event(EVENT_INVOKER_CMD_TBL_LOADED, cmd_tbl=self.commands_loader.command_table,
                                  parser=self.parser)
 
+        if completion_command_names is not None:
+            from azure.cli.core.completion_cache import record_completion
+            # with the command index, only the commands of the top-level command being completed are loaded
+            top_command = args[0] if getattr(self.commands_loader, 'loaded_from_command_index', False) else None
+            record_completion(self.cli_ctx, completion_command_names, top_command, self.parser)
+
         arg_check = [a for a in args if a not in ['--debug', '--verbose']]
         if not arg_check:
             self.parser.enable_autocomplete()
@@ -273,7 +290,8 @@ class AzCliCommandInvoker(CommandInvoker):
         self.parser.enable_autocomplete()
 
         self.cli_ctx.raise_event(EVENT_INVOKER_PRE_PARSE_ARGS, args=args)
-        parsed_args = self.parser.parse_args(args)
+        with profile('parse arguments', 'parser'):
+            parsed_args = self.parser.parse_args(args)
         self.cli_ctx.raise_event(EVENT_INVOKER_POST_PARSE_ARGS, command=parsed_args.command, args=parsed_args)
 
         # TODO: This fundamentally alters the way Knack.invocation works here. Cannot be customized
@@ -313,14 +331,16 @@ class AzCliCommandInvoker(CommandInvoker):
             if hasattr(expanded_arg, '_subscription'):
                 cmd_copy.cli_ctx.data['subscription_id'] = expanded_arg._subscription  # pylint: disable=protected-access
 
-            self._validation(expanded_arg)
+            with profile('validate', 'validation'):
+                self._validation(expanded_arg)
             jobs.append((expanded_arg, cmd_copy))
 
         ids = getattr(parsed_args, '_ids', None) or [None] * len(jobs)
-        if self.cli_ctx.config.getboolean('core', 'disable_concurrent_ids', False) or len(ids) < 2:
-            results, exceptions = self._run_jobs_serially(jobs, ids)
-        else:
-            results, exceptions = self._run_jobs_concurrently(jobs, ids)
+        with profile('execute', 'execution'):
+            if self.cli_ctx.config.getboolean('core', 'disable_concurrent_ids', False) or len(ids) < 2:
+                results, exceptions = self._run_jobs_serially(jobs, ids)
+            else:
+                results, exceptions = self._run_jobs_concurrently(jobs, ids)
 
         # handle exceptions
         if len(exceptions) == 1 and not results:
@@ -333,6 +353,12 @@ class AzCliCommandInvoker(CommandInvoker):
                 return CommandResultItem(None, exit_code=1, error=CLIError('Encountered more than one exception.'))
             logger.warning('Encountered more than one exception.')
 
+        exit_code = 0
+        for i, result in enumerate(results):
+            if isinstance(result, CommandResultItem):
+                exit_code = max(exit_code, result.exit_code)
+                results[i] = result.result
+
         if results and len(results) == 1:
             results = results[0]
 
@@ -342,7 +368,8 @@ class AzCliCommandInvoker(CommandInvoker):
         return CommandResultItem(
             event_data['result'],
             table_transformer=self.commands_loader.command_table[parsed_args.command].table_transformer,
-            is_query_active=self.data['query_active'])
+            is_query_active=self.data['query_active'],
+            exit_code=exit_code)
 
     @staticmethod
     def _extract_parameter_names(args):
@@ -354,6 +381,10 @@ class AzCliCommandInvoker(CommandInvoker):
         params = self._filter_params(expanded_arg)
         try:
             result = cmd_copy(params)
+            # a command which failed in part returns what succeeded in a CommandResultItem with its exit code
+            exit_code = 0
+            if isinstance(result, CommandResultItem):
+                result, exit_code = result.result, result.exit_code
             if cmd_copy.supports_no_wait and getattr(expanded_arg, 'no_wait', False):
                 result = None
             elif cmd_copy.no_wait_param and getattr(expanded_arg, cmd_copy.no_wait_param, False):
@@ -371,7 +402,7 @@ class AzCliCommandInvoker(CommandInvoker):
             result = todict(result, AzCliCommandInvoker.remove_additional_prop_layer)
             event_data = {'result': result}
             cmd_copy.cli_ctx.raise_event(EVENT_INVOKER_TRANSFORM_RESULT, event_data=event_data)
-            return event_data['result']
+            return CommandResultItem(event_data['result'], exit_code=exit_code) if exit_code else event_data['result']
         except Exception as ex:  # pylint: disable=broad-except
             if cmd_copy.exception_handler:
                 cmd_copy.exception_handler(ex)
@@ -388,17 +419,30 @@ class AzCliCommandInvoker(CommandInvoker):
                 exceptions.append((ex, id_arg))
         return results, exceptions
 
+    def _run_timed_job(self, expanded_arg, cmd_copy, id_arg):
+        start_time = timeit.default_timer()
+        try:
+            return self._run_job(expanded_arg, cmd_copy)
+        finally:
+            logger.debug("Job for '%s' finished in %.3f seconds.", id_arg, timeit.default_timer() - start_time)
+
+    def _get_max_concurrent_jobs(self, job_count):
+        return min(get_max_concurrent_ids(self.cli_ctx), job_count)
+
     def _run_jobs_concurrently(self, jobs, ids):
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-        tasks, results, exceptions = [], [], []
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            for expanded_arg, cmd_copy in jobs:
-                tasks.append(executor.submit(self._run_job, expanded_arg, cmd_copy))
-            for index, task in enumerate(as_completed(tasks)):
+        from concurrent.futures import ThreadPoolExecutor
+        results, exceptions = [], []
+        max_workers = self._get_max_concurrent_jobs(len(jobs))
+        logger.debug('Running %s jobs with %s workers.', len(jobs), max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            tasks = [executor.submit(self._run_timed_job, expanded_arg, cmd_copy, id_arg)
+                     for (expanded_arg, cmd_copy), id_arg in zip(jobs, ids)]
+            # collect in submission order so results and errors line up with the input IDs
+            for task, id_arg in zip(tasks, ids):
                 try:
                     results.append(task.result())
                 except (Exception, SystemExit) as ex:  # pylint: disable=broad-except
-                    exceptions.append((ex, ids[index]))
+                    exceptions.append((ex, id_arg))
         return results, exceptions
 
     def resolve_warnings(self, cmd, parsed_args):
@@ -492,9 +536,34 @@ class LongRunningOperation(object):  # pylint: disable=too-few-public-methods
         self.poller_done_interval_ms = poller_done_interval_ms
         self.deploy_dict = {}
         self.last_progress_report = datetime.datetime.now()
+        self.progress_report_interval = DEFAULT_PROGRESS_REPORT_INTERVAL
+
+    def _delay(self, poller=None):
+        from msrest.exceptions import ClientException
+        from msrestazure.azure_exceptions import CloudError
+
+        delay = self.poller_done_interval_ms / 1000.0
+        if poller is None or not hasattr(poller, 'wait'):
+            time.sleep(delay)
+            return
+        # the poller polls ARM on its own thread (honoring Retry-After), so wait on it directly and
+        # wake up as soon as the operation finishes instead of sleeping out the full interval
+        try:
+            poller.wait(delay)
+        except (CloudError, ClientException):
+            pass  # the operation failed, raised again by poller.result()
+        except Exception as ex:  # pylint: disable=broad-except
+            # a poller which can't be waited on is still polled, just not more often than the interval
+            logger.debug('Waiting on the long-running operation failed: %s', ex)
+            time.sleep(delay)
 
-    def _delay(self):
-        time.sleep(self.poller_done_interval_ms / 1000.0)
+    @staticmethod
+    def _get_correlation_id(poller):
+        try:
+            # pylint: disable=protected-access
+            return json.loads(poller._response.__dict__['_content'].decode())['properties']['correlationId']
+        except:  # pylint: disable=bare-except
+            return None
 
     def _generate_template_progress(self, correlation_id):  # pylint: disable=no-self-use
         """ gets the progress for template deployments """
@@ -566,33 +635,28 @@ class LongRunningOperation(object):  # pylint: disable=too-few-public-methods
         # https://github.com/azure/azure-cli/issues/3555
         colorama.init()
 
-        correlation_message = ''
         self.cli_ctx.get_progress_controller().begin()
-        correlation_id = None
+        correlation_id = self._get_correlation_id(poller)
+        correlation_message = 'Correlation ID: {}'.format(correlation_id) if correlation_id else ''
 
         cli_logger = get_logger()  # get CLI logger which has the level set through command lines
         is_verbose = any(handler.level <= logs.INFO for handler in cli_logger.handlers)
 
         while not poller.done():
             self.cli_ctx.get_progress_controller().add(message='Running')
-            try:
-                # pylint: disable=protected-access
-                correlation_id = json.loads(
-                    poller._response.__dict__['_content'].decode())['properties']['correlationId']
-
-                correlation_message = 'Correlation ID: {}'.format(correlation_id)
-            except:  # pylint: disable=bare-except
-                pass
 
             current_time = datetime.datetime.now()
-            if is_verbose and current_time - self.last_progress_report >= datetime.timedelta(seconds=10):
+            report_interval = datetime.timedelta(seconds=self.progress_report_interval)
+            if is_verbose and correlation_id and current_time - self.last_progress_report >= report_interval:
                 self.last_progress_report = current_time
+                # back off so long deployments don't spend read quota on the activity log
+                self.progress_report_interval = min(self.progress_report_interval * 2, MAX_PROGRESS_REPORT_INTERVAL)
                 try:
                     self._generate_template_progress(correlation_id)
                 except Exception as ex:  # pylint: disable=broad-except
                     logger.warning('%s during progress reporting: %s', getattr(type(ex), '__name__', type(ex)), ex)
             try:
-                self._delay()
+                self._delay(poller)
             except KeyboardInterrupt:
                 self.cli_ctx.get_progress_controller().stop()
                 logger.error('Long-running operation wait cancelled.  %s', correlation_message)
@@ -611,6 +675,47 @@ class LongRunningOperation(object):  # pylint: disable=too-few-public-methods
         return result
 
 
+# pylint: disable=too-few-public-methods
+class MultiLongRunningOperation(LongRunningOperation):
+    """ waits on several pollers together so a batch takes as long as its slowest operation """
+
+    def __call__(self, pollers):
+        import colorama
+        from msrest.exceptions import ClientException
+
+        colorama.init()
+
+        pollers = list(pollers)
+        total = len(pollers)
+        progress_controller = self.cli_ctx.get_progress_controller()
+        progress_controller.begin(value=0, total_val=total)
+
+        pending = [poller for poller in pollers if not poller.done()]
+        while pending:
+            progress_controller.add(message='Running ({}/{} completed)'.format(total - len(pending), total),
+                                    value=total - len(pending), total_val=total)
+            try:
+                # every poller polls on its own thread; waiting on any one of them keeps the progress ticking
+                self._delay(pending[0])
+            except KeyboardInterrupt:
+                progress_controller.stop()
+                logger.error('Long-running operation wait cancelled.')
+                raise
+            pending = [poller for poller in pending if not poller.done()]
+
+        try:
+            results = [poller.result() for poller in pollers]
+        except ClientException as client_exception:
+            from azure.cli.core.commands.arm import handle_long_running_operation_exception
+            progress_controller.stop()
+            handle_long_running_operation_exception(client_exception)
+
+        progress_controller.end()
+        colorama.deinit()
+
+        return results
+
+
 # pylint: disable=too-few-public-methods
 class DeploymentOutputLongRunningOperation(LongRunningOperation):
     def __call__(self, result):
@@ -631,7 +736,9 @@ class DeploymentOutputLongRunningOperation(LongRunningOperation):
 
 def _load_command_loader(loader, args, name, prefix):
     from azure.cli.core.profiles import PROFILE_TYPE
-    module = import_module(prefix + name)
+    from azure.cli.core.profiler import profile
+    with profile('import {}'.format(prefix + name), 'import'):
+        module = import_module(prefix + name)
     loader_cls = getattr(module, 'COMMAND_LOADER_CLS', None)
     command_table = {}
 
@@ -640,7 +747,8 @@ def _load_command_loader(loader, args, name, prefix):
         loader.loaders.append(command_loader)  # This will be used by interactive
         if command_loader.supported_api_version(min_api=command_loader.min_profile, max_api=command_loader.max_profile,
                                                 resource_type=PROFILE_TYPE):
-            command_table = command_loader.load_command_table(args)
+            with profile('load command table: {}'.format(name), 'command_table'):
+                command_table = command_loader.load_command_table(args)
             if command_table:
                 for cmd in list(command_table.keys()):
                     # TODO: If desired to for extension to patch module, this can be uncommented
@@ -724,6 +832,16 @@ def _is_poller(obj):
     return False
 
 
+def get_max_concurrent_ids(cli_ctx):
+    """ number of resources a command given several IDs operates on at once """
+    try:
+        max_workers = cli_ctx.config.getint('core', 'max_concurrent_ids', fallback=DEFAULT_MAX_CONCURRENT_IDS)
+    except ValueError:
+        logger.warning("Invalid value for 'core.max_concurrent_ids'. Using %s.", DEFAULT_MAX_CONCURRENT_IDS)
+        max_workers = DEFAULT_MAX_CONCURRENT_IDS
+    return max(1, max_workers)
+
+
 def _merge_kwargs(patch_kwargs, base_kwargs, supported_kwargs=None):
     merged_kwargs = base_kwargs.copy()
     merged_kwargs.update(patch_kwargs)
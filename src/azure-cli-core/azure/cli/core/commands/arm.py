@@ -8,8 +8,11 @@
 import argparse
 from collections import OrderedDict
 import json
+import os
 import re
 import copy
+import threading
+import time
 from six import string_types
 
 from knack.arguments import CLICommandArgument, ignore_type
@@ -20,6 +23,7 @@ from knack.util import todict, CLIError
 from azure.cli.core import AzCommandsLoader, EXCLUDED_PARAMS
 from azure.cli.core.commands import LongRunningOperation, _is_poller
 from azure.cli.core.commands.client_factory import get_mgmt_service_client
+from azure.cli.core.commands.constants import DEFAULT_PROVIDER_CACHE_TTL
 from azure.cli.core.commands.validators import IterateValue
 from azure.cli.core.util import shell_safe_json_parse, augment_no_wait_handler_args, get_command_type_kwarg
 from azure.cli.core.profiles import ResourceType, get_sdk
@@ -330,8 +334,8 @@ def register_global_subscription_argument(cli_ctx):
         class SubscriptionNameOrIdAction(argparse.Action):  # pylint:disable=too-few-public-methods
 
             def __call__(self, parser, namespace, value, option_string=None):
-                from azure.cli.core._profile import Profile
-                profile = Profile(cli_ctx=namespace._cmd.cli_ctx)  # pylint: disable=protected-access
+                from azure.cli.core._profile import get_profile
+                profile = get_profile(namespace._cmd.cli_ctx)  # pylint: disable=protected-access
                 subscriptions_list = profile.load_cached_subscriptions()
                 sub_id = None
                 for sub in subscriptions_list:
@@ -1128,9 +1132,6 @@ def get_arm_resource_by_id(cli_ctx, arm_id, api_version=None):
                 namespace = v
                 highest_child = child_number
 
-        # retrieve provider info for the namespace
-        provider = client.providers.get(namespace)
-
         # assemble the resource type key used by the provider list operation.  type1/type2/type3/...
         resource_type_str = ''
         if not highest_child:
@@ -1144,16 +1145,130 @@ def get_arm_resource_by_id(cli_ctx, arm_id, api_version=None):
             resource_type_str = resource_type_str.rstrip('/')
 
         api_version = None
-        rt = next((t for t in provider.resource_types if t.resource_type.lower() == resource_type_str.lower()), None)
+        # retrieve provider info for the namespace
+        rt = next(iter(find_provider_resource_types(cli_ctx, client, namespace, resource_type_str)), None)
         if not rt:
             from azure.cli.core.parser import IncorrectUsageError
             raise IncorrectUsageError('Resource type {} not found.'.format(resource_type_str))
-        try:
-            # if the service specifies, use the default API version
-            api_version = rt.default_api_version
-        except AttributeError:
-            # if the service doesn't specify, use the most recent non-preview API version unless there is only a
-            # single API version. API versions are returned by the service in a sorted list
-            api_version = next((x for x in rt.api_versions if not x.endswith('preview')), rt.api_versions[0])
+        # if the service specifies, use the default API version. If it doesn't, use the most recent non-preview API
+        # version unless there is only a single API version. API versions are returned by the service in a sorted list
+        api_version = rt.default_api_version or \
+            next((x for x in rt.api_versions if not x.endswith('preview')), rt.api_versions[0])
 
     return client.resources.get_by_id(arm_id, api_version)
+
+
+# guards the provider cache and the per namespace locks, never held across a request
+_PROVIDER_CACHE_LOCK = threading.Lock()
+_PROVIDER_LOCKS = {}
+
+
+def _get_provider_lock(key):
+    with _PROVIDER_CACHE_LOCK:
+        return _PROVIDER_LOCKS.setdefault(key, threading.Lock())
+
+
+def get_provider_cache_ttl(cli_ctx):
+    """Seconds the resource types of a provider are reused for. 0 disables the cache."""
+    try:
+        ttl = cli_ctx.config.getint('core', 'provider_cache_ttl', fallback=DEFAULT_PROVIDER_CACHE_TTL)
+    except ValueError:
+        logger.warning("Invalid value for 'core.provider_cache_ttl'. Using %s.", DEFAULT_PROVIDER_CACHE_TTL)
+        ttl = DEFAULT_PROVIDER_CACHE_TTL
+    return max(0, ttl)
+
+
+def _get_provider_cache(cli_ctx):
+    from azure.cli.core._session import PROVIDERS
+    if PROVIDERS.filename is None:
+        PROVIDERS.load(os.path.join(cli_ctx.config.config_dir, 'providerCache.json'))
+    return PROVIDERS
+
+
+def _get_provider_cache_key(cli_ctx, client, namespace):
+    return '/'.join([cli_ctx.cloud.name, client.config.subscription_id, namespace.lower()])
+
+
+class CachedResourceType(object):  # pylint: disable=too-few-public-methods
+    """ A resource type of a resource provider, as kept in the provider cache. """
+
+    def __init__(self, resource_type, api_versions, locations=None, default_api_version=None):
+        self.resource_type = resource_type
+        self.api_versions = api_versions or []
+        self.locations = locations or []
+        # only set when the service specifies one
+        self.default_api_version = default_api_version
+
+    def __repr__(self):
+        return 'CachedResourceType({!r}, {!r})'.format(self.resource_type, self.api_versions)
+
+
+def _to_provider_cache_entry(provider):
+    resource_types = []
+    for rt in provider.resource_types or []:
+        entry = {'resource_type': rt.resource_type, 'api_versions': rt.api_versions or [],
+                 'locations': getattr(rt, 'locations', None) or []}
+        if getattr(rt, 'default_api_version', None):
+            entry['default_api_version'] = rt.default_api_version
+        resource_types.append(entry)
+    return {'retrieved_on': time.time(), 'resource_types': resource_types}
+
+
+def cache_providers(cli_ctx, client, providers):
+    """Store the resource types of the given providers, e.g. the result of `providers.list()`, in the cache."""
+    if not get_provider_cache_ttl(cli_ctx):
+        return
+    cache = _get_provider_cache(cli_ctx)
+    with _PROVIDER_CACHE_LOCK:
+        for provider in providers:
+            cache.data[_get_provider_cache_key(cli_ctx, client, provider.namespace)] = \
+                _to_provider_cache_entry(provider)
+        cache.save_with_retry()
+
+
+def warm_provider_cache(cli_ctx, client):
+    """Cache the resource types of every provider with a single `providers.list()` call."""
+    cache_providers(cli_ctx, client, client.providers.list())
+
+
+def get_provider_resource_types(cli_ctx, client, namespace, refresh=False):
+    """
+    The resource types of a resource provider, as `CachedResourceType` objects.
+
+    Providers are cached on disk per cloud, subscription and namespace for `core.provider_cache_ttl` seconds, so
+    commands resolving API versions (e.g. for every ID of `--ids`) don't fetch the same provider again and again.
+    """
+    ttl = get_provider_cache_ttl(cli_ctx)
+    if not ttl:
+        entry = _to_provider_cache_entry(client.providers.get(namespace))
+    else:
+        cache = _get_provider_cache(cli_ctx)
+        key = _get_provider_cache_key(cli_ctx, client, namespace)
+        # concurrent lookups of the same provider wait for the first one rather than fetch it again, while
+        # lookups of other providers go ahead
+        with _get_provider_lock(key):
+            with _PROVIDER_CACHE_LOCK:
+                entry = cache.get(key)
+            if refresh or not entry or time.time() - entry.get('retrieved_on', 0) > ttl:
+                logger.debug("Retrieving resource types of provider '%s'", namespace)
+                entry = _to_provider_cache_entry(client.providers.get(namespace))
+                with _PROVIDER_CACHE_LOCK:
+                    cache.data[key] = entry
+                    cache.save_with_retry()
+    return [CachedResourceType(rt['resource_type'], rt.get('api_versions'), rt.get('locations'),
+                               rt.get('default_api_version'))
+            for rt in entry['resource_types']]
+
+
+def find_provider_resource_types(cli_ctx, client, namespace, resource_type):
+    """
+    The resource types of a provider matching `resource_type`, case-insensitive. When the cached provider has no
+    match, the provider is retrieved again in case the resource type is new.
+    """
+    def _find(resource_types):
+        return [rt for rt in resource_types if rt.resource_type.lower() == resource_type.lower()]
+
+    matches = _find(get_provider_resource_types(cli_ctx, client, namespace))
+    if not matches and get_provider_cache_ttl(cli_ctx):
+        matches = _find(get_provider_resource_types(cli_ctx, client, namespace, refresh=True))
+    return matches
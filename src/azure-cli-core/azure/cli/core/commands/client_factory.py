@@ -81,6 +81,10 @@ def configure_common_settings(cli_ctx, client):
 
     client.config.enable_http_logger = True
 
+    from azure.cli.core.profiler import get_profiler, record_http_response
+    if get_profiler() is not None:
+        client.config.hooks.append(record_http_response)
+
     client.config.add_user_agent(UA_AGENT)
     try:
         client.config.add_user_agent(os.environ[ENV_ADDITIONAL_USER_AGENT])
@@ -108,6 +112,38 @@ def configure_common_settings(cli_ctx, client):
                                   ' '.join(cli_ctx.data['safe_params']))
     client.config.generate_client_request_id = 'x-ms-client-request-id' not in cli_ctx.data['headers']
 
+    _retry_throttled_requests(client)
+
+    # seconds between status checks of a long-running operation when the service sends no Retry-After hint
+    poll_interval = _get_poll_interval(cli_ctx)
+    if poll_interval is not None and hasattr(client.config, 'long_running_operation_timeout'):
+        client.config.long_running_operation_timeout = poll_interval
+
+
+def _retry_throttled_requests(client):
+    """
+    Throttled (HTTP 429) requests are retried by the client, after the Retry-After interval the service asks for or
+    with a backoff when it sends none. The service turned them down without acting on them, so this is safe whatever
+    the method, including the status checks of long-running operations, where re-running the command would repeat the
+    requests which did succeed.
+    """
+    policy = getattr(getattr(client.config, 'retry_policy', None), 'policy', None)
+    if policy is not None and 429 not in policy.status_forcelist:
+        policy.status_forcelist = list(policy.status_forcelist) + [429]
+
+
+def _get_poll_interval(cli_ctx):
+    value = cli_ctx.config.get('core', 'poll_interval', None)
+    if value is None:
+        return None
+    try:
+        if int(value) > 0:
+            return int(value)
+    except ValueError:
+        pass
+    logger.warning("Ignoring 'core.poll_interval=%s'. It must be a positive number of seconds.", value)
+    return None
+
 
 def _get_mgmt_service_client(cli_ctx,
                              client_type,
@@ -119,29 +155,31 @@ def _get_mgmt_service_client(cli_ctx,
                              sdk_profile=None,
                              aux_subscriptions=None,
                              **kwargs):
-    from azure.cli.core._profile import Profile
+    from azure.cli.core._profile import get_profile
+    from azure.cli.core import profiler
     logger.debug('Getting management service client client_type=%s', client_type.__name__)
-    resource = resource or cli_ctx.cloud.endpoints.active_directory_resource_id
-    profile = Profile(cli_ctx=cli_ctx)
-    cred, subscription_id, _ = profile.get_login_credentials(subscription_id=subscription_id, resource=resource,
-                                                             aux_subscriptions=aux_subscriptions)
-
-    client_kwargs = {}
-    if base_url_bound:
-        client_kwargs = {'base_url': cli_ctx.cloud.endpoints.resource_manager}
-    if api_version:
-        client_kwargs['api_version'] = api_version
-    if sdk_profile:
-        client_kwargs['profile'] = sdk_profile
-    if kwargs:
-        client_kwargs.update(kwargs)
-
-    if subscription_bound:
-        client = client_type(cred, subscription_id, **client_kwargs)
-    else:
-        client = client_type(cred, **client_kwargs)
+    with profiler.profile('create client: {}'.format(client_type.__name__), 'client'):
+        resource = resource or cli_ctx.cloud.endpoints.active_directory_resource_id
+        profile = get_profile(cli_ctx)
+        cred, subscription_id, _ = profile.get_login_credentials(subscription_id=subscription_id, resource=resource,
+                                                                 aux_subscriptions=aux_subscriptions)
+
+        client_kwargs = {}
+        if base_url_bound:
+            client_kwargs = {'base_url': cli_ctx.cloud.endpoints.resource_manager}
+        if api_version:
+            client_kwargs['api_version'] = api_version
+        if sdk_profile:
+            client_kwargs['profile'] = sdk_profile
+        if kwargs:
+            client_kwargs.update(kwargs)
+
+        if subscription_bound:
+            client = client_type(cred, subscription_id, **client_kwargs)
+        else:
+            client = client_type(cred, **client_kwargs)
 
-    configure_common_settings(cli_ctx, client)
+        configure_common_settings(cli_ctx, client)
 
     return client, subscription_id
 
@@ -174,9 +212,9 @@ def get_data_service_client(cli_ctx, service_type, account_name, account_key, co
 
 
 def get_subscription_id(cli_ctx):
-    from azure.cli.core._profile import Profile
+    from azure.cli.core._profile import get_profile
     if not cli_ctx.data.get('subscription_id'):
-        cli_ctx.data['subscription_id'] = Profile(cli_ctx=cli_ctx).get_subscription_id()
+        cli_ctx.data['subscription_id'] = get_profile(cli_ctx).get_subscription_id()
     return cli_ctx.data['subscription_id']
 
 
@@ -28,3 +28,13 @@ CONFIRM_PARAM_NAME = 'yes'
 DEFAULT_QUERY_TIME_RANGE = 3600000
 
 BLACKLISTED_MODS = ['context', 'shell', 'documentdb', 'component']
+
+# operations a command fanned out over --ids runs at once
+DEFAULT_MAX_CONCURRENT_IDS = 10
+
+# seconds between deployment progress reports of a long-running operation in verbose mode
+DEFAULT_PROGRESS_REPORT_INTERVAL = 10
+MAX_PROGRESS_REPORT_INTERVAL = 60
+
+# seconds the resource types and API versions of a resource provider are cached for
+DEFAULT_PROVIDER_CACHE_TTL = 86400
@@ -0,0 +1,435 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+""" Tab completion from a cache in the config directory, so that pressing TAB doesn't create the CLI and load the
+command modules every time.
+
+When the CLI completes a command line, it records the names of the loaded commands and the arguments of the parsers
+it built. The next completion of a command name, or of an option of a recorded command, is answered from that record
+by `complete_from_cache()` before the CLI is created. Anything the record can't answer, like the values of a completer
+that queries Azure, falls back to the CLI. The record is dropped when the CLI version, the installed command modules
+and extensions or the active cloud change.
+
+The values returned by the completers of command modules are cached separately, per subscription and command line,
+for `core.completion_cache_ttl` seconds.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import six
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+COMPLETION_CACHE_FILE = 'completionCache.json'
+DEFAULT_COMPLETION_CACHE_TTL = 300
+
+_SIGNATURE = 'signature'
+_COMMANDS = 'commands'
+_COMPLETE = 'complete'
+_PARSERS = 'parsers'
+_VALUES = 'values'
+
+# the completer types of a recorded argument
+_CHOICES = 'choices'
+_FILES = 'files'
+_DYNAMIC = 'dynamic'
+
+
+class _CacheMiss(Exception):
+    """ Raised while completing from the cache when only the CLI can complete the command line. """
+    pass
+
+
+def _get_store(config_dir):
+    from azure.cli.core._session import COMPLETION
+    if COMPLETION.filename is None:
+        COMPLETION.load(os.path.join(config_dir, COMPLETION_CACHE_FILE))
+    return COMPLETION
+
+
+def _read_config(config_dir, file_name):
+    from six.moves import configparser
+    config = configparser.ConfigParser()
+    try:
+        config.read(os.path.join(config_dir, file_name))
+    except configparser.Error:
+        pass
+    return config
+
+
+def _get_config_value(config, section, option, default=None):
+    """ Reads an option like the CLI config does, where an AZURE_{SECTION}_{OPTION} environment variable takes
+    precedence over the config file. """
+    from six.moves import configparser
+    env_value = os.environ.get('AZURE_{}_{}'.format(section, option).upper())
+    if env_value is not None:
+        return env_value
+    try:
+        return config.get(section, option)
+    except (configparser.NoSectionError, configparser.NoOptionError):
+        return default
+
+
+def _is_enabled(config):
+    value = _get_config_value(config, 'core', 'use_completion_cache', 'true')
+    return value.lower() not in ['0', 'false', 'no', 'off']
+
+
+def get_signature(config_dir, config=None):
+    """ What the recorded command tree depends on: the CLI version, the installed command modules and extensions and
+    the active cloud and its profile. It is computed without creating the CLI. """
+    import pkgutil
+    from azure.cli.core import __version__
+    from azure.cli.core.extension import get_extensions
+
+    try:
+        import azure.cli.command_modules
+        modules = sorted(name for _, name, _ in pkgutil.iter_modules(azure.cli.command_modules.__path__))
+    except ImportError:
+        modules = []
+    try:
+        extensions = sorted('{}=={}'.format(ext.name, getattr(ext, 'version', None)) for ext in get_extensions())
+    except Exception:  # pylint: disable=broad-except
+        extensions = []
+    config = config or _read_config(config_dir, 'config')
+    cloud_name = _get_config_value(config, 'cloud', 'name', 'AzureCloud')
+    cloud_profile = _get_config_value(_read_config(config_dir, 'clouds.config'), cloud_name, 'profile', 'latest')
+    return {
+        'version': __version__,
+        'modules': modules,
+        'extensions': extensions,
+        'cloud': cloud_name,
+        'cloudProfile': cloud_profile
+    }
+
+
+def _get_action_info(action):
+    """ What completing the argument of `action` needs: its option strings, the number of values it takes and how its
+    values are completed. """
+    from argcomplete.completers import ChoicesCompleter, FilesCompleter, SuppressCompleter
+
+    completer = getattr(action, 'completer', None)
+    if completer is None and action.choices is not None:
+        completer = ChoicesCompleter(action.choices)
+    if completer is None:
+        completer_info = None
+    elif type(completer) is ChoicesCompleter:  # pylint: disable=unidiomatic-typecheck
+        completer_info = {'type': _CHOICES, 'choices': [six.text_type(choice) for choice in completer.choices]}
+    elif type(completer) is FilesCompleter:  # pylint: disable=unidiomatic-typecheck
+        completer_info = {'type': _FILES, 'allowednames': completer.allowednames,
+                          'directories': completer.directories}
+    else:
+        completer_info = {'type': _DYNAMIC}
+    suppressed = action.help == argparse.SUPPRESS or \
+        (isinstance(completer, SuppressCompleter) and completer.suppress())
+    return {'options': list(action.option_strings), 'dest': action.dest, 'nargs': action.nargs,
+            'suppressed': suppressed, 'completer': completer_info}
+
+
+def _get_parser_info(parser):
+    return [_get_action_info(action) for action in parser._actions  # pylint: disable=protected-access
+            if not isinstance(action, argparse._SubParsersAction)]  # pylint: disable=protected-access
+
+
+def get_visible_command_names(command_loader):
+    """ The names of the commands the parser shows, in the order of the command table. """
+    group_table = command_loader.command_group_table
+
+    def _expired(deprecate_info):
+        return deprecate_info is not None and deprecate_info.expired()
+
+    names = []
+    for name, command in command_loader.command_table.items():
+        words = name.split()
+        groups = [group_table.get(' '.join(words[:i])) for i in range(1, len(words))]
+        if _expired(command.deprecate_info) or \
+                any(group and _expired(group.group_kwargs.get('deprecate_info')) for group in groups):
+            continue
+        names.append(name)
+    return names
+
+
+class CompletionCache(object):
+    """ Records the command tree of the command lines the CLI completes, for `complete_from_cache()`. """
+
+    def __init__(self, cli_ctx):
+        self.cli_ctx = cli_ctx
+        self._store = None
+
+    @property
+    def enabled(self):
+        from azure.cli.core.commands.events import EVENT_INVOKER_ON_TAB_COMPLETION
+        # completions added by event handlers can only be computed by the CLI
+        handlers = self.cli_ctx._event_handlers.get(EVENT_INVOKER_ON_TAB_COMPLETION)  # pylint: disable=protected-access
+        return self.cli_ctx.config.getboolean('core', 'use_completion_cache', fallback=True) and not handlers
+
+    def _get_store(self):
+        if self._store is None:
+            config_dir = self.cli_ctx.config.config_dir
+            store = _get_store(config_dir)
+            signature = get_signature(config_dir)
+            if store.get(_SIGNATURE) != signature:
+                store.data.update({_SIGNATURE: signature, _COMMANDS: {}, _COMPLETE: False, _PARSERS: {}})
+            self._store = store
+        return self._store
+
+    def add_commands(self, command_names, top_command=None):
+        """ Records the names of all the commands, or of the commands of `top_command` only. """
+        store = self._get_store()
+        if top_command:
+            store[_COMMANDS][top_command] = [name for name in command_names if name.split()[0] == top_command]
+        else:
+            commands = {}
+            for name in command_names:
+                commands.setdefault(name.split()[0], []).append(name)
+            store.data.update({_COMMANDS: commands, _COMPLETE: True})
+
+    def add_parsers(self, parser):
+        """ Records the arguments of the root parser, of the group parsers and of the command parsers that have theirs
+        added. """
+        parsers = self._get_store()[_PARSERS]
+        parsers[''] = _get_parser_info(parser)
+        for path, subparsers in parser.subparsers.items():
+            group_parser = parser.subparsers[path[:-1]].choices.get(path[-1]) if path else None
+            if group_parser:
+                parsers[' '.join(path)] = _get_parser_info(group_parser)
+            for child in subparsers.choices.values():
+                command_name = child.get_default('command')
+                if command_name and getattr(child, '_pending_arguments', None) is None:
+                    parsers[command_name] = _get_parser_info(child)
+
+    def clear(self):
+        store = self._get_store()
+        store.data.update({_COMMANDS: {}, _COMPLETE: False, _PARSERS: {}})
+
+    def save(self):
+        try:
+            self._get_store().save_with_retry()
+        except (OSError, IOError):
+            logger.debug("Unable to save the completion cache.")
+
+
+def record_completion(cli_ctx, command_names, top_command, parser):
+    """ Records the command tree of the command line being completed. """
+    completion_cache = CompletionCache(cli_ctx)
+    try:
+        if completion_cache.enabled:
+            completion_cache.add_commands(command_names, top_command)
+            completion_cache.add_parsers(parser)
+        else:
+            completion_cache.clear()
+    except Exception:  # pylint: disable=broad-except
+        # completing without the cache still works
+        logger.debug("Unable to record the command tree for the completion cache.", exc_info=True)
+        completion_cache.clear()
+    completion_cache.save()
+
+
+def get_completion_cache_ttl(cli_ctx):
+    """Seconds the values of a completer are reused for. 0 disables the cache."""
+    try:
+        ttl = cli_ctx.config.getint('core', 'completion_cache_ttl', fallback=DEFAULT_COMPLETION_CACHE_TTL)
+    except ValueError:
+        logger.warning("Invalid value for 'core.completion_cache_ttl'. Using %s.", DEFAULT_COMPLETION_CACHE_TTL)
+        ttl = DEFAULT_COMPLETION_CACHE_TTL
+    return max(0, ttl)
+
+
+def _get_values_key(cmd, action, namespace):
+    """ Completers depend on the subscription and on the other arguments of the command line, like the resource group
+    of a name. Returns None if there is no subscription to cache the values for. """
+    from azure.cli.core._profile import get_profile
+    try:
+        subscription = getattr(namespace, '_subscription', None) or \
+            get_profile(cmd.cli_ctx).get_subscription_id()
+    except Exception:  # pylint: disable=broad-except
+        return None
+    arguments = sorted((key, value) for key, value in vars(namespace).items()
+                       if not key.startswith('_') and
+                       (value is None or isinstance(value, (six.string_types, bool, int, float))))
+    key = json.dumps([subscription, cmd.name, getattr(action, 'dest', None), arguments])
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def get_completion_values(cmd, action, namespace, get_values):
+    """ The values of a completer, cached on disk for `core.completion_cache_ttl` seconds so that completing the same
+    argument again doesn't query Azure again. """
+    ttl = get_completion_cache_ttl(cmd.cli_ctx)
+    key = _get_values_key(cmd, action, namespace) if ttl else None
+    if not key:
+        return get_values()
+
+    store = _get_store(cmd.cli_ctx.config.config_dir)
+    entries = store.data.setdefault(_VALUES, {})
+    now = time.time()
+    entry = entries.get(key)
+    if entry and now - entry['time'] <= ttl:
+        return entry['values']
+
+    values = list(get_values() or [])
+    if all(isinstance(value, six.string_types) for value in values):
+        for expired_key in [k for k, e in entries.items() if now - e['time'] > ttl]:
+            del entries[expired_key]
+        entries[key] = {'time': now, 'values': values}
+        try:
+            store.save_with_retry()
+        except (OSError, IOError):
+            logger.debug("Unable to save the completion cache.")
+    return values
+
+
+class _DynamicCompleter(object):  # pylint: disable=too-few-public-methods
+
+    def __call__(self, **kwargs):
+        raise _CacheMiss()
+
+
+def _add_arguments(parser, parser_info):
+    from argcomplete.completers import ChoicesCompleter, FilesCompleter
+    for info in parser_info:
+        kwargs = {'dest': info['dest'], 'help': argparse.SUPPRESS if info['suppressed'] else None}
+        if info['nargs'] == 0:
+            kwargs.update(action='store_const', const=True)
+        else:
+            kwargs['nargs'] = info['nargs']
+        if not info['options']:
+            kwargs['metavar'] = kwargs.pop('dest')
+            action = parser.add_argument(info['dest'], **kwargs)
+        else:
+            action = parser.add_argument(*info['options'], **kwargs)
+        completer_info = info['completer'] or {}
+        completer_type = completer_info.get('type')
+        if completer_type == _CHOICES:
+            action.completer = ChoicesCompleter(completer_info['choices'])
+        elif completer_type == _FILES:
+            action.completer = FilesCompleter(completer_info['allowednames'], completer_info['directories'])
+        elif completer_type == _DYNAMIC:
+            action.completer = _DynamicCompleter()
+
+
+def _build_parser(store, command_words, child_words=None):
+    """ A parser with just the arguments of the command or group `command_words` and of the groups leading to it.
+    For a group, `child_words` are the names of its subgroups and commands. """
+    parsers = store[_PARSERS]
+
+    def _get_parser_info(path):
+        try:
+            return parsers[' '.join(path)]
+        except KeyError:
+            raise _CacheMiss()
+
+    root = argparse.ArgumentParser(prog='az', add_help=False)
+    _add_arguments(root, _get_parser_info([]))
+    parser = root
+    for i, word in enumerate(command_words):
+        parser = parser.add_subparsers(dest='_subcommand').add_parser(word, add_help=False)
+        _add_arguments(parser, _get_parser_info(command_words[:i + 1]))
+    if child_words is not None:
+        subparsers = parser.add_subparsers(dest='_subcommand')
+        for word in child_words:
+            subparsers.add_parser(word, add_help=False)
+    return root
+
+
+def _get_completion_parser(store, words):
+    """ Builds the parser to complete the command line `words` with, or raises _CacheMiss if the cache doesn't know
+    it. """
+    commands = store[_COMMANDS]
+    command_words = []
+    for word in words:
+        if word.startswith('-'):
+            break
+        command_words.append(word)
+
+    # the command the command line starts with
+    for length in range(len(command_words), 0, -1):
+        top_commands = commands.get(command_words[0], [])
+        if ' '.join(command_words[:length]) in top_commands:
+            return _build_parser(store, command_words[:length])
+
+    # a group, when completing the name of a subgroup or command in it
+    if len(command_words) != len(words) or (not command_words and not store[_COMPLETE]):
+        raise _CacheMiss()
+    if command_words and command_words[0] not in commands:
+        raise _CacheMiss()
+    names = [name.split() for name in commands[command_words[0]]] if command_words else \
+        [[top_command] for top_command in commands]
+    child_words = []
+    for name in names:
+        if len(name) > len(command_words) and name[:len(command_words)] == command_words and \
+                name[len(command_words)] not in child_words:
+            child_words.append(name[len(command_words)])
+    if not child_words:
+        raise _CacheMiss()
+    return _build_parser(store, command_words, child_words)
+
+
+class _CompletionOutput(object):
+    """ Collects what argcomplete writes, which is bytes before argcomplete 2 and text since. """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        if isinstance(data, six.text_type):
+            data = data.encode(sys.getfilesystemencoding() or 'utf-8')
+        self.chunks.append(data)
+
+    def flush(self):
+        pass
+
+
+def _exit_completion(code=0):
+    if code:
+        raise _CacheMiss()
+
+
+def complete_from_cache(output_stream=None):
+    """ Completes the command line of the shell, the way AzCliCommandParser.enable_autocomplete() does, from the cache.
+    The completions are written to `output_stream`, by default file descriptor 8 like argcomplete does. Returns False,
+    without writing anything, when the CLI has to complete it. """
+    import argcomplete
+    from azure.cli.core._environment import get_config_dir
+
+    try:
+        config_dir = get_config_dir()
+        config = _read_config(config_dir, 'config')
+        if not _is_enabled(config):
+            return False
+        store = _get_store(config_dir)
+        if _PARSERS not in store or store.get(_SIGNATURE) != get_signature(config_dir, config):
+            return False
+
+        comp_line = os.environ['COMP_LINE']
+        if isinstance(comp_line, six.binary_type):
+            comp_line = comp_line.decode(sys.getfilesystemencoding() or 'utf-8')
+        comp_words = argcomplete.split_line(comp_line, int(os.environ['COMP_POINT']))[3]
+        comp_words = comp_words[int(os.environ['_ARGCOMPLETE']) - 1:]
+
+        parser = _get_completion_parser(store, comp_words[1:])
+        # argcomplete reads the command line from the environment and writes the completions to the stream
+        output = _CompletionOutput()
+        argcomplete.CompletionFinder()(parser, exit_method=_exit_completion, output_stream=output,
+                                       validator=lambda c, p: c.lower().startswith(p.lower()),
+                                       default_completer=lambda _: ())
+    except _CacheMiss:
+        return False
+    except Exception:  # pylint: disable=broad-except
+        logger.debug("Unable to complete from the completion cache.", exc_info=True)
+        return False
+
+    if output_stream is None:
+        with os.fdopen(8, 'wb') as fd_stream:
+            fd_stream.write(b''.join(output.chunks))
+    else:
+        output_stream.write(b''.join(output.chunks))
+    return True
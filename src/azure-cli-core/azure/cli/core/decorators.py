@@ -26,7 +26,8 @@ class Completer(object):
         namespace = kwargs['parsed_args']
         prefix = kwargs['prefix']
         cmd = namespace._cmd  # pylint: disable=protected-access
-        return self.func(cmd, prefix, namespace)
+        from azure.cli.core.completion_cache import get_completion_values
+        return get_completion_values(cmd, kwargs.get('action'), namespace, lambda: self.func(cmd, prefix, namespace))
 
 
 def call_once(factory_func):
@@ -53,14 +53,21 @@ class AzCliCommandParser(CLICommandParser):
 
     def __init__(self, cli_ctx=None, cli_help=None, **kwargs):
         self.command_source = kwargs.pop('_command_source', None)
+        self._pending_arguments = None
         super(AzCliCommandParser, self).__init__(cli_ctx, cli_help=cli_help, **kwargs)
 
     def load_command_table(self, command_loader):
-        """Load a command table into our parser."""
+        """Load a command table into our parser.
+
+        When the loader is running a command (its command_name is set), only that command's parser gets its arguments
+        right away. The parsers of the other commands in the table are only needed for group help and the list of
+        choices, so they add their arguments the first time they parse or show command help, if ever.
+        """
         # If we haven't already added a subparser, we
         # better do it.
         cmd_tbl = command_loader.command_table
         grp_tbl = command_loader.command_group_table
+        invoked_command = getattr(command_loader, 'command_name', None)
         if not self.subparsers:
             sp = self.add_subparsers(dest='_command_package')
             sp.required = True
@@ -80,50 +87,70 @@ class AzCliCommandParser(CLICommandParser):
             # inject command_module designer's help formatter -- default is HelpFormatter
             fc = metadata.formatter_class or argparse.HelpFormatter
 
+            lazy = invoked_command is not None and command_name != invoked_command
             command_parser = subparser.add_parser(command_verb,
                                                   description=metadata.description,
-                                                  parents=self.parents,
+                                                  parents=[] if lazy else self.parents,
                                                   conflict_handler='error',
                                                   help_file=metadata.help,
                                                   formatter_class=fc,
                                                   cli_help=self.cli_help,
                                                   _command_source=metadata.command_source)
             command_parser.cli_ctx = self.cli_ctx
-            command_validator = metadata.validator
-            argument_validators = []
-            argument_groups = {}
-            for _, arg in metadata.arguments.items():
-                # don't add deprecated arguments to the parser
-                deprecate_info = arg.type.settings.get('deprecate_info', None)
-                if deprecate_info and deprecate_info.expired():
-                    continue
-
-                if arg.validator:
-                    argument_validators.append(arg.validator)
-                try:
-                    if arg.arg_group:
-                        try:
-                            group = argument_groups[arg.arg_group]
-                        except KeyError:
-                            # group not found so create
-                            group_name = '{} Arguments'.format(arg.arg_group)
-                            group = command_parser.add_argument_group(arg.arg_group, group_name)
-                            argument_groups[arg.arg_group] = group
-                        param = AzCliCommandParser._add_argument(group, arg)
-                    else:
-                        param = AzCliCommandParser._add_argument(command_parser, arg)
-                except argparse.ArgumentError as ex:
-                    raise CLIError("command authoring error for '{}': '{}' {}".format(
-                        command_name, ex.args[0].dest, ex.message))  # pylint: disable=no-member
-                param.completer = arg.completer
-                param.deprecate_info = arg.deprecate_info
-            command_parser.set_defaults(
-                func=metadata,
-                command=command_name,
-                _cmd=metadata,
-                _command_validator=command_validator,
-                _argument_validators=argument_validators,
-                _parser=command_parser)
+            # a parser with a `func` default is a command rather than a group, even before its arguments are added
+            command_parser.set_defaults(func=metadata, command=command_name, _cmd=metadata, _parser=command_parser)
+            if lazy:
+                command_parser._pending_arguments = (command_name, metadata, self.parents)
+            else:
+                command_parser._add_command_arguments(command_name, metadata)
+
+    def _add_command_arguments(self, command_name, metadata, parents=None):
+        for parent in parents or []:
+            self._add_container_actions(parent)
+            for key, value in parent._defaults.items():  # pylint: disable=protected-access
+                self._defaults.setdefault(key, value)
+
+        command_validator = metadata.validator
+        argument_validators = []
+        argument_groups = {}
+        for _, arg in metadata.arguments.items():
+            # don't add deprecated arguments to the parser
+            deprecate_info = arg.type.settings.get('deprecate_info', None)
+            if deprecate_info and deprecate_info.expired():
+                continue
+
+            if arg.validator:
+                argument_validators.append(arg.validator)
+            try:
+                if arg.arg_group:
+                    try:
+                        group = argument_groups[arg.arg_group]
+                    except KeyError:
+                        # group not found so create
+                        group_name = '{} Arguments'.format(arg.arg_group)
+                        group = self.add_argument_group(arg.arg_group, group_name)
+                        argument_groups[arg.arg_group] = group
+                    param = AzCliCommandParser._add_argument(group, arg)
+                else:
+                    param = AzCliCommandParser._add_argument(self, arg)
+            except argparse.ArgumentError as ex:
+                raise CLIError("command authoring error for '{}': '{}' {}".format(
+                    command_name, ex.args[0].dest, ex.message))  # pylint: disable=no-member
+            param.completer = arg.completer
+            param.deprecate_info = arg.deprecate_info
+        self.set_defaults(
+            _command_validator=command_validator,
+            _argument_validators=argument_validators)
+
+    def load_pending_arguments(self):
+        """Adds the arguments of a command parser that load_command_table created without them."""
+        if self._pending_arguments:
+            pending_arguments, self._pending_arguments = self._pending_arguments, None
+            self._add_command_arguments(*pending_arguments)
+
+    def parse_known_args(self, args=None, namespace=None):
+        self.load_pending_arguments()
+        return super(AzCliCommandParser, self).parse_known_args(args, namespace)
 
     def validation_error(self, message):
         telemetry.set_user_fault('validation error')
@@ -0,0 +1,181 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+""" Startup profiler, enabled with `az --profile-startup [json:|chrome:]PATH COMMAND`.
+
+Records how long the phases of a command take (importing and loading the command modules, loading the arguments,
+building the parser, validation, creating clients, HTTP requests and formatting the output) and writes them when the
+command finishes, either as a tree of nested spans (json) or in the Chrome trace event format (chrome), which
+chrome://tracing and Perfetto open.
+"""
+
+import json
+import os
+import threading
+import timeit
+from contextlib import contextmanager
+
+PROFILE_STARTUP_FLAG = '--profile-startup'
+PROFILE_FORMATS = ['json', 'chrome']
+
+_profiler = None
+
+
+class StartupProfiler(object):
+
+    def __init__(self, start_time=None):
+        self.start_time = start_time if start_time is not None else timeit.default_timer()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def record(self, name, category, start, end, **args):
+        """ Records a span that has already finished, nested in the span open on the current thread. """
+        stack = self._stack()
+        span = {'name': name, 'category': category, 'start': start, 'end': end, 'args': args,
+                'parent': stack[-1] if stack else None, 'thread': threading.current_thread().ident}
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name, category, **args):
+        span = self.record(name, category, timeit.default_timer(), None, **args)
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            stack.pop()
+            span['end'] = timeit.default_timer()
+
+    def _finished_spans(self):
+        """ Returns (span, finished copy) pairs. Spans still open, like the one of the whole command, end now. """
+        end = timeit.default_timer()
+        with self._lock:
+            spans = list(self.spans)
+        return [(s, dict(s, end=s['end'] if s['end'] is not None else end)) for s in spans], end
+
+    def to_json(self):
+        spans, end = self._finished_spans()
+        nodes = {}
+        roots = []
+        for original, span in spans:
+            node = {'name': span['name'],
+                    'category': span['category'],
+                    'start': round(span['start'] - self.start_time, 6),
+                    'duration': round(span['end'] - span['start'], 6),
+                    'children': []}
+            if span['args']:
+                node['args'] = span['args']
+            nodes[id(original)] = node
+            parent = nodes.get(id(span['parent'])) if span['parent'] is not None else None
+            (parent['children'] if parent else roots).append(node)
+
+        return {'duration': round(end - self.start_time, 6),
+                'categories': _get_category_totals(roots),
+                'spans': roots}
+
+    def to_chrome_trace(self):
+        spans, _ = self._finished_spans()
+        pid = os.getpid()
+        events = []
+        for _, span in spans:
+            event = {'name': span['name'],
+                     'cat': span['category'],
+                     'ph': 'X',
+                     'ts': round((span['start'] - self.start_time) * 1e6, 3),
+                     'dur': round((span['end'] - span['start']) * 1e6, 3),
+                     'pid': pid,
+                     'tid': span['thread']}
+            if span['args']:
+                event['args'] = span['args']
+            events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path, profile_format='json'):
+        report = self.to_chrome_trace() if profile_format == 'chrome' else self.to_json()
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2 if profile_format == 'json' else None)
+
+
+def _get_category_totals(nodes, totals=None, counted=()):
+    """ Seconds spent per category. Spans nested in a span of the same category aren't counted twice. """
+    totals = {} if totals is None else totals
+    for node in nodes:
+        category = node['category']
+        if category not in counted:
+            totals[category] = round(totals.get(category, 0) + node['duration'], 6)
+        _get_category_totals(node['children'], totals, counted + (category,))
+    return totals
+
+
+def pop_profile_startup_arg(args):
+    """ Removes `--profile-startup [FORMAT:]PATH` from the arguments. Returns (format, path), or None if absent.
+
+    The flag is only looked for before the command words, e.g. `az --profile-startup PATH vm list`, so that the
+    arguments of the command, which may be the value of another option or come after `--`, are left alone.
+    """
+    for i, arg in enumerate(args):
+        if arg == '--' or not arg.startswith('-'):
+            break
+        if arg == PROFILE_STARTUP_FLAG:
+            if i + 1 >= len(args):
+                raise ValueError('{} requires a file path.'.format(PROFILE_STARTUP_FLAG))
+            value = args[i + 1]
+            del args[i:i + 2]
+        elif arg.startswith(PROFILE_STARTUP_FLAG + '='):
+            value = arg.split('=', 1)[1]
+            del args[i]
+        else:
+            continue
+        profile_format, sep, path = value.partition(':')
+        if not sep or profile_format not in PROFILE_FORMATS:
+            # a plain path, which may itself contain a colon like 'C:\profile.json'
+            profile_format, path = PROFILE_FORMATS[0], value
+        if not path:
+            raise ValueError('{} requires a file path.'.format(PROFILE_STARTUP_FLAG))
+        return profile_format, path
+    return None
+
+
+def enable_profiler(start_time=None):
+    global _profiler  # pylint: disable=global-statement
+    _profiler = StartupProfiler(start_time)
+    return _profiler
+
+
+def disable_profiler():
+    global _profiler  # pylint: disable=global-statement
+    _profiler = None
+
+
+def get_profiler():
+    return _profiler
+
+
+@contextmanager
+def profile(name, category, **args):
+    """ Records the enclosed block as a span when the profiler is enabled. Does nothing otherwise. """
+    if _profiler is None:
+        yield None
+    else:
+        with _profiler.span(name, category, **args) as span:
+            yield span
+
+
+def record_http_response(response, *args, **kwargs):  # pylint: disable=unused-argument
+    """ A requests response hook recording the time a request waited on its response. The query string is left out
+    as it may hold secrets. """
+    if _profiler is not None and response.elapsed is not None:
+        end = timeit.default_timer()
+        request = response.request
+        _profiler.record('{} {}'.format(request.method, request.path_url.split('?')[0]), 'http',
+                         end - response.elapsed.total_seconds(), end, status_code=response.status_code)
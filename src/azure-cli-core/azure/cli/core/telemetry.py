@@ -382,8 +382,8 @@ def _get_installation_id():
 @decorators.call_once
 @decorators.suppress_all_exceptions(fallback_return=None)
 def _get_profile():
-    from azure.cli.core._profile import Profile
-    return Profile(cli_ctx=_session.application)
+    from azure.cli.core._profile import get_profile
+    return get_profile(_session.application)
 
 
 @decorators.suppress_all_exceptions(fallback_return='')
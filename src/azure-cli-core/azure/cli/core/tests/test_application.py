@@ -55,6 +55,24 @@ class TestApplication(unittest.TestCase):
         self.assertIn('x-ms-client-request-id', cli.data['headers'])
         self.assertNotEquals(old_id, cli.data['headers']['x-ms-client-request-id'])
 
+    def test_command_failed_in_part_exits_with_its_exit_code(self):
+        from knack.util import CommandResultItem
+
+        def _handler(args):
+            return CommandResultItem(['vnet1'], exit_code=1)
+
+        class TestCommandsLoader(AzCommandsLoader):
+
+            def load_command_table(self, args):
+                super(TestCommandsLoader, self).load_command_table(args)
+                self.command_table = {'test': AzCliCommand(self, 'test', _handler)}
+                return self.command_table
+
+        cli = DummyCli(commands_loader_cls=TestCommandsLoader)
+        with open(os.devnull, 'w') as out_file:
+            self.assertEqual(cli.invoke(['test'], out_file=out_file), 1)
+        self.assertEqual(cli.result.result, ['vnet1'])
+
     def test_application_register_and_call_handlers(self):
         handler_called = [False]
 
@@ -119,6 +137,28 @@ class TestApplication(unittest.TestCase):
 
         os.remove(f.name)
 
+    def test_run_jobs_concurrently_keeps_input_order(self):
+        import time
+        from azure.cli.core.commands import AzCliCommandInvoker
+
+        def _run_job(self, expanded_arg, cmd_copy):
+            # later jobs finish first
+            time.sleep(0.01 * (5 - expanded_arg))
+            if expanded_arg % 2:
+                raise CLIError('failed {}'.format(expanded_arg))
+            return expanded_arg
+
+        cli = DummyCli()
+        invoker = AzCliCommandInvoker(cli_ctx=cli)
+        ids = ['id{}'.format(i) for i in range(6)]
+        with mock.patch.object(AzCliCommandInvoker, '_run_job', _run_job), \
+                mock.patch.object(cli.config, 'getint', return_value=4) as getint:
+            results, exceptions = invoker._run_jobs_concurrently([(i, None) for i in range(6)], ids)
+        getint.assert_called_once_with('core', 'max_concurrent_ids', fallback=10)
+        self.assertEqual(results, [0, 2, 4])
+        self.assertEqual([(str(ex), id_arg) for ex, id_arg in exceptions],
+                         [('failed 1', 'id1'), ('failed 3', 'id3'), ('failed 5', 'id5')])
+
 
 if __name__ == '__main__':
     unittest.main()
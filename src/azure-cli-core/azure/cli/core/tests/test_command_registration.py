@@ -3,6 +3,7 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import os
 import sys
 import logging
 import mock
@@ -416,5 +417,99 @@ class TestCommandRegistration(unittest.TestCase):
         self.assertFalse('help' in cmd_arg.options)
 
 
+class TestCommandIndex(unittest.TestCase):
+
+    loaded_modules = []
+
+    def setUp(self):
+        import tempfile
+        from azure.cli.core._session import Session
+        self.index_dir = tempfile.mkdtemp()
+        self.index = Session()
+        self.index.load(os.path.join(self.index_dir, 'commandIndex.json'))
+        TestCommandIndex.loaded_modules = []
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.index_dir, ignore_errors=True)
+
+    @staticmethod
+    def sample_command():
+        pass
+
+    def _mock_import_lib(_):
+        mock_obj = mock.MagicMock()
+        mock_obj.__path__ = __name__
+        return mock_obj
+
+    def _mock_iter_modules(_):
+        return [(None, 'mod_a', None), (None, 'mod_b', None)]
+
+    def _mock_load_command_loader(loader, args, name, prefix):
+
+        class TestCommandsLoader(AzCommandsLoader):
+
+            def load_command_table(self, args):
+                super(TestCommandsLoader, self).load_command_table(args)
+                group_name = {'mod_a': 'alpha', 'mod_b': 'beta'}[name]
+                with self.command_group(group_name,
+                                        operations_tmpl='{}#TestCommandIndex.{{}}'.format(__name__)) as g:
+                    g.command('show', 'sample_command')
+                return self.command_table
+
+        TestCommandIndex.loaded_modules.append(name)
+        command_loader = TestCommandsLoader(cli_ctx=loader.cli_ctx)
+        loader.loaders.append(command_loader)
+        return command_loader.load_command_table(args), {}
+
+    def _load(self, args):
+        loader = MainCommandsLoader(DummyCli())
+        with mock.patch('azure.cli.core._session.INDEX', self.index):
+            return loader.load_command_table(args)
+
+    @mock.patch('importlib.import_module', _mock_import_lib)
+    @mock.patch('pkgutil.iter_modules', _mock_iter_modules)
+    @mock.patch('azure.cli.core.commands._load_command_loader', _mock_load_command_loader)
+    @mock.patch('azure.cli.core.extension.get_extensions', lambda: [])
+    def test_command_index_loads_only_owning_module(self):
+        # a cold run loads everything and builds the index
+        cmd_tbl = self._load(['beta', 'show'])
+        self.assertEqual(sorted(cmd_tbl), ['alpha show', 'beta show'])
+        self.assertEqual(TestCommandIndex.loaded_modules, ['mod_a', 'mod_b'])
+        self.assertEqual(self.index['commandIndex']['beta'], {'modules': ['mod_b'], 'extensions': []})
+
+        # a warm run only loads the module providing the command
+        TestCommandIndex.loaded_modules = []
+        cmd_tbl = self._load(['beta', 'show'])
+        self.assertEqual(list(cmd_tbl), ['beta show'])
+        self.assertEqual(TestCommandIndex.loaded_modules, ['mod_b'])
+
+        # commands requiring the full command table bypass the index
+        TestCommandIndex.loaded_modules = []
+        self._load(['--help'])
+        self.assertEqual(TestCommandIndex.loaded_modules, ['mod_a', 'mod_b'])
+
+    @mock.patch('importlib.import_module', _mock_import_lib)
+    @mock.patch('pkgutil.iter_modules', _mock_iter_modules)
+    @mock.patch('azure.cli.core.commands._load_command_loader', _mock_load_command_loader)
+    @mock.patch('azure.cli.core.extension.get_extensions', lambda: [])
+    def test_command_index_falls_back_when_stale(self):
+        self._load(['alpha', 'show'])
+
+        # the index points at the wrong module
+        self.index.data['commandIndex']['alpha']['modules'] = ['mod_b']
+        TestCommandIndex.loaded_modules = []
+        cmd_tbl = self._load(['alpha', 'show'])
+        self.assertEqual(sorted(cmd_tbl), ['alpha show', 'beta show'])
+        self.assertEqual(TestCommandIndex.loaded_modules, ['mod_b', 'mod_a', 'mod_b'])
+        self.assertEqual(self.index['commandIndex']['alpha']['modules'], ['mod_a'])
+
+        # the index was built by a different CLI version
+        self.index.data['signature']['version'] = '0.0.1'
+        TestCommandIndex.loaded_modules = []
+        self._load(['alpha', 'show'])
+        self.assertEqual(TestCommandIndex.loaded_modules, ['mod_a', 'mod_b'])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,141 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import argparse
+import io
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from azure.cli.core._session import Session
+from azure.cli.core.commands import AzCliCommand
+from azure.cli.core.completion_cache import (complete_from_cache, get_completion_values, get_visible_command_names,
+                                             record_completion)
+from azure.cli.core.decorators import Completer
+from azure.cli.core.mock import DummyCli
+from azure.cli.core.parser import AzCliCommandParser
+
+
+@Completer
+def _name_completer(cmd, prefix, namespace):  # pylint: disable=unused-argument
+    return ['vm1', 'vm2']
+
+
+class TestCompletionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.config_dir, ignore_errors=True)
+        env_patch = mock.patch.dict('os.environ', {'AZURE_CONFIG_DIR': self.config_dir, '_ARGCOMPLETE': '1'})
+        env_patch.start()
+        self.addCleanup(env_patch.stop)
+        self._new_session()
+
+    def _new_session(self):
+        session_patch = mock.patch('azure.cli.core._session.COMPLETION', Session())
+        session_patch.start()
+        self.addCleanup(session_patch.stop)
+
+    def _record(self, invoked_command):
+        def _handler():
+            pass
+
+        cli = DummyCli()
+        cli.config.config_dir = self.config_dir
+        cli.loader = mock.MagicMock()
+        cli.loader.cli_ctx = cli
+
+        command = AzCliCommand(cli.loader, 'test command', _handler)
+        command.add_argument('opt', '--opt', choices=['one', 'two'])
+        command.add_argument('name', '--name', completer=_name_completer)
+        command.add_argument('hidden', '--hidden', help=argparse.SUPPRESS)
+        command.add_argument('flag', '--flag', action='store_true')
+        cli.commands_loader.command_table = {'test command': command,
+                                             'test other': AzCliCommand(cli.loader, 'test other', _handler),
+                                             'misc': AzCliCommand(cli.loader, 'misc', _handler)}
+        cli.commands_loader.command_name = invoked_command
+
+        names = get_visible_command_names(cli.commands_loader)
+        parser = AzCliCommandParser(cli)
+        parser.load_command_table(cli.commands_loader)
+        record_completion(cli, names, None, parser)
+        # complete_from_cache() runs in a new process, which reads the cache from the disk
+        self._new_session()
+
+    def _complete(self, comp_line):
+        output = io.BytesIO()
+        # argcomplete writes its debug output to file descriptor 9, which is pytest's; let it fall back to stderr
+        with mock.patch.dict('os.environ', {'COMP_LINE': comp_line, 'COMP_POINT': str(len(comp_line))}), \
+                mock.patch('os.fdopen', side_effect=OSError):
+            if not complete_from_cache(output):
+                return None
+        return sorted(output.getvalue().decode('utf-8').split('\013'))
+
+    def test_complete_from_cache(self):
+        self.assertIsNone(self._complete('az te'))
+        self._record('test command')
+
+        self.assertEqual(self._complete('az '), ['--help', '-h', 'misc', 'test'])
+        self.assertEqual(self._complete('az te'), ['test '])
+        self.assertEqual(self._complete('az test '), ['--help', '-h', 'command', 'other'])
+        self.assertEqual(self._complete('az test command --'), ['--flag', '--help', '--name', '--opt'])
+        self.assertEqual(self._complete('az test command --flag --opt '), ['one', 'two'])
+        self.assertEqual(self._complete('az test command --opt T'), ['two '])
+
+        # the values of completers of command modules come from the CLI, as do commands whose parser wasn't recorded
+        self.assertIsNone(self._complete('az test command --name '))
+        self.assertIsNone(self._complete('az test other --'))
+        self.assertIsNone(self._complete('az unknown '))
+
+    def test_complete_from_cache_invalidated(self):
+        self._record('test command')
+        with mock.patch('azure.cli.core.__version__', '0.0.1'):
+            self.assertIsNone(self._complete('az test '))
+        with mock.patch.dict('os.environ', {'AZURE_CORE_USE_COMPLETION_CACHE': 'false'}):
+            self.assertIsNone(self._complete('az test '))
+        with mock.patch.dict('os.environ', {'AZURE_CLOUD_NAME': 'AzureChinaCloud'}):
+            self.assertIsNone(self._complete('az test '))
+        self.assertEqual(self._complete('az test '), ['--help', '-h', 'command', 'other'])
+
+    def test_completion_values_are_cached(self):
+        cmd = mock.MagicMock()
+        cmd.name = 'vm show'
+        cmd.cli_ctx.config.config_dir = self.config_dir
+        cmd.cli_ctx.config.getint.return_value = 300
+        action = argparse.Namespace(dest='vm_name')
+        namespace = argparse.Namespace(_subscription='sub1', resource_group_name='rg1', _cmd=cmd)
+        get_values = mock.MagicMock(return_value=['vm1', 'vm2'])
+
+        with mock.patch('time.time', return_value=1000):
+            for _ in range(2):
+                self.assertEqual(get_completion_values(cmd, action, namespace, get_values), ['vm1', 'vm2'])
+        self.assertEqual(get_values.call_count, 1)
+
+        # other arguments and other subscriptions have their own values
+        with mock.patch('time.time', return_value=1000):
+            namespace.resource_group_name = 'rg2'
+            get_completion_values(cmd, action, namespace, get_values)
+            namespace._subscription = 'sub2'  # pylint: disable=protected-access
+            get_completion_values(cmd, action, namespace, get_values)
+        self.assertEqual(get_values.call_count, 3)
+
+        # the values expire
+        with mock.patch('time.time', return_value=1300):
+            get_completion_values(cmd, action, namespace, get_values)
+        self.assertEqual(get_values.call_count, 3)
+        with mock.patch('time.time', return_value=1301):
+            get_completion_values(cmd, action, namespace, get_values)
+        self.assertEqual(get_values.call_count, 4)
+
+        # a TTL of 0 disables the cache
+        cmd.cli_ctx.config.getint.return_value = 0
+        get_completion_values(cmd, action, namespace, get_values)
+        self.assertEqual(get_values.call_count, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -502,5 +502,60 @@ class TestHelpLoads(unittest.TestCase):
             return f.name
 
 
+class TestHelpCache(unittest.TestCase):
+
+    def setUp(self):
+        from azure.cli.core._session import Session
+        self.config_dir = tempfile.mkdtemp()
+        self.cli_ctx = mock.MagicMock()
+        self.cli_ctx.config.config_dir = self.config_dir
+        self.cli_ctx.config.getboolean.return_value = True
+        session_patch = mock.patch('azure.cli.core._session.HELP', Session())
+        session_patch.start()
+        self.addCleanup(session_patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+
+    def test_help_cache(self):
+        from azure.cli.core._help import HelpCache
+        from azure.cli.core._session import HELP
+        import yaml
+
+        text = """
+            type: command
+            short-summary: Create a thing.
+            examples:
+                - name: Create a thing.
+                  text: az thing create
+                  min_profile: 2017-03-09
+            """
+        help_cache = HelpCache(self.cli_ctx)
+        data = help_cache.load('thing create', text)
+        self.assertEqual(data['short-summary'], 'Create a thing.')
+        self.assertEqual(data['examples'][0]['min_profile'], '2017-03-09')
+        help_cache.save()
+
+        # the next invocation reads the stored help
+        HELP.filename = None
+        with mock.patch('yaml.load', side_effect=yaml.load) as yaml_load:
+            self.assertEqual(HelpCache(self.cli_ctx).load('thing create', text), data)
+            yaml_load.assert_not_called()
+
+            # help that changed since is parsed again
+            data = HelpCache(self.cli_ctx).load('thing create', text.replace('a thing', 'another thing'))
+            self.assertEqual(data['short-summary'], 'Create another thing.')
+            self.assertEqual(yaml_load.call_count, 1)
+
+        # another CLI version drops the stored help
+        with mock.patch('azure.cli.core.__version__', '0.0.1'):
+            HELP.filename = None
+            help_cache = HelpCache(self.cli_ctx)
+            help_cache.load('thing list', 'short-summary: List things.')
+            help_cache.save()
+        HELP.filename = None
+        self.assertEqual(list(HELP.get('help')), ['thing list'])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,136 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import unittest
+
+import mock
+
+from azure.cli.core.commands import LongRunningOperation, MultiLongRunningOperation
+from azure.cli.core.commands.client_factory import _get_poll_interval, configure_common_settings
+from azure.cli.core.mock import DummyCli
+
+from knack.util import CLIError
+
+
+class _TestPoller(object):
+
+    def __init__(self, polls_before_done, correlation_id=None, result=None, exception=None):
+        self.polls_before_done = polls_before_done
+        self._result = 'result' if result is None else result
+        self._exception = exception
+        self.wait_calls = []
+        self._response = mock.MagicMock()
+        self._response.__dict__['_content'] = json.dumps(
+            {'properties': {'correlationId': correlation_id}} if correlation_id else {}).encode()
+
+    def done(self):
+        return not self.polls_before_done
+
+    def wait(self, timeout=None):
+        self.wait_calls.append(timeout)
+        self.polls_before_done -= 1
+
+    def result(self):
+        if self._exception:
+            raise self._exception
+        return self._result
+
+
+class TestLongRunningOperation(unittest.TestCase):
+
+    def test_long_running_operation_waits_on_poller(self):
+        cli = DummyCli()
+        poller = _TestPoller(3)
+        with mock.patch('time.sleep') as sleep_mock:
+            result = LongRunningOperation(cli, poller_done_interval_ms=500.0)(poller)
+        self.assertEqual(result, 'result')
+        self.assertEqual(poller.wait_calls, [0.5, 0.5, 0.5])
+        sleep_mock.assert_not_called()
+
+    def test_long_running_operation_sleeps_when_the_poller_cannot_be_waited_on(self):
+        from msrestazure.azure_exceptions import CloudError
+
+        class _PollerWithoutWait(object):
+            def __init__(self):
+                self.polls = [False, False, True]
+
+            def done(self):
+                return self.polls.pop(0)
+
+            def result(self):  # pylint: disable=no-self-use
+                return 'result'
+
+        cli = DummyCli()
+        failed_poller = _TestPoller(1)
+        failed_poller.wait = mock.MagicMock(side_effect=CloudError(mock.MagicMock(status_code=400), 'failed'))
+        broken_poller = _TestPoller(1)
+        broken_poller.wait = mock.MagicMock(side_effect=TypeError('unexpected keyword argument'))
+        with mock.patch('time.sleep') as sleep_mock:
+            operation = LongRunningOperation(cli, poller_done_interval_ms=500.0)
+            # the failure of the operation is raised by result()
+            operation._delay(failed_poller)
+            sleep_mock.assert_not_called()
+            # any other error doesn't have the caller poll in a tight loop
+            operation._delay(broken_poller)
+            sleep_mock.assert_called_once_with(0.5)
+            self.assertEqual(operation(_PollerWithoutWait()), 'result')
+        self.assertEqual(sleep_mock.call_count, 3)
+
+    def test_long_running_operation_reads_correlation_id_once(self):
+        self.assertEqual(LongRunningOperation._get_correlation_id(_TestPoller(0, 'abc')), 'abc')
+        self.assertIsNone(LongRunningOperation._get_correlation_id(_TestPoller(0)))
+
+        cli = DummyCli()
+        poller = _TestPoller(2, 'abc')
+        with mock.patch.object(LongRunningOperation, '_get_correlation_id', return_value='abc') as get_id_mock:
+            LongRunningOperation(cli)(poller)
+        get_id_mock.assert_called_once_with(poller)
+
+    def test_multi_long_running_operation_returns_results_in_order(self):
+        cli = DummyCli()
+        pollers = [_TestPoller(2, result='a'), _TestPoller(0, result='b'), _TestPoller(1, result='c')]
+        with mock.patch.object(cli, 'get_progress_controller') as controller_mock:
+            results = MultiLongRunningOperation(cli)(pollers)
+        self.assertEqual(results, ['a', 'b', 'c'])
+        # waits on the first pending poller only, then moves on to whichever is still running
+        self.assertEqual([len(p.wait_calls) for p in pollers], [2, 0, 1])
+        controller = controller_mock.return_value
+        controller.begin.assert_called_once_with(value=0, total_val=3)
+        controller.add.assert_any_call(message='Running (1/3 completed)', value=1, total_val=3)
+        controller.end.assert_called_once_with()
+
+    def test_multi_long_running_operation_raises_after_all_complete(self):
+        from msrest.exceptions import ClientException
+
+        cli = DummyCli()
+        pollers = [_TestPoller(0, exception=ClientException('bad request')), _TestPoller(2)]
+        with mock.patch.object(cli, 'get_progress_controller'):
+            with self.assertRaises(CLIError) as ex:
+                MultiLongRunningOperation(cli)(pollers)
+        self.assertIn('bad request', str(ex.exception))
+        self.assertTrue(pollers[1].done())
+
+    def test_get_poll_interval(self):
+        cli = DummyCli()
+        for value, expected in [(None, None), ('5', 5), ('0', None), ('fast', None)]:
+            with mock.patch.object(cli.config, 'get', return_value=value):
+                self.assertEqual(_get_poll_interval(cli), expected)
+
+    def test_throttled_requests_are_retried(self):
+        from msrestazure import AzureConfiguration
+        client = mock.MagicMock()
+        client.config = AzureConfiguration('https://management.azure.com')
+        configure_common_settings(DummyCli(), client)
+        retry = client.config.retry_policy()
+        # whatever the method, as the service didn't act on a throttled request, and with or without a Retry-After
+        for method in ['GET', 'PUT', 'POST', 'DELETE']:
+            self.assertTrue(retry.is_retry(method, 429))
+            self.assertTrue(retry.is_retry(method, 429, has_retry_after=True))
+        self.assertFalse(retry.is_retry('POST', 409))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -76,6 +76,52 @@ class TestParser(unittest.TestCase):
         parser.parse_args('test command'.split())
         self.assertTrue(AzCliCommandParser.error.called)
 
+    def test_arguments_added_for_invoked_command_only(self):
+        def test_handler(args):  # pylint: disable=unused-argument
+            pass
+
+        cli = DummyCli()
+        cli.loader = mock.MagicMock()
+        cli.loader.cli_ctx = cli
+
+        command = AzCliCommand(cli.loader, 'test command', test_handler)
+        command.add_argument('req', '--req', required=True)
+        command2 = AzCliCommand(cli.loader, 'test other', test_handler)
+        command2.add_argument('opt', '--opt')
+        cli.commands_loader.command_table = {'test command': command, 'test other': command2}
+
+        def _get_options(command_parser):
+            return [o for a in command_parser._actions for o in a.option_strings]  # pylint: disable=protected-access
+
+        # only the invoked command gets its arguments
+        cli.commands_loader.command_name = 'test command'
+        parser = AzCliCommandParser(cli)
+        parser.load_command_table(cli.commands_loader)
+        choices = parser.subparsers[('test',)].choices
+        self.assertIn('--req', _get_options(choices['command']))
+        self.assertEqual(_get_options(choices['other']), ['-h', '--help'])
+        self.assertFalse(choices['other'].is_group())
+
+        # a parser left without arguments adds them once it is used
+        args = parser.parse_args('test other --opt yep'.split())
+        self.assertIs(args.func, command2)
+        self.assertEqual(args.opt, 'yep')
+        self.assertEqual(_get_options(choices['other']).count('--opt'), 1)
+
+        # for a group, every command parser gets its arguments when it is used
+        cli.commands_loader.command_name = 'test'
+        parser = AzCliCommandParser(cli)
+        parser.load_command_table(cli.commands_loader)
+        self.assertEqual(_get_options(parser.subparsers[('test',)].choices['command']), ['-h', '--help'])
+        args = parser.parse_args('test command --req yep'.split())
+        self.assertIs(args.func, command)
+        self.assertEqual(args.req, 'yep')
+
+        # as does one whose command help is shown
+        other = parser.subparsers[('test',)].choices['other']
+        other.load_pending_arguments()
+        self.assertEqual(_get_options(other), ['-h', '--help', '--opt'])
+
     def test_nargs_parameter(self):
         def test_handler():
             pass
@@ -17,7 +17,7 @@ from azure.mgmt.resource.subscriptions.models import \
     (SubscriptionState, Subscription, SubscriptionPolicies, SpendingLimit)
 
 from azure.cli.core._profile import (Profile, CredsCache, SubscriptionFinder,
-                                     ServicePrincipalAuth, _AUTH_CTX_FACTORY)
+                                     ServicePrincipalAuth, _AUTH_CTX_FACTORY, get_profile)
 from azure.cli.core.mock import DummyCli
 
 from knack.util import CLIError
@@ -1561,6 +1561,91 @@ class TestProfile(unittest.TestCase):
 
         self.assertTrue(re.findall(r'bad error for you', str(context.exception)))
 
+    def test_get_profile_is_shared_per_cli_ctx(self):
+        cli = DummyCli()
+        profile = get_profile(cli)
+        self.assertIs(get_profile(cli), profile)
+        self.assertIsNot(get_profile(DummyCli()), profile)
+
+    def test_get_login_credentials_reuses_credentials(self):
+        cli = DummyCli()
+        storage_mock = {'subscriptions': None}
+        profile = Profile(cli_ctx=cli, storage=storage_mock, use_global_creds_cache=False, async_persist=False)
+        consolidated = profile._normalize_properties(self.user1, [self.subscription1, self.subscription2], False)
+        profile._set_subscriptions(consolidated)
+
+        cred, subscription_id, _ = profile.get_login_credentials()
+        self.assertIs(profile.get_login_credentials()[0], cred)
+        self.assertEqual(subscription_id, '1')
+        self.assertIsNot(profile.get_login_credentials(resource='https://graph.windows.net/')[0], cred)
+
+        # switching the active subscription must not hand out credentials of the previous one
+        profile.set_active_subscription('2')
+        cred2, subscription_id, _ = profile.get_login_credentials()
+        self.assertIsNot(cred2, cred)
+        self.assertEqual(subscription_id, '2')
+
+    def test_credscache_reuse_service_principal_token(self):
+        import datetime
+        import shutil
+        import stat
+        import tempfile
+        cli = DummyCli()
+        token_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, token_dir, ignore_errors=True)
+        token_file = os.path.join(token_dir, 'accessTokens.json')
+        with open(token_file, 'w') as f:
+            json.dump([{
+                "servicePrincipalId": "myapp",
+                "servicePrincipalTenant": "mytenant",
+                "accessToken": "Secret"
+            }], f)
+
+        def _token_entry(token, expires_in):
+            return {
+                "tokenType": "Bearer",
+                "accessToken": token,
+                "expiresIn": expires_in,
+                "expiresOn": str(datetime.datetime.now() + datetime.timedelta(seconds=expires_in))
+            }
+
+        mock_auth_context = mock.MagicMock()
+        mock_auth_context.acquire_token_with_client_credentials.return_value = _token_entry('token1', 3599)
+        with mock.patch.dict('os.environ', {'AZURE_ACCESS_TOKEN_FILE': token_file}):
+            creds_cache = CredsCache(cli, lambda _, _1, _2: mock_auth_context, async_persist=False)
+
+            # action
+            _, token, _ = creds_cache.retrieve_token_for_service_principal('myapp', 'resource1', 'mytenant')
+            _, token2, _ = creds_cache.retrieve_token_for_service_principal('myapp', 'resource1', 'mytenant')
+
+            # assert the token is reused and persisted with the same permissions as the credentials
+            self.assertEqual((token, token2), ('token1', 'token1'))
+            self.assertEqual(mock_auth_context.acquire_token_with_client_credentials.call_count, 1)
+            sp_token_file = os.path.join(token_dir, 'servicePrincipalAccessTokens.json')
+            if os.name != 'nt':
+                self.assertEqual(stat.S_IMODE(os.stat(sp_token_file).st_mode), 0o600)
+
+            # a different resource needs its own token
+            creds_cache.retrieve_token_for_service_principal('myapp', 'resource2', 'mytenant')
+            self.assertEqual(mock_auth_context.acquire_token_with_client_credentials.call_count, 2)
+
+            # a new process picks up the persisted token
+            creds_cache = CredsCache(cli, lambda _, _1, _2: mock_auth_context, async_persist=False)
+            _, token, _ = creds_cache.retrieve_token_for_service_principal('myapp', 'resource1', 'mytenant')
+            self.assertEqual(token, 'token1')
+            self.assertEqual(mock_auth_context.acquire_token_with_client_credentials.call_count, 2)
+
+            # a token close to expiry is renewed
+            creds_cache.sp_token_cache[('myapp', 'mytenant', 'resource1')].update(_token_entry('token1', 60))
+            mock_auth_context.acquire_token_with_client_credentials.return_value = _token_entry('token3', 3599)
+            _, token, _ = creds_cache.retrieve_token_for_service_principal('myapp', 'resource1', 'mytenant')
+            self.assertEqual(token, 'token3')
+            self.assertEqual(mock_auth_context.acquire_token_with_client_credentials.call_count, 3)
+
+            # logging out drops the cached tokens
+            creds_cache.remove_cached_creds('myapp')
+            self.assertEqual(creds_cache.sp_token_cache, {})
+
     def test_service_principal_auth_client_secret(self):
         sp_auth = ServicePrincipalAuth('verySecret!')
         result = sp_auth.get_entry_to_persist('sp_id1', 'tenant1')
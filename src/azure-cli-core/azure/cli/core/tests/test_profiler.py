@@ -0,0 +1,115 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from knack.util import CommandResultItem
+
+from azure.cli.core import AzCommandsLoader
+from azure.cli.core._output import AzOutputProducer
+from azure.cli.core.commands import AzCliCommand
+from azure.cli.core.mock import DummyCli
+from azure.cli.core.profiler import (StartupProfiler, pop_profile_startup_arg, enable_profiler, disable_profiler,
+                                     profile)
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        disable_profiler()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_pop_profile_startup_arg(self):
+        args = ['--profile-startup', 'profile.json', 'vm', 'list', '-o', 'table']
+        self.assertEqual(pop_profile_startup_arg(args), ('json', 'profile.json'))
+        self.assertEqual(args, ['vm', 'list', '-o', 'table'])
+
+        args = ['--debug', '--profile-startup=chrome:trace.json', 'vm', 'list']
+        self.assertEqual(pop_profile_startup_arg(args), ('chrome', 'trace.json'))
+        self.assertEqual(args, ['--debug', 'vm', 'list'])
+
+        self.assertEqual(pop_profile_startup_arg(['--profile-startup', r'C:\profile.json']),
+                         ('json', r'C:\profile.json'))
+        self.assertIsNone(pop_profile_startup_arg(['vm', 'list']))
+        with self.assertRaises(ValueError):
+            pop_profile_startup_arg(['--profile-startup'])
+
+        # the arguments of the command are left alone, whether values of its options or after '--'
+        for args in [['vm', 'list', '--profile-startup', 'profile.json'],
+                     ['vm', 'run-command', 'invoke', '--scripts', '--profile-startup=x'],
+                     ['--', '--profile-startup', 'profile.json']]:
+            expected = list(args)
+            self.assertIsNone(pop_profile_startup_arg(args))
+            self.assertEqual(args, expected)
+
+    def test_profiler_reports(self):
+        with mock.patch('timeit.default_timer', side_effect=[0.0, 0.0, 1.0, 1.5, 2.0, 3.0, 4.0, 4.0, 5.0, 5.0, 5.0]):
+            profiler = StartupProfiler()
+            with profiler.span('load command table', 'command_table'):
+                with profiler.span('import azure.cli.command_modules.vm', 'import'):
+                    pass
+                with profiler.span('load command table: vm', 'command_table', module='vm'):
+                    pass
+            with profiler.span('execute', 'execution'):
+                pass
+            report = profiler.to_json()
+
+        self.assertEqual(report['duration'], 5.0)
+        self.assertEqual(report['categories'], {'command_table': 4.0, 'import': 0.5, 'execution': 1.0})
+        self.assertEqual([span['name'] for span in report['spans']], ['load command table', 'execute'])
+        children = report['spans'][0]['children']
+        self.assertEqual([(c['name'], c['start'], c['duration']) for c in children],
+                         [('import azure.cli.command_modules.vm', 1.0, 0.5),
+                          ('load command table: vm', 2.0, 1.0)])
+        self.assertEqual(children[1]['args'], {'module': 'vm'})
+
+        events = profiler.to_chrome_trace()['traceEvents']
+        self.assertEqual([(e['name'], e['ph'], e['ts'], e['dur']) for e in events],
+                         [('load command table', 'X', 0.0, 4e6), ('import azure.cli.command_modules.vm', 'X', 1e6, 5e5),
+                          ('load command table: vm', 'X', 2e6, 1e6), ('execute', 'X', 4e6, 1e6)])
+
+    def test_profile_invocation(self):
+        def _handler(args):
+            with profile('work', 'test'):
+                return {'a': 1}
+
+        class TestCommandsLoader(AzCommandsLoader):
+
+            def load_command_table(self, args):
+                super(TestCommandsLoader, self).load_command_table(args)
+                self.command_table = {'test': AzCliCommand(self, 'test', _handler)}
+                return self.command_table
+
+        # nothing is recorded unless the profiler is enabled
+        with profile('work', 'test') as span:
+            self.assertIsNone(span)
+
+        profiler = enable_profiler()
+        with open(os.devnull, 'w') as out_file:
+            DummyCli(commands_loader_cls=TestCommandsLoader).invoke(['test'], out_file=out_file)
+            AzOutputProducer(DummyCli()).out(CommandResultItem({'a': 1}), formatter=AzOutputProducer.format_none,
+                                             out_file=out_file)
+        path = os.path.join(self.temp_dir, 'profile.json')
+        profiler.write(path)
+        with open(path) as f:
+            report = json.load(f)
+
+        self.assertEqual([span['name'] for span in report['spans']],
+                         ['load command table', 'load arguments', 'build parser', 'parse arguments', 'validate',
+                          'execute', 'format output'])
+        self.assertEqual(report['spans'][5]['children'][0]['name'], 'work')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import shutil
+import tempfile
+import threading
+import unittest
+
+import mock
+
+from azure.cli.core._session import Session
+from azure.cli.core.commands.arm import (CachedResourceType, find_provider_resource_types,
+                                         get_provider_resource_types, warm_provider_cache)
+
+
+def _mock_provider(namespace, resource_types):
+    provider = mock.MagicMock()
+    provider.namespace = namespace
+    provider.resource_types = []
+    for name, api_versions in resource_types.items():
+        rt = mock.MagicMock(spec=['resource_type', 'api_versions'])
+        rt.resource_type = name
+        rt.api_versions = api_versions
+        provider.resource_types.append(rt)
+    return provider
+
+
+class TestProviderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.cli_ctx = mock.MagicMock()
+        self.cli_ctx.config.config_dir = self.config_dir
+        self.cli_ctx.config.getint.return_value = 3600
+        self.cli_ctx.cloud.name = 'AzureCloud'
+        self.client = mock.MagicMock()
+        self.client.config.subscription_id = '00000000-0000-0000-0000-000000000000'
+        self.client.providers.get.side_effect = lambda namespace: _mock_provider(
+            namespace, {'vaults': ['2018-02-14', '2016-10-01']})
+        session_patch = mock.patch('azure.cli.core._session.PROVIDERS', Session())
+        session_patch.start()
+        self.addCleanup(session_patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+
+    def test_provider_is_retrieved_once(self):
+        for _ in range(3):
+            resource_types = get_provider_resource_types(self.cli_ctx, self.client, 'Microsoft.KeyVault')
+            self.assertEqual([(rt.resource_type, rt.api_versions) for rt in resource_types],
+                             [('vaults', ['2018-02-14', '2016-10-01'])])
+            # the service didn't specify a default API version
+            self.assertIsNone(resource_types[0].default_api_version)
+        self.client.providers.get.assert_called_once_with('Microsoft.KeyVault')
+
+        # another subscription has its own entry
+        self.client.config.subscription_id = '11111111-1111-1111-1111-111111111111'
+        get_provider_resource_types(self.cli_ctx, self.client, 'microsoft.keyvault')
+        self.assertEqual(self.client.providers.get.call_count, 2)
+
+    def test_provider_cache_expires(self):
+        with mock.patch('time.time', return_value=1000):
+            get_provider_resource_types(self.cli_ctx, self.client, 'Microsoft.KeyVault')
+        with mock.patch('time.time', return_value=4600):
+            get_provider_resource_types(self.cli_ctx, self.client, 'Microsoft.KeyVault')
+        self.assertEqual(self.client.providers.get.call_count, 1)
+        with mock.patch('time.time', return_value=4601):
+            get_provider_resource_types(self.cli_ctx, self.client, 'Microsoft.KeyVault')
+        self.assertEqual(self.client.providers.get.call_count, 2)
+
+        # a TTL of 0 disables the cache
+        self.cli_ctx.config.getint.return_value = 0
+        get_provider_resource_types(self.cli_ctx, self.client, 'Microsoft.KeyVault')
+        self.assertEqual(self.client.providers.get.call_count, 3)
+
+    def test_concurrent_lookups(self):
+        from concurrent.futures import ThreadPoolExecutor
+        storage_retrieved = threading.Event()
+
+        def _get(namespace):
+            if namespace == 'Microsoft.KeyVault':
+                # the retrieval of another provider isn't blocked while this one is in flight
+                self.assertTrue(storage_retrieved.wait(5))
+            else:
+                storage_retrieved.set()
+            return _mock_provider(namespace, {'vaults': ['2018-02-14']})
+
+        self.client.providers.get.side_effect = _get
+        namespaces = ['Microsoft.KeyVault'] * 3 + ['Microsoft.Storage']
+        with ThreadPoolExecutor(max_workers=len(namespaces)) as executor:
+            list(executor.map(lambda n: get_provider_resource_types(self.cli_ctx, self.client, n), namespaces))
+        # and concurrent lookups of the same provider retrieve it once
+        self.assertEqual(sorted(c[0][0] for c in self.client.providers.get.call_args_list),
+                         ['Microsoft.KeyVault', 'Microsoft.Storage'])
+
+    def test_find_provider_resource_types_refreshes_on_unknown_type(self):
+        self.assertEqual(len(find_provider_resource_types(self.cli_ctx, self.client, 'Microsoft.KeyVault', 'Vaults')),
+                         1)
+        self.assertEqual(find_provider_resource_types(self.cli_ctx, self.client, 'Microsoft.KeyVault', 'hsms'), [])
+        self.assertEqual(self.client.providers.get.call_count, 2)
+
+    def test_warm_provider_cache(self):
+        self.client.providers.list.return_value = [
+            _mock_provider('Microsoft.KeyVault', {'vaults': ['2018-02-14']}),
+            _mock_provider('Microsoft.Storage', {'storageAccounts': ['2018-07-01']})]
+        warm_provider_cache(self.cli_ctx, self.client)
+
+        resource_types = get_provider_resource_types(self.cli_ctx, self.client, 'Microsoft.Storage')
+        self.assertEqual(resource_types[0].api_versions, ['2018-07-01'])
+        self.client.providers.get.assert_not_called()
+
+    def test_cached_resource_types(self):
+        provider = _mock_provider('Microsoft.Web', {'sites': ['2018-02-01', '2016-08-01']})
+        provider.resource_types[0].locations = ['West US', 'East US']
+        provider.resource_types[0].default_api_version = '2016-08-01'
+        self.client.providers.get.side_effect = lambda namespace: provider
+
+        for _ in range(2):
+            rt = get_provider_resource_types(self.cli_ctx, self.client, 'Microsoft.Web')[0]
+            self.assertIsInstance(rt, CachedResourceType)
+            self.assertEqual((rt.resource_type, rt.api_versions, rt.locations, rt.default_api_version),
+                             ('sites', ['2018-02-01', '2016-08-01'], ['West US', 'East US'], '2016-08-01'))
+        self.assertEqual(self.client.providers.get.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -87,3 +87,32 @@ def patch_long_run_operation_delay(unit_test):
     mock_in_unit_test(unit_test,
                       'azure.cli.core.commands.LongRunningOperation._delay',
                       _shortcut_long_run_operation)
+
+
+def patch_provider_cache(unit_test):
+    def _disable_provider_cache(*args, **kwargs):  # pylint: disable=unused-argument
+        # providers cached by an earlier test would change the API versions a recording expects
+        return 0
+
+    mock_in_unit_test(unit_test,
+                      'azure.cli.core.commands.arm.get_provider_cache_ttl',
+                      _disable_provider_cache)
+
+
+def patch_config_dir(unit_test):
+    """
+    Files commands keep in the config dir while they run, like caches, are written to a directory of the test's own,
+    so that a test sends the requests it recorded whichever tests ran before it.
+    """
+    import shutil
+    import tempfile
+
+    config = unit_test.cli_ctx.config
+    original_config_dir = config.config_dir
+    config.config_dir = tempfile.mkdtemp()
+
+    def _restore_config_dir():
+        shutil.rmtree(config.config_dir, ignore_errors=True)
+        config.config_dir = original_config_dir
+
+    unit_test.addCleanup(_restore_config_dir)
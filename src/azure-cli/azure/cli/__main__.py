@@ -3,15 +3,22 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
-import sys
-import uuid
+import timeit
+# taken before anything else is imported, so that --profile-startup covers the imports
+START_TIME = timeit.default_timer()
 
-from knack.completion import ARGCOMPLETE_ENV_NAME
-from knack.log import get_logger
+# pylint: disable=wrong-import-position
+import os  # noqa: E402
+import sys  # noqa: E402
+import uuid  # noqa: E402
 
-from azure.cli.core import get_default_cli
+from knack.completion import ARGCOMPLETE_ENV_NAME  # noqa: E402
+from knack.log import get_logger  # noqa: E402
 
-import azure.cli.core.telemetry as telemetry
+from azure.cli.core import get_default_cli  # noqa: E402
+from azure.cli.core import profiler  # noqa: E402
+
+import azure.cli.core.telemetry as telemetry  # noqa: E402
 
 
 # A workaround for https://bugs.python.org/issue32502 (https://github.com/Azure/azure-cli/issues/5184)
@@ -26,17 +33,39 @@ logger = get_logger(__name__)
 
 
 def cli_main(cli, args):
-    return cli.invoke(args)
+    # the span is named after the parsed command, never after the arguments, whose values may hold secrets
+    with profiler.profile('az', 'command') as span:
+        try:
+            return cli.invoke(args)
+        finally:
+            if span is not None and cli.data['command'] not in (None, 'unknown'):
+                span['name'] = 'az {}'.format(cli.data['command'])
 
 
-az_cli = get_default_cli()
+args = sys.argv[1:]
+try:
+    profile_startup = profiler.pop_profile_startup_arg(args)
+except ValueError as ex:
+    sys.stderr.write('{}\n'.format(ex))
+    sys.exit(2)
+if profile_startup:
+    profiler.enable_profiler(START_TIME).record('import azure.cli.core', 'import', START_TIME, timeit.default_timer())
+
+if ARGCOMPLETE_ENV_NAME in os.environ:
+    # answer tab completion from the completion cache when it can, without creating the CLI
+    from azure.cli.core.completion_cache import complete_from_cache
+    if complete_from_cache():
+        sys.exit(0)
+
+with profiler.profile('create CLI', 'startup'):
+    az_cli = get_default_cli()
 
 telemetry.set_application(az_cli, ARGCOMPLETE_ENV_NAME)
 
 try:
     telemetry.start()
 
-    exit_code = cli_main(az_cli, sys.argv[1:])
+    exit_code = cli_main(az_cli, args)
 
     if exit_code and exit_code != 0:
         telemetry.set_failure()
@@ -49,3 +78,5 @@ except KeyboardInterrupt:
     sys.exit(1)
 finally:
     telemetry.conclude()
+    if profile_startup:
+        profiler.get_profiler().write(profile_startup[1], profile_startup[0])
@@ -7,8 +7,16 @@ import tarfile
 import os
 import re
 import codecs
+import logging
+import stat
+import threading
+import time
+import zlib
+from collections import deque
 from io import open
+from multiprocessing import cpu_count
 import requests
+from six.moves import queue
 from knack.log import get_logger
 from knack.util import CLIError
 from msrestazure.azure_exceptions import CloudError
@@ -18,28 +26,24 @@ from ._constants import TASK_VALID_VSTS_URLS
 
 logger = get_logger(__name__)
 
+# the size of the blocks of the tar stream compressed in parallel
+_COMPRESSION_BLOCK_SIZE = 1024 * 1024
+# the number of compressed blocks waiting to be uploaded
+_MAX_PENDING_UPLOAD_BLOCKS = 16
+
+_COMMON_VCS_IGNORE_LIST = {'.git', '.gitignore', '.bzr', 'bzrignore', '.hg', '.hgignore', '.svn'}
+# Python 2.7 supports at most 100 groups in a regular expression
+_MAX_RULES_PER_PATTERN = 90
+# the characters of an ignore rule which aren't matched literally
+_RULE_WILDCARD_REGEX = re.compile(r"[*?\[\]\\(){}|+^$]")
+
 
 def upload_source_code(client,
                        registry_name,
                        resource_group_name,
                        source_location,
-                       tar_file_path,
                        docker_file_path,
                        docker_file_in_tar):
-    _pack_source_code(source_location,
-                      tar_file_path,
-                      docker_file_path,
-                      docker_file_in_tar)
-
-    size = os.path.getsize(tar_file_path)
-    unit = 'GiB'
-    for S in ['Bytes', 'KiB', 'MiB', 'GiB']:
-        if size < 1024:
-            unit = S
-            break
-        size = size / 1024.0
-
-    logger.warning("Uploading archived source code from '%s'...", tar_file_path)
     upload_url = None
     relative_path = None
     try:
@@ -53,58 +57,73 @@ def upload_source_code(client,
     if not upload_url:
         raise CLIError("Failed to get a SAS URL to upload context.")
 
-    account_name, endpoint_suffix, container_name, blob_name, sas_token = get_blob_info(upload_url)
-    BlockBlobService(account_name=account_name,
-                     sas_token=sas_token,
-                     endpoint_suffix=endpoint_suffix).create_blob_from_path(
-                         container_name=container_name,
-                         blob_name=blob_name,
-                         file_path=tar_file_path)
+    # The archive is uploaded in blocks while it's being packed, so no temporary file is written.
+    logger.warning("Uploading archived source code from '%s'...", source_location)
+    archive = _ArchiveStream()
+    packer = threading.Thread(target=_pack_source_code,
+                              args=(source_location, archive, docker_file_path, docker_file_in_tar))
+    packer.daemon = True
+    packer.start()
+    try:
+        account_name, endpoint_suffix, container_name, blob_name, sas_token = get_blob_info(upload_url)
+        BlockBlobService(account_name=account_name,
+                         sas_token=sas_token,
+                         endpoint_suffix=endpoint_suffix).create_blob_from_stream(
+                             container_name=container_name,
+                             blob_name=blob_name,
+                             stream=archive)
+    finally:
+        # stops the packing if the upload failed
+        archive.abort()
+        packer.join()
+
+    size = archive.size
+    unit = 'GiB'
+    for S in ['Bytes', 'KiB', 'MiB', 'GiB']:
+        if size < 1024:
+            unit = S
+            break
+        size = size / 1024.0
+
     logger.warning("Sending context ({0:.3f} {1}) to registry: {2}...".format(
         size, unit, registry_name))
     return relative_path
 
 
-def _pack_source_code(source_location, tar_file_path, docker_file_path, docker_file_in_tar):
+def _pack_source_code(source_location, archive, docker_file_path, docker_file_in_tar):
+    """ Writes the tar.gz of the source code to `archive`, an _ArchiveStream. Runs on its own thread while the
+    archive is uploaded. """
+    from concurrent.futures import ThreadPoolExecutor
+    try:
+        max_workers = cpu_count()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            gzip_stream = _ParallelGzipStream(archive, executor, max_pending=max_workers * 2)
+            _pack_source_code_into(source_location, gzip_stream, docker_file_path, docker_file_in_tar)
+            gzip_stream.flush()
+    except Exception as ex:  # pylint: disable=broad-except
+        archive.close(error=ex)
+    else:
+        archive.close()
+
+
+def _pack_source_code_into(source_location, fileobj, docker_file_path, docker_file_in_tar):
     logger.warning("Packing source code into tar to upload...")
 
     ignore_list, ignore_list_size = _load_dockerignore_file(source_location)
-    common_vcs_ignore_list = {'.git', '.gitignore', '.bzr', 'bzrignore', '.hg', '.hgignore', '.svn'}
-
-    def _ignore_check(tarinfo, parent_ignored, parent_matching_rule_index):
-        # ignore common vcs dir or file
-        if tarinfo.name in common_vcs_ignore_list:
-            logger.warning("Excluding '%s' based on default ignore rules", tarinfo.name)
-            return True, parent_matching_rule_index
-
-        if ignore_list is None:
-            # if .dockerignore doesn't exists, inherit from parent
-            # eg, it will ignore the files under .git folder.
-            return parent_ignored, parent_matching_rule_index
-
-        for index, item in enumerate(ignore_list):
-            # stop checking the remaining rules whose priorities are lower than the parent matching rule
-            # at this point, current item should just inherit from parent
-            if index >= parent_matching_rule_index:
-                break
-            if re.match(item.pattern, tarinfo.name):
-                logger.debug(".dockerignore: rule '%s' matches '%s'.",
-                             item.rule, tarinfo.name)
-                return item.ignore, index
-
-        logger.debug(".dockerignore: no rule for '%s'. parent ignore '%s'",
-                     tarinfo.name, parent_ignored)
-        # inherit from parent
-        return parent_ignored, parent_matching_rule_index
+    ignore_rules = _IgnoreRules(ignore_list)
+    stats = {'files': 0, 'bytes': 0, 'excluded': 0, 'skipped_dirs': 0}
+    start_time = time.time()
 
-    with tarfile.open(tar_file_path, "w:gz") as tar:
+    # an uncompressed tar stream, which _ParallelGzipStream compresses
+    with tarfile.open(fileobj=fileobj, mode="w|") as tar:
         # need to set arcname to empty string as the archive root path
         _archive_file_recursively(tar,
                                   source_location,
                                   arcname="",
                                   parent_ignored=False,
                                   parent_matching_rule_index=ignore_list_size,
-                                  ignore_check=_ignore_check)
+                                  ignore_rules=ignore_rules,
+                                  stats=stats)
 
         # Add the Dockerfile if it's specified.
         # In the case of run, there will be no Dockerfile.
@@ -114,6 +133,110 @@ def _pack_source_code(source_location, tar_file_path, docker_file_path, docker_f
             with open(docker_file_path, "rb") as f:
                 tar.addfile(docker_file_tarinfo, f)
 
+    logger.info("Packed %d files and directories (%d bytes) in %.3f seconds. Excluded %d, of which %d directories "
+                "weren't scanned.", stats['files'], stats['bytes'], time.time() - start_time, stats['excluded'],
+                stats['skipped_dirs'])
+
+
+class _ArchiveStream(object):
+    """ A pipe from the thread packing the source code to the upload, which reads it as a non-seekable stream. At most
+    `max_chunks` written chunks are held in memory; the writer waits for the upload to read them. """
+
+    def __init__(self, max_chunks=_MAX_PENDING_UPLOAD_BLOCKS):
+        self._chunks = queue.Queue(max_chunks)
+        self._buffer = b''
+        self._end_of_stream = False
+        self._aborted = threading.Event()
+        self._position = 0
+        self.size = 0
+
+    def _put(self, item):
+        while not self._aborted.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise IOError("The upload of the source code stopped.")
+
+    def write(self, data):
+        if data:
+            self._put(bytes(data))
+            self.size += len(data)
+
+    def close(self, error=None):
+        """ Ends the stream. If packing failed, reading it raises `error`. """
+        try:
+            self._put(error)
+        except IOError:
+            pass  # nothing reads the stream anymore
+
+    def abort(self):
+        """ Makes further writes fail, so the writer stops once the upload has stopped reading. """
+        self._aborted.set()
+
+    def read(self, size=-1):
+        while not self._end_of_stream and (size < 0 or len(self._buffer) < size):
+            item = self._chunks.get()
+            if isinstance(item, bytes):
+                self._buffer += item
+            else:
+                self._end_of_stream = True
+                if item is not None:
+                    raise item  # pylint: disable=raising-bad-type
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self._position += len(data)
+        return data
+
+    def tell(self):
+        return self._position
+
+    @staticmethod
+    def seekable():
+        return False
+
+
+def _gzip_compress(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class _ParallelGzipStream(object):
+    """ Gzips what is written to it into `fileobj`, compressing blocks of it in parallel on `executor`. Each block
+    becomes a gzip member of its own, and a gzip stream of several members decompresses to their concatenation. """
+
+    def __init__(self, fileobj, executor, max_pending, block_size=_COMPRESSION_BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.executor = executor
+        self.max_pending = max_pending
+        self.block_size = block_size
+        self._buffer = []
+        self._buffer_size = 0
+        self._pending = deque()
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffer_size += len(data)
+        if self._buffer_size >= self.block_size:
+            self._compress_buffer()
+
+    def _compress_buffer(self):
+        self._pending.append(self.executor.submit(_gzip_compress, b''.join(self._buffer)))
+        self._buffer = []
+        self._buffer_size = 0
+        # the members are written in order, as soon as they are compressed
+        while len(self._pending) > self.max_pending or (self._pending and self._pending[0].done()):
+            self.fileobj.write(self._pending.popleft().result())
+
+    def flush(self):
+        if self._buffer:
+            self._compress_buffer()
+        while self._pending:
+            self.fileobj.write(self._pending.popleft().result())
+
 
 class IgnoreRule(object):  # pylint: disable=too-few-public-methods
     def __init__(self, rule):
@@ -143,6 +266,74 @@ class IgnoreRule(object):  # pylint: disable=too-few-public-methods
         self.pattern += "$"
 
 
+class _IgnoreRules(object):
+    """ The default ignore rules and the rules of .dockerignore, if any. The .dockerignore rules are compiled into one
+    regular expression, an alternative per rule in priority order, so each path is matched once rather than against each
+    rule in turn. """
+
+    def __init__(self, ignore_list):
+        self.ignore_list = ignore_list
+        self._debug = logger.isEnabledFor(logging.DEBUG)
+        # (index of the first rule, pattern of the rules from it)
+        self._patterns = []
+        # (index, literal start) of the exception rules, whose matches can be under an ignored directory
+        self._exception_prefixes = []
+        if not ignore_list:
+            return
+
+        for start in range(0, len(ignore_list), _MAX_RULES_PER_PATTERN):
+            rules = ignore_list[start:start + _MAX_RULES_PER_PATTERN]
+            self._patterns.append((start, re.compile("|".join(
+                "(?P<r{}>{})".format(index, item.pattern) for index, item in enumerate(rules, start)))))
+        for index, item in enumerate(ignore_list):
+            if not item.ignore:
+                self._exception_prefixes.append((index, _RULE_WILDCARD_REGEX.split(item.rule[1:], 1)[0]))
+
+    def _match(self, name, max_rule_index):
+        """ Returns the index of the first rule before `max_rule_index` that matches `name`, or None. """
+        for start, pattern in self._patterns:
+            if start >= max_rule_index:
+                break
+            match = pattern.match(name)
+            if match:
+                # the outermost group of the first alternative that matched
+                index = int(match.lastgroup[1:])
+                return index if index < max_rule_index else None
+        return None
+
+    def check(self, name, parent_ignored, parent_matching_rule_index):
+        """ Returns whether `name` is ignored, and the index of the rule that decides it. """
+        # ignore common vcs dir or file
+        if name in _COMMON_VCS_IGNORE_LIST:
+            logger.warning("Excluding '%s' based on default ignore rules", name)
+            return True, parent_matching_rule_index
+
+        if self.ignore_list is None:
+            # if .dockerignore doesn't exists, inherit from parent
+            # eg, it will ignore the files under .git folder.
+            return parent_ignored, parent_matching_rule_index
+
+        # the rules whose priorities are lower than the parent matching rule aren't checked, as the item just
+        # inherits from parent for them
+        index = self._match(name, parent_matching_rule_index)
+        if index is not None:
+            if self._debug:
+                logger.debug(".dockerignore: rule '%s' matches '%s'.", self.ignore_list[index].rule, name)
+            return self.ignore_list[index].ignore, index
+
+        if self._debug:
+            logger.debug(".dockerignore: no rule for '%s'. parent ignore '%s'", name, parent_ignored)
+        # inherit from parent
+        return parent_ignored, parent_matching_rule_index
+
+    def may_include_children(self, name, matching_rule_index):
+        """ Returns whether an exception rule of a higher priority than the rule ignoring the directory `name` can
+        include an item under it. """
+        prefix = name + "/" if name else ""
+        return any(index < matching_rule_index and (rule_prefix.startswith(prefix) or prefix.startswith(rule_prefix))
+                   for index, rule_prefix in self._exception_prefixes)
+
+
 def _load_dockerignore_file(source_location):
     # reference: https://docs.docker.com/engine/reference/builder/#dockerignore-file
     docker_ignore_file = os.path.join(source_location, ".dockerignore")
@@ -169,31 +360,41 @@ def _load_dockerignore_file(source_location):
     return ignore_list, len(ignore_list)
 
 
-def _archive_file_recursively(tar, name, arcname, parent_ignored, parent_matching_rule_index, ignore_check):
-    # create a TarInfo object from the file
-    tarinfo = tar.gettarinfo(name, arcname)
+def _archive_file_recursively(tar, name, arcname, parent_ignored, parent_matching_rule_index, ignore_rules, stats):
+    # check if the file/dir is ignored, by its name in the archive
+    ignored, matching_rule_index = ignore_rules.check(
+        arcname.replace(os.sep, "/"), parent_ignored, parent_matching_rule_index)
 
-    if tarinfo is None:
-        raise CLIError("tarfile: unsupported type {}".format(name))
+    if not ignored:
+        # create a TarInfo object from the file
+        tarinfo = tar.gettarinfo(name, arcname)
 
-    # check if the file/dir is ignored
-    ignored, matching_rule_index = ignore_check(
-        tarinfo, parent_ignored, parent_matching_rule_index)
+        if tarinfo is None:
+            raise CLIError("tarfile: unsupported type {}".format(name))
 
-    if not ignored:
         # append the tar header and data to the archive
         if tarinfo.isreg():
             with open(name, "rb") as f:
                 tar.addfile(tarinfo, f)
         else:
             tar.addfile(tarinfo)
-
-    # even the dir is ignored, its child items can still be included, so continue to scan
-    if tarinfo.isdir():
+        stats['files'] += 1
+        stats['bytes'] += tarinfo.size
+        is_dir = tarinfo.isdir()
+    else:
+        stats['excluded'] += 1
+        is_dir = stat.S_ISDIR(os.lstat(name).st_mode)
+
+    if is_dir:
+        # even the dir is ignored, its child items can still be included by an exception rule, so continue to scan
+        # unless there's no such rule
+        if ignored and not ignore_rules.may_include_children(arcname.replace(os.sep, "/"), matching_rule_index):
+            stats['skipped_dirs'] += 1
+            return
         for f in os.listdir(name):
             _archive_file_recursively(tar, os.path.join(name, f), os.path.join(arcname, f),
                                       parent_ignored=ignored, parent_matching_rule_index=matching_rule_index,
-                                      ignore_check=ignore_check)
+                                      ignore_rules=ignore_rules, stats=stats)
 
 
 def check_remote_source_code(source_location):
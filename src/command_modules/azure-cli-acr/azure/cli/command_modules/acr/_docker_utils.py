@@ -9,9 +9,12 @@ except ImportError:
     from urllib import urlencode
     from urlparse import urlparse, urlunparse
 
+import os
+import threading
 import time
-from json import loads
-from base64 import b64encode
+from json import dumps, loads
+from base64 import b64encode, urlsafe_b64decode
+from random import uniform
 import requests
 from requests import RequestException
 from requests.utils import to_native_string
@@ -40,19 +43,164 @@ ACCESS_TOKEN_PERMISSION = ['*', 'pull']
 AAD_TOKEN_BASE_ERROR_MESSAGE = "Unable to get AAD authorization tokens with message"
 ADMIN_USER_BASE_ERROR_MESSAGE = "Unable to get admin user credentials with message"
 
+# The registry responses worth retrying, as the request may succeed later
+RETRYABLE_STATUS_CODES = [408, 429, 500, 502, 503, 504]
+MAX_RETRY_DELAY_IN_SEC = 30
+
+REGISTRY_TOKEN_FILE_NAME = 'acrTokens.json'
+# Cached registry tokens are refreshed this many seconds before they expire
+REGISTRY_TOKEN_EXPIRATION_BUFFER = 300
+_REFRESH_TOKEN_SCOPE = 'refresh_token'
+_TOKEN_REQUEST_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+# the sessions to the registries and their token servers by host name, so the calls reuse the connections
+_sessions = {}
+_sessions_lock = threading.Lock()
+# the registry tokens obtained with AAD credentials, loaded from the config dir
+_registry_tokens = None
+# the cached access tokens handed out by this process, each with how to get a new one if the registry rejects it,
+# and the new tokens got in place of rejected ones
+_cached_token_renewals = {}
+_renewed_tokens = {}
+_token_renewal_lock = threading.Lock()
+
+
+def _get_session(url):
+    """Returns the keep-alive session shared by the calls to the host of `url`."""
+    host = urlparse(url).netloc.lower()
+    with _sessions_lock:
+        if host not in _sessions:
+            _sessions[host] = requests.Session()
+        return _sessions[host]
+
+
+def _get_token_expiry(token):
+    """Returns when a registry token, a JWT, expires, or None if it isn't known."""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return int(loads(urlsafe_b64decode(payload.encode('ascii')).decode('utf-8'))['exp'])
+    except (IndexError, KeyError, TypeError, ValueError, AttributeError):
+        return None
+
+
+def _get_registry_token_file(cli_ctx):
+    return os.path.join(cli_ctx.config.config_dir, REGISTRY_TOKEN_FILE_NAME)
+
+
+def _load_registry_tokens(cli_ctx):
+    global _registry_tokens  # pylint: disable=global-statement
+    if _registry_tokens is None:
+        try:
+            with open(_get_registry_token_file(cli_ctx), 'r') as f:
+                _registry_tokens = loads(f.read())
+        except (OSError, IOError, ValueError):
+            _registry_tokens = {}
+        # 'az logout' and 'az account clear' leave the file alone, so the tokens of the identities which were logged
+        # out since are dropped here
+        logged_in = _get_logged_in_identities(cli_ctx)
+        logged_out = [k for k in _registry_tokens if tuple(k.split('/', 2)[:2]) not in logged_in]
+        if logged_out:
+            for key in logged_out:
+                del _registry_tokens[key]
+            _save_registry_tokens(cli_ctx, _registry_tokens)
+    return _registry_tokens
+
+
+def _get_logged_in_identities(cli_ctx):
+    """Returns the (tenant, user) pairs of the accounts logged in, which registry tokens are keyed by."""
+    from azure.cli.core._profile import get_profile
+    identities = set()
+    for subscription in get_profile(cli_ctx).load_cached_subscriptions(all_clouds=True):
+        try:
+            identities.add((subscription['tenantId'], subscription['user']['name']))
+        except (KeyError, TypeError):
+            continue
+    return identities
+
+
+def _get_registry_token_key(cli_ctx, login_server, scope):
+    """Registry tokens are specific to the AAD identity they were exchanged for, so it's part of their key. None if
+    there's no identity, in which case the tokens aren't cached."""
+    from azure.cli.core._profile import get_profile
+    try:
+        subscription = get_profile(cli_ctx).get_subscription()
+        return '/'.join([subscription['tenantId'], subscription['user']['name'], login_server, scope])
+    except (CLIError, KeyError, TypeError):
+        return None
+
+
+def _get_cached_registry_token(cli_ctx, key):
+    """Returns the cached token of `key` and the realm of the token server, or (None, None)."""
+    entry = _load_registry_tokens(cli_ctx).get(key) if key else None
+    if entry and entry['expiresOn'] - REGISTRY_TOKEN_EXPIRATION_BUFFER > time.time():
+        return entry['token'], entry['realm']
+    return None, None
+
+
+def _cache_registry_token(cli_ctx, key, token, realm):
+    expires_on = _get_token_expiry(token)
+    if key is None or expires_on is None:
+        return
+    tokens = _load_registry_tokens(cli_ctx)
+    tokens[key] = {'token': token, 'realm': realm, 'expiresOn': expires_on}
+    _save_registry_tokens(cli_ctx, tokens)
+
+
+def _evict_registry_token(cli_ctx, key):
+    tokens = _load_registry_tokens(cli_ctx)
+    if key in tokens:
+        del tokens[key]
+        _save_registry_tokens(cli_ctx, tokens)
+
+
+def _save_registry_tokens(cli_ctx, tokens):
+    now = time.time()
+    for expired in [k for k, v in tokens.items() if v['expiresOn'] <= now]:
+        del tokens[expired]
+    try:
+        with os.fdopen(os.open(_get_registry_token_file(cli_ctx), os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600),
+                       'w') as f:
+            f.write(dumps(tokens))
+    except (OSError, IOError) as e:
+        logger.debug("Failed to persist registry tokens. Exception: %s", str(e))
+
+
+def _renew_cached_token(token):
+    """Returns a new access token in place of a cached one the registry rejected, e.g. as the permissions of the
+    identity changed, or None if the token wasn't cached. Each token is renewed once."""
+    with _token_renewal_lock:
+        if token not in _renewed_tokens:
+            renew = _cached_token_renewals.pop(token, None)
+            if not renew:
+                return None
+            _renewed_tokens[token] = renew()
+        return _renewed_tokens[token]
+
+
+def _get_token_scope(repository, artifact_repository, permission):
+    if repository:
+        return 'repository:{}:{}'.format(repository, permission)
+    elif artifact_repository:
+        return 'artifact-repository:{}:{}'.format(artifact_repository, permission)
+    # catalog only has * as permission, even for a read operation
+    return 'registry:catalog:*'
+
 
 def _get_aad_token(cli_ctx,
                    login_server,
                    only_refresh_token,
                    repository=None,
                    artifact_repository=None,
-                   permission=None):
+                   permission=None,
+                   use_cache=True):
     """Obtains refresh and access tokens for an AAD-enabled registry.
     :param str login_server: The registry login server URL to log in to
     :param bool only_refresh_token: Whether to ask for only refresh token, or for both refresh and access tokens
     :param str repository: Repository for which the access token is requested
     :param str artifact_repository: Artifact repository for which the access token is requested
     :param str permission: The requested permission on the repository, '*' or 'pull'
+    :param bool use_cache: Whether to reuse the tokens of earlier commands
     """
     if repository and artifact_repository:
         raise ValueError("Only one of repository and artifact_repository can be provided.")
@@ -64,7 +212,45 @@ def _get_aad_token(cli_ctx,
 
     login_server = login_server.rstrip('/')
 
-    challenge = requests.get('https://' + login_server + '/v2/', verify=(not should_disable_connection_verify()))
+    # The tokens of earlier commands are reused until shortly before they expire. 'acr login' always gets a new
+    # refresh token, as docker keeps using it after the command.
+    scope = None if only_refresh_token else _get_token_scope(repository, artifact_repository, permission)
+    if scope and use_cache:
+        access_token_key = _get_registry_token_key(cli_ctx, login_server, scope)
+        refresh_token_key = _get_registry_token_key(cli_ctx, login_server, _REFRESH_TOKEN_SCOPE)
+        access_token, _ = _get_cached_registry_token(cli_ctx, access_token_key)
+        if access_token:
+            logger.debug("Using the cached access token of registry '%s' for scope '%s'.", login_server, scope)
+
+            def _renew():
+                _evict_registry_token(cli_ctx, access_token_key)
+                _evict_registry_token(cli_ctx, refresh_token_key)
+                return _get_aad_token(cli_ctx, login_server, only_refresh_token, repository, artifact_repository,
+                                      permission, use_cache=False)
+
+            _cached_token_renewals[access_token] = _renew
+            return access_token
+        refresh_token, realm = _get_cached_registry_token(cli_ctx, refresh_token_key)
+        if refresh_token:
+            try:
+                return _get_access_token(cli_ctx, login_server, realm, refresh_token, scope)
+            except CLIError as e:
+                # e.g. the refresh token was revoked, in which case a new one is needed
+                logger.debug("The cached refresh token of registry '%s' was rejected. Exception: %s",
+                             login_server, str(e))
+                _evict_registry_token(cli_ctx, refresh_token_key)
+
+    refresh_token, realm = _get_refresh_token(cli_ctx, login_server)
+    if only_refresh_token:
+        return refresh_token
+    return _get_access_token(cli_ctx, login_server, realm, refresh_token, scope)
+
+
+def _get_refresh_token(cli_ctx, login_server):
+    """Exchanges the AAD token of the current account for a registry refresh token. Returns the refresh token and the
+    realm of the registry token server."""
+    challenge = _get_session('https://' + login_server).get(
+        'https://' + login_server + '/v2/', verify=(not should_disable_connection_verify()))
     if challenge.status_code not in [401] or 'WWW-Authenticate' not in challenge.headers:
         raise CLIError("Registry '{}' did not issue a challenge.".format(login_server))
 
@@ -79,14 +265,14 @@ def _get_aad_token(cli_ctx,
     if 'realm' not in params or 'service' not in params:
         raise CLIError("Registry '{}' does not support AAD login.".format(login_server))
 
-    authurl = urlparse(params['realm'])
+    realm = params['realm']
+    authurl = urlparse(realm)
     authhost = urlunparse((authurl[0], authurl[1], '/oauth2/exchange', '', '', ''))
 
-    from azure.cli.core._profile import Profile
-    profile = Profile(cli_ctx=cli_ctx)
+    from azure.cli.core._profile import get_profile
+    profile = get_profile(cli_ctx)
     creds, _, tenant = profile.get_raw_token()
 
-    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
     content = {
         'grant_type': 'access_token',
         'service': params['service'],
@@ -94,26 +280,23 @@ def _get_aad_token(cli_ctx,
         'access_token': creds[1]
     }
 
-    response = requests.post(authhost, urlencode(content), headers=headers,
-                             verify=(not should_disable_connection_verify()))
+    response = _get_session(authhost).post(authhost, urlencode(content), headers=_TOKEN_REQUEST_HEADERS,
+                                           verify=(not should_disable_connection_verify()))
 
     if response.status_code not in [200]:
         raise CLIError("Access to registry '{}' was denied. Response code: {}.".format(
             login_server, response.status_code))
 
     refresh_token = loads(response.content.decode("utf-8"))["refresh_token"]
-    if only_refresh_token:
-        return refresh_token
+    _cache_registry_token(cli_ctx, _get_registry_token_key(cli_ctx, login_server, _REFRESH_TOKEN_SCOPE),
+                          refresh_token, realm)
+    return refresh_token, realm
 
-    authhost = urlunparse((authurl[0], authurl[1], '/oauth2/token', '', '', ''))
 
-    if repository:
-        scope = 'repository:{}:{}'.format(repository, permission)
-    elif artifact_repository:
-        scope = 'artifact-repository:{}:{}'.format(artifact_repository, permission)
-    else:
-        # catalog only has * as permission, even for a read operation
-        scope = 'registry:catalog:*'
+def _get_access_token(cli_ctx, login_server, realm, refresh_token, scope):
+    """Exchanges a registry refresh token for an access token of `scope`."""
+    authurl = urlparse(realm)
+    authhost = urlunparse((authurl[0], authurl[1], '/oauth2/token', '', '', ''))
 
     content = {
         'grant_type': 'refresh_token',
@@ -121,14 +304,16 @@ def _get_aad_token(cli_ctx,
         'scope': scope,
         'refresh_token': refresh_token
     }
-    response = requests.post(authhost, urlencode(content), headers=headers,
-                             verify=(not should_disable_connection_verify()))
+    response = _get_session(authhost).post(authhost, urlencode(content), headers=_TOKEN_REQUEST_HEADERS,
+                                           verify=(not should_disable_connection_verify()))
 
     if response.status_code not in [200]:
         raise CLIError("Access to registry '{}' was denied. Response code: {}.".format(
             login_server, response.status_code))
 
-    return loads(response.content.decode("utf-8"))["access_token"]
+    access_token = loads(response.content.decode("utf-8"))["access_token"]
+    _cache_registry_token(cli_ctx, _get_registry_token_key(cli_ctx, login_server, scope), access_token, realm)
+    return access_token
 
 
 def _get_credentials(cmd,  # pylint: disable=too-many-statements
@@ -178,7 +363,7 @@ def _get_credentials(cmd,  # pylint: disable=too-many-statements
     # Validate the login server is reachable
     challenge = 'https://' + login_server + '/v2/'
     try:
-        requests.get(challenge, verify=(not should_disable_connection_verify()))
+        _get_session(challenge).get(challenge, verify=(not should_disable_connection_verify()))
     except RequestException as e:
         logger.debug("Could not connect to registry login server. Exception: %s", str(e))
         if resource_not_found:
@@ -316,7 +501,7 @@ def get_authorization_header(username, password):
     return {'Authorization': auth}
 
 
-def request_data_from_registry(http_method,
+def request_data_from_registry(http_method,  # pylint: disable=too-many-branches, too-many-statements
                                login_server,
                                path,
                                username,
@@ -326,7 +511,10 @@ def request_data_from_registry(http_method,
                                file_payload=None,
                                params=None,
                                retry_times=3,
-                               retry_interval=5):
+                               retry_interval=1):
+    """Calls the registry API, retrying with an exponential backoff of `retry_interval` seconds for errors which may
+    go away: connection errors and RETRYABLE_STATUS_CODES.
+    """
     if http_method not in ALLOWED_HTTP_METHOD:
         raise ValueError("Allowed http method: {}".format(ALLOWED_HTTP_METHOD))
 
@@ -339,15 +527,21 @@ def request_data_from_registry(http_method,
     if http_method in ['patch', 'put'] and not (json_payload or file_payload):
         raise ValueError("Non-empty payload is required for http method: {}".format(http_method))
 
+    if username == EMPTY_GUID:
+        # a cached token which an earlier call had to renew
+        password = _renewed_tokens.get(password, password)
     url = 'https://{}{}'.format(login_server, path)
     headers = get_authorization_header(username, password)
+    session = _get_session(url)
 
-    for i in range(0, retry_times):
+    i = 0
+    while i < retry_times:
         errorMessage = None
+        response = None
         try:
             if file_payload:
                 with open(file_payload, 'rb') as data_payload:
-                    response = requests.request(
+                    response = session.request(
                         method=http_method,
                         url=url,
                         headers=headers,
@@ -356,7 +550,7 @@ def request_data_from_registry(http_method,
                         verify=(not should_disable_connection_verify())
                     )
             else:
-                response = requests.request(
+                response = session.request(
                     method=http_method,
                     url=url,
                     headers=headers,
@@ -381,6 +575,13 @@ def request_data_from_registry(http_method,
             elif response.status_code == 204:
                 return None, None
             elif response.status_code == 401:
+                renewed_token = _renew_cached_token(password) if username == EMPTY_GUID else None
+                if renewed_token:
+                    logger.debug("The cached access token of registry '%s' was rejected. Retrying with a new one.",
+                                 login_server)
+                    password = renewed_token
+                    headers = get_authorization_header(username, password)
+                    continue
                 raise RegistryException(
                     parse_error_message('Authentication required.', response),
                     response.status_code)
@@ -396,18 +597,37 @@ def request_data_from_registry(http_method,
                 raise RegistryException(
                     parse_error_message('Failed to request data due to a conflict.', response),
                     response.status_code)
-            else:
-                raise Exception(parse_error_message('Could not {} the requested data.'.format(http_method), response))
+            elif response.status_code not in RETRYABLE_STATUS_CODES:
+                raise RegistryException(
+                    parse_error_message('Could not {} the requested data.'.format(http_method), response),
+                    response.status_code)
+            errorMessage = parse_error_message('Could not {} the requested data.'.format(http_method), response)
         except CLIError:
             raise
         except Exception as e:  # pylint: disable=broad-except
             errorMessage = str(e)
-            logger.debug('Retrying %s with exception %s', i + 1, errorMessage)
-            time.sleep(retry_interval)
+
+        if i + 1 < retry_times:
+            delay = _get_retry_delay(i, retry_interval, response)
+            logger.debug('Retrying %s in %.1f seconds with error %s', i + 1, delay, errorMessage)
+            time.sleep(delay)
+        i += 1
 
     raise CLIError(errorMessage)
 
 
+def _get_retry_delay(retry_count, retry_interval, response):
+    """Returns the Retry-After of the response if it has one, or else an exponential backoff with jitter, so
+    concurrent clients don't retry at once.
+    """
+    try:
+        return min(float(response.headers['Retry-After']), MAX_RETRY_DELAY_IN_SEC)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        pass
+    backoff = min(retry_interval * 2 ** retry_count, MAX_RETRY_DELAY_IN_SEC)
+    return uniform(backoff / 2.0, backoff)
+
+
 def parse_error_message(error_message, response):
     import json
     try:
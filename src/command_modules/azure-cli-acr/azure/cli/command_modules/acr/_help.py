@@ -345,6 +345,23 @@ examples:
     text: az acr repository list -n MyRegistry
 """
 
+helps['acr repository purge'] = """
+type: command
+short-summary: Delete the manifests and tags of a repository matching filters in an Azure Container Registry.
+long-summary: >
+    The manifests are deleted concurrently. Like 'acr repository delete', this deletes all associated layer data that
+    are not referenced by any other manifest in the container registry. Manifests whose delete is disabled are skipped.
+examples:
+  - name: Show what would be deleted, without deleting anything.
+    text: az acr repository purge -n MyRegistry --repository hello-world --older-than 30d --dry-run
+  - name: Delete the manifests last updated more than 30 days ago.
+    text: az acr repository purge -n MyRegistry --repository hello-world --older-than 30d
+  - name: Delete the manifests without tags last updated more than 7 days ago.
+    text: az acr repository purge -n MyRegistry --repository hello-world --older-than 7d --untagged
+  - name: Delete the tags starting with 'build-', and the manifests without tags, without prompting.
+    text: az acr repository purge -n MyRegistry --repository hello-world --tag-filter "build-.*" --untagged --yes
+"""
+
 helps['acr repository show'] = """
 type: command
 short-summary: Get the attributes of a repository or image in an Azure Container Registry.
@@ -102,6 +102,12 @@ def load_arguments(self, _):  # pylint: disable=too-many-statements
     with self.argument_context('acr repository untag') as c:
         c.argument('image', arg_type=image_by_tag_type)
 
+    with self.argument_context('acr repository purge') as c:
+        c.argument('older_than', help="Only purge the manifests last updated longer ago than this duration, in the format '30d', '12h', '1d12h' or '90m'.")
+        c.argument('tag_filter', help="Only purge the tags matching this regular expression, which must match the whole tag. A manifest is deleted when all its tags match, otherwise the matching tags are untagged.")
+        c.argument('untagged', help="Purge the manifests without tags. If --tag-filter is not specified, only those are purged.", action='store_true')
+        c.argument('dry_run', help="Show what would be purged without deleting anything.", action='store_true')
+
     with self.argument_context('acr create') as c:
         c.argument('registry_name', completer=None)
         c.argument('deployment_name', validator=None)
@@ -3,6 +3,7 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 from io import BytesIO
+import codecs
 import time
 from random import uniform
 import colorama
@@ -16,6 +17,7 @@ from ._azure_utils import get_blob_info
 logger = get_logger(__name__)
 
 DEFAULT_CHUNK_SIZE = 1024 * 4
+MAX_CHUNK_SIZE = 1024 * 1024 * 4
 DEFAULT_LOG_TIMEOUT_IN_SEC = 60 * 30  # 30 minutes
 
 
@@ -67,15 +69,11 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
     if not no_format:
         colorama.init()
 
-    stream = BytesIO()
+    log_tail = _LogTail()
+    poll_interval = _LogPollInterval()
     metadata = {}
     start = 0
-    end = byte_size - 1
     available = 0
-    sleep_time = 1
-    max_sleep_time = 15
-    num_fails = 0
-    num_fails_for_backoff = 3
     consecutive_sleep_in_sec = 0
 
     # Try to get the initial properties so there's no waiting.
@@ -87,97 +85,71 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
         available = props.properties.content_length
     except (AttributeError, AzureHttpError):
         pass
+    last_poll_time = time.time()
 
-    while (_blob_is_not_complete(metadata) or start < available):
-        while start < available:
-            # Success! Reset our polling backoff.
-            sleep_time = 1
-            num_fails = 0
-            consecutive_sleep_in_sec = 0
-
+    try:
+        while (_blob_is_not_complete(metadata) or start < available):
+            while start < available:
+                consecutive_sleep_in_sec = 0
+
+                # Read what is available, in chunks of at least byte_size and at most MAX_CHUNK_SIZE.
+                chunk_size = min(max(available - start, byte_size), MAX_CHUNK_SIZE)
+                chunk = BytesIO()
+                try:
+                    blob_service.get_blob_to_stream(
+                        container_name=container_name,
+                        blob_name=blob_name,
+                        start_range=start,
+                        end_range=start + chunk_size - 1,
+                        stream=chunk)
+                except AzureHttpError as ae:
+                    if ae.status_code != 404:
+                        raise CLIError(ae)
+
+                data = chunk.getvalue()
+                start += len(data)
+                log_tail.write(data)
+
+            previous_available = available
             try:
-                old_byte_size = len(stream.getvalue())
-                blob_service.get_blob_to_stream(
-                    container_name=container_name,
-                    blob_name=blob_name,
-                    start_range=start,
-                    end_range=end,
-                    stream=stream)
-
-                curr_bytes = stream.getvalue()
-                new_byte_size = len(curr_bytes)
-                amount_read = new_byte_size - old_byte_size
-                start += amount_read
-                end = start + byte_size - 1
-
-                # Only scan what's newly read. If nothing is read, default to 0.
-                min_scan_range = max(new_byte_size - amount_read - 1, 0)
-                for i in range(new_byte_size - 1, min_scan_range, -1):
-                    if curr_bytes[i - 1:i + 1] == b'\r\n':
-                        flush = curr_bytes[:i]  # won't print \n
-                        stream = BytesIO()
-                        stream.write(curr_bytes[i + 1:])
-                        print(flush.decode('utf-8', errors='ignore'))
-                        break
+                props = blob_service.get_blob_properties(
+                    container_name=container_name, blob_name=blob_name)
+                metadata = props.metadata
+                available = props.properties.content_length
             except AzureHttpError as ae:
                 if ae.status_code != 404:
                     raise CLIError(ae)
-            except KeyboardInterrupt:
-                curr_bytes = stream.getvalue()
-                if curr_bytes:
-                    print(curr_bytes.decode('utf-8', errors='ignore'))
-                return
+            except Exception as err:
+                raise CLIError(err)
 
-        try:
-            props = blob_service.get_blob_properties(
-                container_name=container_name, blob_name=blob_name)
-            metadata = props.metadata
-            available = props.properties.content_length
-        except AzureHttpError as ae:
-            if ae.status_code != 404:
-                raise CLIError(ae)
-        except KeyboardInterrupt:
-            if curr_bytes:
-                print(curr_bytes.decode('utf-8', errors='ignore'))
-            return
-        except Exception as err:
-            raise CLIError(err)
-
-        if consecutive_sleep_in_sec > timeout_in_seconds:
-            # Flush anything remaining in the buffer - this would be the case
-            # if the file has expired and we weren't able to detect any \r\n
-            curr_bytes = stream.getvalue()
-            if curr_bytes:
-                print(curr_bytes.decode('utf-8', errors='ignore'))
-
-            logger.warning("Failed to find any new logs in %d seconds. Client will stop polling for additional logs.",
-                           consecutive_sleep_in_sec)
-            return
+            now = time.time()
+            poll_interval.update(max(available - previous_available, 0), now - last_poll_time)
+            last_poll_time = now
 
-        # If no new data available but not complete, sleep before trying to process additional data.
-        if (_blob_is_not_complete(metadata) and start >= available):
-            num_fails += 1
+            if consecutive_sleep_in_sec > timeout_in_seconds:
+                # Flush anything remaining in the buffer - this would be the case
+                # if the file has expired and we weren't able to detect any \r\n
+                log_tail.flush()
 
-            logger.debug(
-                "Failed to find new content %d times in a row", num_fails)
-            if num_fails >= num_fails_for_backoff:
-                num_fails = 0
-                sleep_time = min(sleep_time * 2, max_sleep_time)
-                logger.debug("Resetting failure count to %d", num_fails)
+                logger.warning("Failed to find any new logs in %d seconds. "
+                               "Client will stop polling for additional logs.", consecutive_sleep_in_sec)
+                return
 
-            rnd = uniform(1, 2)  # 1.0 <= x < 2.0
-            total_sleep_time = sleep_time + rnd
-            consecutive_sleep_in_sec += total_sleep_time
-            logger.debug("Base sleep time: %d, random delay: %d, total: %d, consecutive: %d",
-                         sleep_time, rnd, total_sleep_time, consecutive_sleep_in_sec)
-            time.sleep(total_sleep_time)
+            # If no new data available but not complete, sleep before trying to process additional data.
+            if (_blob_is_not_complete(metadata) and start >= available):
+                sleep_time = poll_interval.get()
+                consecutive_sleep_in_sec += sleep_time
+                logger.debug("Log growth rate: %.1f bytes/s, sleep time: %.2f, consecutive: %.2f",
+                             poll_interval.rate, sleep_time, consecutive_sleep_in_sec)
+                time.sleep(sleep_time)
+    except KeyboardInterrupt:
+        log_tail.flush()
+        return
 
     # One final check to see if there's anything in the buffer to flush
     # E.g., metadata has been set and start == available, but the log file
     # didn't end in \r\n, so we were unable to flush out the final contents.
-    curr_bytes = stream.getvalue()
-    if curr_bytes:
-        print(curr_bytes.decode('utf-8', errors='ignore'))
+    log_tail.flush()
 
     build_status = _get_run_status(metadata).lower()
     logger.debug("status was: '%s'", build_status)
@@ -191,6 +163,66 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
             raise CLIError("Run was canceled")
 
 
+class _LogTail(object):
+    """ Prints the logs as they are read, up to their last \r\n. Only the text after it is kept, and the bytes are
+    decoded incrementally, so a character split between two reads is decoded once both are read. """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        self._pending = []
+
+    def write(self, data):
+        text = self._decoder.decode(data)
+        if not text:
+            return
+
+        index = text.rfind('\r\n')
+        if index >= 0:
+            # won't print \n
+            flush, rest = text[:index + 1], text[index + 2:]
+        elif text[0] == '\n' and self._pending and self._pending[-1][-1] == '\r':
+            # the \r\n is split between two reads
+            flush, rest = '', text[1:]
+        else:
+            self._pending.append(text)
+            return
+
+        print(''.join(self._pending) + flush)
+        self._pending = [rest] if rest else []
+
+    def flush(self):
+        text = ''.join(self._pending) + self._decoder.decode(b'', final=True)
+        self._pending = []
+        if text:
+            print(text)
+
+
+class _LogPollInterval(object):
+    """ The time to wait before polling for more logs: the time the logs are expected to take to grow by
+    `target_bytes`, from the rate they grew at in the recent polls. A busy run is polled often, and a quiet one less
+    and less often as the rate decays while nothing is logged. """
+
+    def __init__(self, target_bytes=1024, min_interval=1, max_interval=15, smoothing=0.5):
+        self.target_bytes = target_bytes
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        # bytes per second. Until the logs are seen to grow, it's assumed they do, so the first polls are quick.
+        self.rate = float(target_bytes) / min_interval
+
+    def update(self, new_bytes, elapsed_in_sec):
+        rate = new_bytes / max(elapsed_in_sec, 0.001)
+        self.rate = self.smoothing * rate + (1 - self.smoothing) * self.rate
+
+    def get(self):
+        if self.rate * self.max_interval <= self.target_bytes:
+            interval = self.max_interval
+        else:
+            interval = max(self.target_bytes / self.rate, self.min_interval)
+        # spread the polls of concurrent clients
+        return min(interval * uniform(1, 1.25), self.max_interval)
+
+
 def _blob_is_not_complete(metadata):
     if not metadata:
         return True
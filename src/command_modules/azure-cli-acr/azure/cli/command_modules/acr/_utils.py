@@ -37,8 +37,8 @@ def _arm_get_resource_by_name(cli_ctx, resource_name, resource_type):
     elements = [item for item in result if item.name.lower() == resource_name.lower()]
 
     if not elements:
-        from azure.cli.core._profile import Profile
-        profile = Profile(cli_ctx=cli_ctx)
+        from azure.cli.core._profile import get_profile
+        profile = get_profile(cli_ctx)
         message = "The resource with name '{}' and type '{}' could not be found".format(
             resource_name, resource_type)
         try:
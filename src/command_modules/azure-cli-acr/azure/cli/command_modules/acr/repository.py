@@ -8,6 +8,9 @@ try:
 except ImportError:
     from urllib import unquote
 
+import re
+from datetime import datetime, timedelta
+
 from knack.util import CLIError
 from knack.log import get_logger
 
@@ -22,12 +25,16 @@ DELETE_NOT_SUPPORTED = 'Delete is only supported for managed registries.'
 SHOW_MANIFESTS_NOT_SUPPORTED = 'Show manifests is only supported for managed registries.'
 ATTRIBUTES_NOT_SUPPORTED = 'Attributes are only supported for managed registries.'
 METADATA_NOT_SUPPORTED = 'Metadata is only supported for managed registries.'
+PURGE_NOT_SUPPORTED = 'Purge is only supported for managed registries.'
 
 ORDERBY_PARAMS = {
     'time_asc': 'timeasc',
     'time_desc': 'timedesc'
 }
 DEFAULT_PAGINATION = 100
+# The number of manifests and tags deleted at once by purge. It's kept below the 10 connections a requests session
+# keeps per host, so the deletes reuse them.
+PURGE_CONCURRENCY = 8
 
 
 def _get_repository_path(repository=None):
@@ -76,7 +83,18 @@ def _obtain_data_from_registry(login_server,
                                result_index,
                                top=None,
                                orderby=None):
-    result_list = []
+    return list(_iterate_data_from_registry(login_server, path, username, password, result_index, top, orderby))
+
+
+def _iterate_data_from_registry(login_server,
+                                path,
+                                username,
+                                password,
+                                result_index,
+                                top=None,
+                                orderby=None):
+    """Yield the items of a list in the registry, requesting the next page once the items of a page are consumed.
+    """
     execute_next_http_call = True
 
     params = {
@@ -101,8 +119,8 @@ def _obtain_data_from_registry(login_server,
             result_index=result_index,
             params=params)
 
-        if result:
-            result_list += result
+        for item in result or []:
+            yield item
 
         if top is not None and top <= 0:
             break
@@ -117,8 +135,6 @@ def _obtain_data_from_registry(login_server,
             params = {y[0]: unquote(y[1]) for y in (x.split('=', 2) for x in tokens[1].split('&'))}
             execute_next_http_call = True
 
-    return result_list
-
 
 def acr_repository_list(cmd,
                         registry_name,
@@ -463,6 +479,160 @@ def acr_repository_delete(cmd,
         raise
 
 
+def acr_repository_purge(cmd,  # pylint: disable=too-many-locals
+                         registry_name,
+                         repository,
+                         older_than=None,
+                         tag_filter=None,
+                         untagged=False,
+                         dry_run=False,
+                         resource_group_name=None,  # pylint: disable=unused-argument
+                         tenant_suffix=None,
+                         username=None,
+                         password=None,
+                         yes=False):
+    if not (older_than or tag_filter or untagged):
+        raise CLIError('Usage error: --older-than DURATION | --tag-filter REGEX | --untagged')
+
+    cutoff = None
+    if older_than:
+        from dateutil.tz import tzutc
+        cutoff = datetime.now(tzutc()) - _parse_duration(older_than)
+    try:
+        # the whole tag must match
+        tag_regex = re.compile(r'(?:{})\Z'.format(tag_filter)) if tag_filter else None
+    except re.error as e:
+        raise CLIError("Invalid --tag-filter '{}': {}".format(tag_filter, e))
+
+    login_server, username, password = get_access_credentials(
+        cmd=cmd,
+        registry_name=registry_name,
+        tenant_suffix=tenant_suffix,
+        username=username,
+        password=password,
+        repository=repository,
+        permission='*')
+
+    operations = []
+    try:
+        # The manifests are listed oldest first, so the listing stops at the first one updated after the cutoff.
+        for item in _iterate_data_from_registry(
+                login_server=login_server,
+                path=_get_manifest_path(repository),
+                username=username,
+                password=password,
+                result_index='manifests',
+                orderby='time_asc'):
+            if cutoff:
+                timestamp = _parse_timestamp(item.get('lastUpdateTime'))
+                if timestamp is None:
+                    continue
+                if timestamp >= cutoff:
+                    break
+            operation = _get_purge_operation(item, tag_regex, untagged)
+            if operation:
+                operations.append(operation)
+    except RegistryException as e:
+        # Check for Classic registry
+        if e.status_code == 405:
+            raise CLIError(PURGE_NOT_SUPPORTED)
+        raise
+
+    if dry_run or not operations:
+        return operations
+
+    manifest_count = len([x for x in operations if x['operation'] == 'delete'])
+    tag_count = sum(len(x['tags']) for x in operations if x['operation'] == 'untag')
+    user_confirmation("This operation will delete {} manifests and all the tags referencing them, and untag {} other "
+                      "tags in the repository '{}'.\nAre you sure you want to continue?".format(
+                          manifest_count, tag_count, repository), yes)
+
+    paths = []
+    for operation in operations:
+        if operation['operation'] == 'delete':
+            paths.append('/v2/{}/manifests/{}'.format(repository, operation['digest']))
+        else:
+            paths.extend(_get_tag_path(repository, tag) for tag in operation['tags'])
+
+    def _delete(path):
+        try:
+            request_data_from_registry(
+                http_method='delete',
+                login_server=login_server,
+                path=path,
+                username=username,
+                password=password)
+        except RegistryException as e:
+            # it's gone already
+            if e.status_code != 404:
+                raise
+
+    from concurrent.futures import ThreadPoolExecutor
+    errors = []
+    with ThreadPoolExecutor(max_workers=min(PURGE_CONCURRENCY, len(paths))) as executor:
+        futures = [(path, executor.submit(_delete, path)) for path in paths]
+        for path, future in futures:
+            try:
+                future.result()
+            except CLIError as e:
+                logger.warning("Failed to delete '%s%s': %s", login_server, path, e)
+                errors.append(path)
+
+    if errors:
+        raise CLIError("Failed to delete {} of {} manifests and tags.".format(len(errors), len(paths)))
+    return operations
+
+
+def _get_purge_operation(manifest, tag_regex, untagged):
+    """Return what purge does to a manifest: delete it, untag some of its tags, or None for nothing.
+    """
+    attributes = manifest.get('changeableAttributes') or {}
+    if attributes.get('deleteEnabled') is False:
+        logger.warning("Skipping the manifest '%s' as it's locked for deletion.", manifest.get('digest'))
+        return None
+
+    tags = manifest.get('tags') or []
+    if not tags:
+        # without a filter of the tags, all the manifests are purged
+        matching_tags = [] if untagged or not tag_regex else None
+    elif tag_regex:
+        matching_tags = [tag for tag in tags if tag_regex.match(tag)] or None
+    else:
+        # only the untagged manifests are purged
+        matching_tags = None if untagged else tags
+
+    if matching_tags is None:
+        return None
+    return {
+        'digest': manifest.get('digest'),
+        'tags': matching_tags,
+        'timestamp': manifest.get('lastUpdateTime', ''),
+        # deleting the manifest also deletes its tags, so it's only untagged when some tags are kept
+        'operation': 'delete' if len(matching_tags) == len(tags) else 'untag'
+    }
+
+
+def _parse_duration(duration):
+    """Parse a duration in the format '30d', '12h', '1d12h' or '90m'.
+    """
+    match = re.match(r'^(?:(\d+)d)?(?:(\d+)h)?(?:(\d+)m)?$', duration or '')
+    if not duration or not match:
+        raise CLIError("Invalid duration '{}'. Use the format '30d', '12h', '1d12h' or '90m'.".format(duration))
+    days, hours, minutes = (int(x) if x else 0 for x in match.groups())
+    return timedelta(days=days, hours=hours, minutes=minutes)
+
+
+def _parse_timestamp(timestamp):
+    from dateutil.parser import parse
+    from dateutil.tz import tzutc
+    try:
+        result = parse(timestamp)
+        return result if result.tzinfo else result.replace(tzinfo=tzutc())
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        logger.debug("Unable to parse timestamp '%s'", timestamp)
+        return None
+
+
 def _validate_parameters(repository, image):
     if bool(repository) == bool(image):
         raise CLIError('Usage error: --image IMAGE | --repository REPOSITORY')
@@ -0,0 +1,118 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import mock
+
+from azure.cli.command_modules.acr._archive_utils import upload_source_code, _pack_source_code_into
+
+TEST_UPLOAD_URL = 'https://testaccount.blob.core.windows.net/container/source.tar.gz?sv=2018-03-28&sig=testsig'
+
+
+class AcrArchiveUtilsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.source_location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source_location, ignore_errors=True)
+        self.files = {
+            'Dockerfile': b'FROM scratch\n',
+            'app.py': b'print("hello")\n',
+            os.path.join('data', 'large.bin'): os.urandom(1024 * 1024) * 3,
+            os.path.join('logs', 'app.log'): b'log\n',
+            os.path.join('.git', 'HEAD'): b'ref: refs/heads/master\n'
+        }
+        for name, content in self.files.items():
+            path = os.path.join(self.source_location, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(content)
+        with open(os.path.join(self.source_location, '.dockerignore'), 'w') as f:
+            f.write('logs\n')
+
+        self.client = mock.MagicMock()
+        self.client.get_build_source_upload_url.return_value = mock.MagicMock(
+            upload_url=TEST_UPLOAD_URL, relative_path='source/source.tar.gz')
+
+    def _upload(self, create_blob_from_stream, docker_file_path=None):
+        with mock.patch('azure.cli.command_modules.acr._archive_utils.BlockBlobService') as blob_service:
+            blob_service.return_value.create_blob_from_stream.side_effect = create_blob_from_stream
+            return upload_source_code(self.client, 'testregistry', 'testrg', self.source_location,
+                                      docker_file_path or os.path.join(self.source_location, 'Dockerfile'),
+                                      'abc_Dockerfile')
+
+    def test_upload_source_code_streams_archive(self):
+        uploaded = io.BytesIO()
+
+        def _create_blob_from_stream(container_name, blob_name, stream):
+            self.assertEqual((container_name, blob_name), ('container', 'source.tar.gz'))
+            self.assertFalse(stream.seekable())
+            # read in blocks, as the storage SDK does
+            for chunk in iter(lambda: stream.read(4 * 1024 * 1024), b''):
+                uploaded.write(chunk)
+
+        self.assertEqual(self._upload(_create_blob_from_stream), 'source/source.tar.gz')
+
+        # the archive is a gzip of several members, one per compressed block, which decompresses to the tar
+        uploaded.seek(0)
+        with tarfile.open(fileobj=uploaded, mode='r:gz') as tar:
+            names = tar.getnames()
+            self.assertEqual(tar.extractfile('data/large.bin').read(), self.files[os.path.join('data', 'large.bin')])
+            self.assertEqual(tar.extractfile('abc_Dockerfile').read(), self.files['Dockerfile'])
+        self.assertIn('app.py', names)
+        self.assertNotIn('logs/app.log', names)
+        self.assertNotIn('.git/HEAD', names)
+
+    def test_upload_source_code_errors(self):
+        # a failed upload stops the packing
+        def _fail_upload(container_name, blob_name, stream):  # pylint: disable=unused-argument
+            stream.read(1024)
+            raise IOError('upload failed')
+
+        with self.assertRaises(IOError) as ex:
+            self._upload(_fail_upload)
+        self.assertEqual(str(ex.exception), 'upload failed')
+
+        # and failed packing fails the upload
+        def _read_all(container_name, blob_name, stream):  # pylint: disable=unused-argument
+            while stream.read(1024 * 1024):
+                pass
+
+        with self.assertRaises(IOError):
+            self._upload(_read_all, docker_file_path=os.path.join(self.source_location, 'missing', 'Dockerfile'))
+
+    def test_pack_source_code_skips_ignored_dirs(self):
+        for name in [os.path.join('node_modules', 'pkg', 'index.js'), os.path.join('node_modules', 'keep.js'),
+                     os.path.join('build', 'out', 'app.bin'), os.path.join('docs', 'README.md')]:
+            path = os.path.join(self.source_location, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(name)
+        with open(os.path.join(self.source_location, '.dockerignore'), 'w') as f:
+            f.write('# comment\nlogs\nnode_modules\nbuild\n**/*.md\n!node_modules/keep.js\n')
+
+        archive = io.BytesIO()
+        with mock.patch('os.listdir', side_effect=os.listdir) as listdir:
+            _pack_source_code_into(self.source_location, archive, None, None)
+        scanned = {os.path.relpath(c[0][0], self.source_location).replace(os.sep, '/') for c in listdir.call_args_list}
+
+        archive.seek(0)
+        with tarfile.open(fileobj=archive, mode='r|') as tar:
+            names = set(tar.getnames())
+        self.assertTrue({'app.py', 'data/large.bin', 'docs', 'node_modules/keep.js'}.issubset(names))
+        self.assertFalse({'node_modules', 'node_modules/pkg/index.js', 'build', 'docs/README.md', 'logs/app.log',
+                          '.git/HEAD'} & names)
+        # the ignored dirs are only scanned when an exception rule can include something in them
+        self.assertEqual(scanned, {'.', 'data', 'docs', 'node_modules'})
+
+
+if __name__ == '__main__':
+    unittest.main()
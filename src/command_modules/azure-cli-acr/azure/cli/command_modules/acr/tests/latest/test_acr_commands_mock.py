@@ -8,9 +8,14 @@ try:
 except ImportError:
     from urllib import urlencode
 import json
+import os
+import shutil
+import tempfile
+import time
 import unittest
 import mock
 import sys
+from base64 import urlsafe_b64encode
 
 from azure.mgmt.containerregistry.v2018_09_01.models import Registry, Sku
 
@@ -20,7 +25,8 @@ from azure.cli.command_modules.acr.repository import (
     acr_repository_show_manifests,
     acr_repository_show,
     acr_repository_delete,
-    acr_repository_untag
+    acr_repository_untag,
+    acr_repository_purge
 )
 from azure.cli.command_modules.acr.helm import (
     acr_helm_list,
@@ -32,10 +38,12 @@ from azure.cli.command_modules.acr._docker_utils import (
     get_login_credentials,
     get_access_credentials,
     get_authorization_header,
+    request_data_from_registry,
     EMPTY_GUID
 )
 from azure.cli.command_modules.acr._docker_utils import ResourceNotFound
 from azure.cli.core.mock import DummyCli
+from knack.util import CLIError
 
 
 TEST_TENANT = 'testtenant'
@@ -46,10 +54,19 @@ TEST_ACR_ACCESS_TOKEN = 'testacraccesstoken'
 TEST_REPOSITORY = 'testrepository'
 
 
+_NOW = int(time.time())
+
+
+def _jwt(name, expires_in):
+    # the registry tokens are JWTs, which tell when they expire
+    payload = urlsafe_b64encode(json.dumps({'exp': _NOW + expires_in}).encode()).decode()
+    return 'header.{}.{}'.format(payload.rstrip('='), name)
+
+
 class AcrMockCommandsTests(unittest.TestCase):
 
     @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_repository_list(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -88,7 +105,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_repository_show_tags(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -142,7 +159,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_repository_show_manifests(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -191,7 +208,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_repository_show(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -244,7 +261,7 @@ class AcrMockCommandsTests(unittest.TestCase):
 
     @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
     @mock.patch('azure.cli.command_modules.acr.repository._get_manifest_digest', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_repository_delete(self, mock_requests_delete, mock_get_manifest_digest, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -308,8 +325,8 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr._docker_utils.get_registry_by_name', autospec=True)
-    @mock.patch('requests.post', autospec=True)
-    @mock.patch('requests.get', autospec=True)
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.get')
     @mock.patch('azure.cli.core._profile.Profile.get_raw_token', autospec=True)
     def test_get_docker_credentials(self, mock_get_raw_token, mock_requests_get, mock_requests_post, mock_get_registry_by_name):
         test_registry = 'testregistry'
@@ -428,8 +445,70 @@ class AcrMockCommandsTests(unittest.TestCase):
             headers={'Content-Type': 'application/x-www-form-urlencoded'},
             verify=mock.ANY)
 
+    @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
+    @mock.patch('requests.Session.request')
+    def test_repository_purge(self, mock_requests, mock_get_access_credentials):
+        cmd = self._setup_cmd()
+        mock_get_access_credentials.return_value = 'testregistry.azurecr.io', 'username', 'password'
+        old, new = '2018-01-01T00:00:00.0000000Z', '2099-01-01T00:00:00.0000000Z'
+
+        # the manifests, oldest first, in pages
+        pages = [[{'digest': 'sha256:a', 'tags': ['build-1'], 'lastUpdateTime': old},
+                  {'digest': 'sha256:b', 'tags': ['build-2', 'latest'], 'lastUpdateTime': old},
+                  {'digest': 'sha256:c', 'lastUpdateTime': old},
+                  {'digest': 'sha256:d', 'tags': ['build-3'], 'lastUpdateTime': old,
+                   'changeableAttributes': {'deleteEnabled': False}}],
+                 [{'digest': 'sha256:e', 'tags': ['build-4'], 'lastUpdateTime': new}],
+                 [{'digest': 'sha256:f', 'tags': ['build-5'], 'lastUpdateTime': new}]]
+
+        def _request(method, url, params, **kwargs):  # pylint: disable=unused-argument
+            response = mock.MagicMock()
+            response.headers = {}
+            if method == 'get':
+                page = int((params or {}).get('last', 0))
+                response.status_code = 200
+                response.json.return_value = {'manifests': pages[page]}
+                if page + 1 < len(pages):
+                    response.headers = {'link': '</acr/v1/testrepository/_manifests?last={}&n=100>; rel="next"'.format(
+                        page + 1)}
+            else:
+                response.status_code = 202
+            return response
+        mock_requests.side_effect = _request
+
+        def _purge(**kwargs):
+            mock_requests.reset_mock()
+            result = acr_repository_purge(cmd, 'testregistry', 'testrepository', **kwargs)
+            deleted = sorted(c[1]['url'] for c in mock_requests.call_args_list if c[1]['method'] == 'delete')
+            return [(x['digest'], x['operation'], x['tags']) for x in result], deleted
+
+        # a dry run deletes nothing, and the listing stops at the manifests updated after the cutoff
+        self.assertEqual(_purge(older_than='30d', tag_filter='build-.*', untagged=True, dry_run=True),
+                         ([('sha256:a', 'delete', ['build-1']), ('sha256:b', 'untag', ['build-2']),
+                           ('sha256:c', 'delete', [])], []))
+        self.assertEqual(mock_requests.call_count, 2)
+
+        self.assertEqual(_purge(older_than='30d', tag_filter='build-.*', untagged=True, yes=True)[1], [
+            'https://testregistry.azurecr.io/acr/v1/testrepository/_tags/build-2',
+            'https://testregistry.azurecr.io/v2/testrepository/manifests/sha256:a',
+            'https://testregistry.azurecr.io/v2/testrepository/manifests/sha256:c'])
+
+        # without a tag filter, all the manifests are deleted, or only the untagged ones
+        self.assertEqual([x[0] for x in _purge(older_than='30d', dry_run=True)[0]],
+                         ['sha256:a', 'sha256:b', 'sha256:c'])
+        self.assertEqual([x[0] for x in _purge(untagged=True, dry_run=True)[0]], ['sha256:c'])
+        # the tag filter matches whole tags, here of the manifests of any age
+        self.assertEqual(_purge(tag_filter='build-[45]', dry_run=True)[0],
+                         [('sha256:e', 'delete', ['build-4']), ('sha256:f', 'delete', ['build-5'])])
+        self.assertEqual(_purge(tag_filter='build', dry_run=True)[0], [])
+
+        with self.assertRaises(CLIError):
+            acr_repository_purge(cmd, 'testregistry', 'testrepository')
+        with self.assertRaises(CLIError):
+            acr_repository_purge(cmd, 'testregistry', 'testrepository', older_than='30 days')
+
     @mock.patch('azure.cli.command_modules.acr.helm.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_helm_list(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -466,7 +545,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.helm.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_helm_show(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -509,7 +588,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.helm.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_helm_delete(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -541,7 +620,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.helm.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_helm_push(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -590,6 +669,182 @@ class AcrMockCommandsTests(unittest.TestCase):
                 data=mock_open.return_value.__enter__.return_value,
                 verify=mock.ANY)
 
+    @mock.patch('azure.cli.command_modules.acr._docker_utils.get_registry_by_name', autospec=True)
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.get')
+    @mock.patch('azure.cli.core._profile.Profile.get_subscription', autospec=True)
+    @mock.patch('azure.cli.core._profile.Profile.get_raw_token', autospec=True)
+    def test_registry_tokens_are_cached(self, mock_get_raw_token, mock_get_subscription, mock_requests_get,
+                                        mock_requests_post, mock_get_registry_by_name):
+        cmd = self._setup_token_cache(mock_get_raw_token, mock_get_subscription, mock_requests_get,
+                                      mock_requests_post, mock_get_registry_by_name)
+        login_server = 'testregistry.azurecr.io'
+        refresh_token, access_token = _jwt('refresh', 3600), _jwt('access', 3600)
+        mock_requests_post.return_value.content = json.dumps({
+            'refresh_token': refresh_token, 'access_token': access_token}).encode()
+
+        def _get_token(repository):
+            return get_access_credentials(cmd, 'testregistry', repository=repository, permission='pull')[2]
+
+        self.assertEqual(_get_token(TEST_REPOSITORY), access_token)
+        self.assertEqual(mock_requests_post.call_count, 2)
+
+        # an access token is reused for its scope, and the refresh token for other scopes
+        self.assertEqual(_get_token(TEST_REPOSITORY), access_token)
+        self.assertEqual(mock_requests_post.call_count, 2)
+        _get_token('otherrepository')
+        self.assertEqual(mock_requests_post.call_count, 3)
+        mock_requests_post.assert_called_with('https://{}/oauth2/token'.format(login_server), mock.ANY,
+                                              headers=mock.ANY, verify=mock.ANY)
+        for param in [{'scope': 'repository:otherrepository:pull'}, {'refresh_token': refresh_token}]:
+            self.assertIn(urlencode(param), mock_requests_post.call_args[0][1])
+
+        # by later commands too, as the tokens are kept in the config dir
+        token_file = os.path.join(cmd.cli_ctx.config.config_dir, 'acrTokens.json')
+        if os.name == 'posix':
+            self.assertEqual(os.stat(token_file).st_mode & 0o777, 0o600)
+        with mock.patch('azure.cli.command_modules.acr._docker_utils._registry_tokens', None):
+            self.assertEqual(_get_token(TEST_REPOSITORY), access_token)
+        self.assertEqual(mock_requests_post.call_count, 3)
+
+        # but not for another identity, or once they are about to expire
+        mock_get_subscription.return_value = {'tenantId': TEST_TENANT, 'user': {'name': 'otheruser'}}
+        _get_token(TEST_REPOSITORY)
+        self.assertEqual(mock_requests_post.call_count, 5)
+        with mock.patch('time.time', return_value=time.time() + 3600 - 60):
+            _get_token(TEST_REPOSITORY)
+        self.assertEqual(mock_requests_post.call_count, 7)
+
+        # 'acr login' always gets a new refresh token
+        get_login_credentials(cmd, 'testregistry')
+        self._validate_refresh_token_request(mock_requests_get, mock_requests_post, login_server)
+
+        # the tokens of an identity which was logged out are dropped by the next command
+        self.logged_in_users = ['otheruser']
+        with mock.patch('azure.cli.command_modules.acr._docker_utils._registry_tokens', None):
+            _get_token(TEST_REPOSITORY)
+        with open(token_file) as f:
+            cached_keys = list(json.load(f))
+        self.assertTrue(cached_keys)
+        self.assertTrue(all(key.startswith('{}/otheruser/'.format(TEST_TENANT)) for key in cached_keys))
+
+    @mock.patch('azure.cli.command_modules.acr._docker_utils.get_registry_by_name', autospec=True)
+    @mock.patch('requests.Session.request')
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.get')
+    @mock.patch('azure.cli.core._profile.Profile.get_subscription', autospec=True)
+    @mock.patch('azure.cli.core._profile.Profile.get_raw_token', autospec=True)
+    def test_rejected_registry_tokens_are_renewed(self, mock_get_raw_token, mock_get_subscription, mock_requests_get,
+                                                  mock_requests_post, mock_request, mock_get_registry_by_name):
+        cmd = self._setup_token_cache(mock_get_raw_token, mock_get_subscription, mock_requests_get,
+                                      mock_requests_post, mock_get_registry_by_name)
+        login_server = 'testregistry.azurecr.io'
+
+        def _response(status_code, tokens=None):
+            response = mock.MagicMock()
+            response.headers = {}
+            response.status_code = status_code
+            response.content = json.dumps(tokens or {}).encode()
+            response.json.return_value = {'repositories': ['testrepo1']}
+            return response
+
+        def _token_response(name):
+            return _response(200, {'refresh_token': _jwt('refresh' + name, 3600),
+                                   'access_token': _jwt('access' + name, 3600)})
+
+        def _get_token(repository):
+            return get_access_credentials(cmd, 'testregistry', repository=repository, permission='pull')[2]
+
+        mock_requests_post.side_effect = [_token_response('1')] * 2
+        access_token = _get_token(TEST_REPOSITORY)
+
+        # a cached refresh token the token server rejects is replaced with a new one
+        mock_requests_get.reset_mock()
+        mock_requests_post.side_effect = [_response(401), _token_response('2'), _token_response('2')]
+        self.assertEqual(_get_token('otherrepository'), _jwt('access2', 3600))
+        self.assertEqual(mock_requests_post.call_count, 5)
+        mock_requests_get.assert_called_with('https://{}/v2/'.format(login_server), verify=mock.ANY)
+
+        # a cached access token the registry rejects is renewed once, for all the calls using it
+        self.assertEqual(_get_token(TEST_REPOSITORY), access_token)
+        mock_requests_post.side_effect = [_token_response('3')] * 2
+        mock_request.side_effect = [_response(401), _response(200), _response(200)]
+        for _ in range(2):
+            self.assertEqual(request_data_from_registry('get', login_server, '/v2/_catalog', EMPTY_GUID, access_token,
+                                                        result_index='repositories'), (['testrepo1'], None))
+        self.assertEqual([call[1]['headers'] for call in mock_request.call_args_list],
+                         [get_authorization_header(EMPTY_GUID, token)
+                          for token in [access_token, _jwt('access3', 3600), _jwt('access3', 3600)]])
+        self.assertEqual(_get_token(TEST_REPOSITORY), _jwt('access3', 3600))
+        self.assertEqual(mock_requests_post.call_count, 7)
+
+        # a renewed token which is rejected too fails
+        mock_request.side_effect = [_response(401)]
+        with self.assertRaises(CLIError):
+            request_data_from_registry('get', login_server, '/v2/_catalog', EMPTY_GUID, access_token)
+
+    @mock.patch('time.sleep')
+    @mock.patch('requests.Session.request')
+    def test_request_data_from_registry_retries(self, mock_request, mock_sleep):
+        def _response(status_code, headers=None):
+            response = mock.MagicMock()
+            response.headers = headers or {}
+            response.status_code = status_code
+            response.json.return_value = {'repositories': ['testrepo1']}
+            return response
+
+        def _request():
+            return request_data_from_registry('get', 'testregistry.azurecr.io', '/v2/_catalog', 'username',
+                                              'password', result_index='repositories')
+
+        # errors which may go away are retried with a backoff, or after the time the registry asks for
+        mock_request.side_effect = [_response(503), _response(429, {'Retry-After': '2'}), _response(200)]
+        self.assertEqual(_request(), (['testrepo1'], None))
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertTrue(0.5 <= mock_sleep.call_args_list[0][0][0] <= 1)
+        self.assertEqual(mock_sleep.call_args_list[1][0][0], 2)
+
+        # and fail after the last attempt, without waiting
+        mock_request.reset_mock()
+        mock_sleep.reset_mock()
+        mock_request.side_effect = [_response(500)] * 3
+        with self.assertRaises(CLIError):
+            _request()
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+        # other errors are not retried
+        mock_request.reset_mock()
+        mock_request.side_effect = [_response(403)]
+        with self.assertRaises(CLIError):
+            _request()
+        self.assertEqual(mock_request.call_count, 1)
+
+    def _setup_token_cache(self, mock_get_raw_token, mock_get_subscription, mock_requests_get, mock_requests_post,
+                           mock_get_registry_by_name):
+        cmd = self._setup_cmd()
+        cmd.cli_ctx.config.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cmd.cli_ctx.config.config_dir, ignore_errors=True)
+        for name, value in [('_registry_tokens', None), ('_cached_token_renewals', {}), ('_renewed_tokens', {})]:
+            token_cache_patch = mock.patch('azure.cli.command_modules.acr._docker_utils.' + name, value)
+            token_cache_patch.start()
+            self.addCleanup(token_cache_patch.stop)
+
+        login_server = 'testregistry.azurecr.io'
+        registry = Registry(location='westus', sku=Sku(name='Standard'))
+        registry.login_server = login_server
+        mock_get_registry_by_name.return_value = registry, None
+        mock_get_subscription.return_value = {'tenantId': TEST_TENANT, 'user': {'name': 'testuser'}}
+        self.logged_in_users = ['testuser', 'otheruser']
+        load_cached_subscriptions_patch = mock.patch(
+            'azure.cli.core._profile.Profile.load_cached_subscriptions',
+            side_effect=lambda *args, **kwargs: [{'tenantId': TEST_TENANT, 'user': {'name': name}}
+                                                 for name in self.logged_in_users])
+        load_cached_subscriptions_patch.start()
+        self.addCleanup(load_cached_subscriptions_patch.stop)
+        self._setup_mock_token_requests(mock_get_raw_token, mock_requests_get, mock_requests_post, login_server)
+        return cmd
+
     def _setup_cmd(self):
         cmd = mock.MagicMock()
         cmd.cli_ctx = DummyCli()
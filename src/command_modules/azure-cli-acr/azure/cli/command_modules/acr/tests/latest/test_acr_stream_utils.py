@@ -0,0 +1,76 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import unittest
+import mock
+from six import StringIO
+
+from knack.util import CLIError
+from azure.cli.command_modules.acr._stream_utils import _stream_logs, _LogPollInterval
+
+
+class _AppendBlobServiceStub(object):
+    """ A log blob which grows by one of `appends` each time its properties are read. """
+
+    def __init__(self, appends, status='Succeeded'):
+        self.appends = list(appends)
+        self.content = b''
+        self.status = status
+        self.reads = []
+
+    def get_blob_properties(self, container_name, blob_name):  # pylint: disable=unused-argument
+        if self.appends:
+            self.content += self.appends.pop(0)
+        metadata = {} if self.appends else {'Complete': self.status}
+        return mock.MagicMock(metadata=metadata, properties=mock.MagicMock(content_length=len(self.content)))
+
+    def get_blob_to_stream(self, container_name, blob_name, start_range, end_range, stream):  # pylint: disable=unused-argument
+        self.reads.append((start_range, end_range))
+        stream.write(self.content[start_range:end_range + 1])
+
+
+class AcrStreamUtilsTests(unittest.TestCase):
+
+    def _stream(self, blob_service, byte_size=4):
+        with mock.patch('sys.stdout', new_callable=StringIO) as stdout, mock.patch('time.sleep'):
+            try:
+                _stream_logs(True, byte_size, 60, blob_service, 'logs', 'run.log', True)
+            finally:
+                self.output = stdout.getvalue()
+
+    def test_stream_logs(self):
+        # lines, a \r\n and a character split between reads, and an unterminated last line
+        text = u'Step 1/2 : FROM alpine\r\nStép 2/2\r\n\r\nDone'.encode('utf-8')
+        blob_service = _AppendBlobServiceStub([text[:10], b'', text[10:26], text[26:35], text[35:]])
+        self._stream(blob_service)
+
+        self.assertEqual(self.output, u'Step 1/2 : FROM alpine\r\nStép 2/2\r\n\r\nDone\n')
+        # the reads are contiguous, and read what's available in one go
+        self.assertEqual(blob_service.reads, [(0, 9), (10, 25), (26, 34), (35, len(text) - 1)])
+
+    def test_stream_logs_of_failed_run(self):
+        with self.assertRaises(CLIError):
+            self._stream(_AppendBlobServiceStub([b'error\r\n'], status='Failed'))
+        self.assertEqual(self.output, u'error\r\n')
+
+    def test_poll_interval(self):
+        interval = _LogPollInterval(target_bytes=1024, min_interval=1, max_interval=15)
+        with mock.patch('azure.cli.command_modules.acr._stream_utils.uniform', return_value=1):
+            self.assertEqual(interval.get(), 1)
+
+            # while nothing is logged, the polls back off
+            sleep_times = []
+            for _ in range(5):
+                interval.update(0, 1)
+                sleep_times.append(interval.get())
+            self.assertEqual(sleep_times, [2, 4, 8, 15, 15])
+
+            # and get quick again as soon as the logs grow fast
+            interval.update(60 * 1024, 15)
+            self.assertEqual(interval.get(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -58,10 +58,10 @@ def get_osa_container_service_client(cli_ctx, **_):
 
 def get_graph_rbac_management_client(cli_ctx, **_):
     from azure.cli.core.commands.client_factory import configure_common_settings
-    from azure.cli.core._profile import Profile
+    from azure.cli.core._profile import get_profile
     from azure.graphrbac import GraphRbacManagementClient
 
-    profile = Profile(cli_ctx=cli_ctx)
+    profile = get_profile(cli_ctx)
     cred, _, tenant_id = profile.get_login_credentials(
         resource=cli_ctx.cloud.endpoints.active_directory_graph_resource_id)
     client = GraphRbacManagementClient(
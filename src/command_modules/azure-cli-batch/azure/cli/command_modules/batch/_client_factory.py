@@ -75,8 +75,8 @@ def batch_data_service_factory(cli_ctx, kwargs):
 
     credentials = None
     if not account_key:
-        from azure.cli.core._profile import Profile
-        profile = Profile(cli_ctx=cli_ctx)
+        from azure.cli.core._profile import get_profile
+        profile = get_profile(cli_ctx)
         # in order to use AAD auth in cloud shell mode, we will use mgmt AAD token
         # instead of Batch AAD token to auth
         if in_cloud_console():
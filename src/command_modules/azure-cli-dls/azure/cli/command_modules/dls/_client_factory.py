@@ -30,9 +30,9 @@ def cf_dls_account_trusted_provider(cli_ctx, _):
 
 def cf_dls_filesystem(cli_ctx, account_name):
     from azure.datalake.store import core
-    from azure.cli.core._profile import Profile
+    from azure.cli.core._profile import get_profile
 
-    profile = Profile(cli_ctx=cli_ctx)
+    profile = get_profile(cli_ctx)
     subscription_id = None
     cred, subscription_id, _ = profile.get_login_credentials(
         subscription_id=subscription_id,
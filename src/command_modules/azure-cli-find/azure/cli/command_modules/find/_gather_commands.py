@@ -3,14 +3,13 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
-import yaml
-
 from knack.help import REQUIRED_TAG
 from knack.help_files import helps
 
 
 def build_command_table(cli_ctx):
     from azure.cli.core import MainCommandsLoader
+    from azure.cli.core._help import HelpCache
     cmd_table = MainCommandsLoader(cli_ctx).load_command_table(None)
     for command in cmd_table:
         cmd_table[command].load_arguments()
@@ -46,8 +45,9 @@ def build_command_table(cli_ctx):
         com_descip['parameters'] = param_descrip
         data[command] = com_descip
 
+    help_cache = HelpCache(cli_ctx)
     for command in helps:
-        diction_help = yaml.load(helps[command])
+        diction_help = help_cache.load(command, helps[command])
         if command not in data:
             data[command] = {
                 'short-summary': diction_help.get(
@@ -80,5 +80,6 @@ def build_command_table(cli_ctx):
             for example in diction_help['examples']:
                 string_example += example.get('name', '') + '\n' + example.get('text', '') + '\n'
             data[command]['examples'] = string_example
+    help_cache.save()
 
     return data
@@ -21,9 +21,9 @@ def keyvault_data_plane_factory(cli_ctx, _):
 
     def get_token(server, resource, scope):  # pylint: disable=unused-argument
         import adal
-        from azure.cli.core._profile import Profile
+        from azure.cli.core._profile import get_profile
         try:
-            return Profile(cli_ctx=cli_ctx).get_raw_token(resource)[0]
+            return get_profile(cli_ctx).get_raw_token(resource)[0]
         except adal.AdalError as err:
             from knack.util import CLIError
             # pylint: disable=no-member
@@ -184,7 +184,7 @@ def load_command_table(self, _):
 
     # Resource provider commands
     with self.command_group('provider', resource_provider_sdk, resource_type=ResourceType.MGMT_RESOURCE_RESOURCES) as g:
-        g.command('list', 'list')
+        g.custom_command('list', 'list_resource_providers')
         g.show_command('show', 'get')
         g.custom_command('register', 'register_provider')
         g.custom_command('unregister', 'unregister_provider')
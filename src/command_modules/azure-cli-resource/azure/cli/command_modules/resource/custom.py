@@ -23,7 +23,7 @@ from msrestazure.tools import is_valid_resource_id, parse_resource_id, resource_
 
 from knack.log import get_logger
 from knack.prompting import prompt, prompt_pass, prompt_t_f, prompt_choice_list, prompt_int, NoTTYException
-from knack.util import CLIError
+from knack.util import CLIError, CommandResultItem
 
 from azure.mgmt.resource.resources.models import GenericResource
 
@@ -32,6 +32,8 @@ from azure.mgmt.resource.links.models import ResourceLinkProperties
 
 from azure.cli.core.parser import IncorrectUsageError
 from azure.cli.core.util import get_file_json, shell_safe_json_parse, sdk_no_wait
+from azure.cli.core.commands import MultiLongRunningOperation, get_max_concurrent_ids
+from azure.cli.core.commands.arm import cache_providers, find_provider_resource_types
 from azure.cli.core.commands.client_factory import get_mgmt_service_client
 from azure.cli.core.profiles import ResourceType, get_sdk, get_api_version
 
@@ -356,7 +358,8 @@ def _list_resources_odata_filter_builder(resource_group_name=None, resource_prov
 
 def _get_auth_provider_latest_api_version(cli_ctx):
     rcf = _resource_client_factory(cli_ctx)
-    api_version = _ResourceUtils.resolve_api_version(rcf, 'Microsoft.Authorization', None, 'providerOperations')
+    api_version = _ResourceUtils.resolve_api_version(cli_ctx, rcf, 'Microsoft.Authorization', None,
+                                                     'providerOperations')
     return api_version
 
 
@@ -779,15 +782,77 @@ def _get_parsed_resource_ids(resource_ids):
     return ({'resource_id': rid} for rid in resource_ids)
 
 
-def _get_rsrc_util_from_parsed_id(cli_ctx, parsed_id, api_version):
-    return _ResourceUtils(cli_ctx,
-                          parsed_id.get('resource_group', None),
-                          parsed_id.get('resource_namespace', None),
-                          parsed_id.get('resource_parent', None),
-                          parsed_id.get('resource_type', None),
-                          parsed_id.get('resource_name', None),
-                          parsed_id.get('resource_id', None),
-                          api_version)
+def _get_rsrc_utils_from_parsed_ids(cli_ctx, parsed_ids, api_version):
+    """
+    Returns the resource utils of several resources. They share one client, and the API version is resolved once
+    per resource type rather than once per resource.
+    """
+    rcf = _resource_client_factory(cli_ctx)
+    api_versions = {}
+    rsrc_utils = []
+    for parsed_id in parsed_ids:
+        resource_api_version = api_version
+        resource_id = parsed_id.get('resource_id', None)
+        if resource_api_version is None and resource_id:
+            namespace, parent, resource_type = _ResourceUtils.get_api_version_resource_type(resource_id)
+            key = (namespace.lower(), (parent.split('/')[0] if parent else resource_type).lower())
+            if key not in api_versions:
+                api_versions[key] = _ResourceUtils.resolve_api_version(cli_ctx, rcf, namespace, parent,
+                                                                       resource_type)
+            resource_api_version = api_versions[key]
+        rsrc_utils.append(_ResourceUtils(cli_ctx,
+                                         parsed_id.get('resource_group', None),
+                                         parsed_id.get('resource_namespace', None),
+                                         parsed_id.get('resource_parent', None),
+                                         parsed_id.get('resource_type', None),
+                                         parsed_id.get('resource_name', None),
+                                         resource_id,
+                                         resource_api_version,
+                                         rcf=rcf))
+    return rsrc_utils
+
+
+def _run_on_resources(cli_ctx, rsrc_utils, operation):
+    """
+    Calls `operation` with each of the resource utils, running up to `core.max_concurrent_ids` at once. Returns
+    (result, exception) tuples in the order of `rsrc_utils`.
+    """
+    def _run(rsrc_util):
+        try:
+            return operation(rsrc_util), None
+        except Exception as ex:  # pylint: disable=broad-except
+            return None, ex
+
+    max_workers = min(get_max_concurrent_ids(cli_ctx), len(rsrc_utils))
+    if max_workers < 2 or cli_ctx.config.getboolean('core', 'disable_concurrent_ids', False):
+        return [_run(rsrc_util) for rsrc_util in rsrc_utils]
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_run, rsrc_utils))
+
+
+def _get_results_on_resources(cli_ctx, rsrc_utils, operation):
+    """
+    Returns the results of `operation` on each of the resources. As with the --ids of other commands, the failures
+    are logged and the command exits with 1 after returning the results which succeeded. It raises when none did.
+    """
+    results, failures = [], []
+    for rsrc_util, (result, ex) in zip(rsrc_utils, _run_on_resources(cli_ctx, rsrc_utils, operation)):
+        if ex is None:
+            results.append(result)
+        else:
+            failures.append((rsrc_util.resource_id or rsrc_util.resource_name, ex))
+
+    if len(failures) == 1 and not results:
+        raise failures[0][1]
+    for description, ex in failures:
+        logger.warning('%s: "%s"', description, str(ex))
+    if not failures:
+        return _single_or_collection(results)
+    if not results:
+        raise CLIError('Encountered more than one exception.')
+    return CommandResultItem(_single_or_collection(results), exit_code=1)
 
 
 def _create_parsed_id(resource_group_name=None, resource_provider_namespace=None, parent_resource_path=None,
@@ -821,9 +886,9 @@ def show_resource(cmd, resource_ids=None, resource_group_name=None,
                                                                               resource_type,
                                                                               resource_name)]
 
-    return _single_or_collection(
-        [_get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version).get_resource(
-            include_response_body) for id_dict in parsed_ids])
+    rsrc_utils = _get_rsrc_utils_from_parsed_ids(cmd.cli_ctx, parsed_ids, api_version)
+    return _get_results_on_resources(cmd.cli_ctx, rsrc_utils,
+                                     lambda rsrc_util: rsrc_util.get_resource(include_response_body))
 
 
 # pylint: disable=unused-argument
@@ -840,8 +905,8 @@ def delete_resource(cmd, resource_ids=None, resource_group_name=None,
                                                                               parent_resource_path,
                                                                               resource_type,
                                                                               resource_name)]
-    to_be_deleted = [(_get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version), id_dict)
-                     for id_dict in parsed_ids]
+    parsed_ids = list(parsed_ids)
+    to_be_deleted = list(zip(_get_rsrc_utils_from_parsed_ids(cmd.cli_ctx, parsed_ids, api_version), parsed_ids))
 
     results = []
     from msrestazure.azure_exceptions import CloudError
@@ -849,15 +914,20 @@ def delete_resource(cmd, resource_ids=None, resource_group_name=None,
         logger.debug("Start new loop to delete resources.")
         operations = []
         failed_to_delete = []
-        for rsrc_utils, id_dict in to_be_deleted:
-            try:
-                operations.append(rsrc_utils.delete())
+        # the deletions of a pass are requested concurrently
+        requests = _run_on_resources(cmd.cli_ctx, [rsrc_utils for rsrc_utils, _ in to_be_deleted],
+                                     lambda rsrc_utils: rsrc_utils.delete())
+        for (rsrc_utils, id_dict), (operation, e) in zip(to_be_deleted, requests):
+            if e is None:
+                operations.append(operation)
                 resource = resource_dict_to_id(**id_dict) if id_dict.get("subscription") else resource_name
                 logger.debug("deleting %s", resource)
-            except CloudError as e:
+            elif isinstance(e, CloudError):
                 # request to delete failed, add parsed id dict back to queue
                 id_dict['exception'] = str(e)
                 failed_to_delete.append((rsrc_utils, id_dict))
+            else:
+                raise e
         to_be_deleted = failed_to_delete
 
         # stop deleting if none deletable
@@ -865,8 +935,7 @@ def delete_resource(cmd, resource_ids=None, resource_group_name=None,
             break
 
         # all operations return result before next pass
-        for operation in operations:
-            results.append(operation.result())
+        results.extend(MultiLongRunningOperation(cmd.cli_ctx)(operations))
 
     if to_be_deleted:
         error_msg_builder = ['Some resources failed to be deleted:']
@@ -888,8 +957,8 @@ def update_resource(cmd, parameters, resource_ids=None,
                                                                               resource_type,
                                                                               resource_name)]
 
-    return _single_or_collection(
-        [_get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version).update(parameters) for id_dict in parsed_ids])
+    rsrc_utils = _get_rsrc_utils_from_parsed_ids(cmd.cli_ctx, parsed_ids, api_version)
+    return _get_results_on_resources(cmd.cli_ctx, rsrc_utils, lambda rsrc_util: rsrc_util.update(parameters))
 
 
 # pylint: unused-argument
@@ -904,8 +973,8 @@ def tag_resource(cmd, tags, resource_ids=None,
                                                                               resource_type,
                                                                               resource_name)]
 
-    return _single_or_collection(
-        [_get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version).tag(tags) for id_dict in parsed_ids])
+    rsrc_utils = _get_rsrc_utils_from_parsed_ids(cmd.cli_ctx, parsed_ids, api_version)
+    return _get_results_on_resources(cmd.cli_ctx, rsrc_utils, lambda rsrc_util: rsrc_util.tag(tags))
 
 
 # pylint: unused-argument
@@ -920,8 +989,9 @@ def invoke_resource_action(cmd, action, request_body=None, resource_ids=None,
                                                                               resource_type,
                                                                               resource_name)]
 
-    return _single_or_collection([_get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version)
-                                  .invoke_action(action, request_body) for id_dict in parsed_ids])
+    rsrc_utils = _get_rsrc_utils_from_parsed_ids(cmd.cli_ctx, parsed_ids, api_version)
+    return _get_results_on_resources(cmd.cli_ctx, rsrc_utils,
+                                     lambda rsrc_util: rsrc_util.invoke_action(action, request_body))
 
 
 def get_deployment_operations(client, resource_group_name, deployment_name, operation_ids):
@@ -957,6 +1027,19 @@ def list_resources(cmd, resource_group_name=None,
     return list(resources)
 
 
+def list_resource_providers(cmd, top=None, expand=None):
+    """
+    :param top: The number of results to return. If not specified, all resource providers are returned.
+    :param expand: The properties to include in the results. For example, use 'metadata' to retrieve resource
+     provider metadata. To include property aliases in response, use 'resourceTypes/aliases'.
+    """
+    rcf = _resource_client_factory(cmd.cli_ctx)
+    providers = list(rcf.providers.list(top=top, expand=expand))
+    # the listing has the resource types of every provider, so later API version lookups needn't fetch them again
+    cache_providers(cmd.cli_ctx, rcf, providers)
+    return providers
+
+
 def register_provider(cmd, resource_provider_namespace, wait=False):
     _update_provider(cmd.cli_ctx, resource_provider_namespace, registering=True, wait=wait)
 
@@ -1355,8 +1438,8 @@ def _register_rp(cli_ctx, subscription_id=None):
 
 
 def _get_subscription_id_from_subscription(cli_ctx, subscription):  # pylint: disable=inconsistent-return-statements
-    from azure.cli.core._profile import Profile
-    profile = Profile(cli_ctx=cli_ctx)
+    from azure.cli.core._profile import get_profile
+    profile = get_profile(cli_ctx)
     subscriptions_list = profile.load_cached_subscriptions()
     for sub in subscriptions_list:
         if subscription in (sub['id'], sub['name']):
@@ -1790,11 +1873,11 @@ class _ResourceUtils(object):  # pylint: disable=too-many-instance-attributes
         self.rcf = rcf or _resource_client_factory(cli_ctx)
         if api_version is None:
             if resource_id:
-                api_version = _ResourceUtils._resolve_api_version_by_id(self.rcf, resource_id)
+                api_version = _ResourceUtils._resolve_api_version_by_id(cli_ctx, self.rcf, resource_id)
             else:
                 _validate_resource_inputs(resource_group_name, resource_provider_namespace,
                                           resource_type, resource_name)
-                api_version = _ResourceUtils.resolve_api_version(self.rcf,
+                api_version = _ResourceUtils.resolve_api_version(cli_ctx, self.rcf,
                                                                  resource_provider_namespace,
                                                                  parent_resource_path,
                                                                  resource_type)
@@ -1973,14 +2056,11 @@ class _ResourceUtils(object):  # pylint: disable=too-many-instance-attributes
                                     self.rcf.resources.config.long_running_operation_timeout)
 
     @staticmethod
-    def resolve_api_version(rcf, resource_provider_namespace, parent_resource_path, resource_type):
-        provider = rcf.providers.get(resource_provider_namespace)
-
+    def resolve_api_version(cli_ctx, rcf, resource_provider_namespace, parent_resource_path, resource_type):
         # If available, we will use parent resource's api-version
         resource_type_str = (parent_resource_path.split('/')[0] if parent_resource_path else resource_type)
 
-        rt = [t for t in provider.resource_types
-              if t.resource_type.lower() == resource_type_str.lower()]
+        rt = find_provider_resource_types(cli_ctx, rcf, resource_provider_namespace, resource_type_str)
         if not rt:
             raise IncorrectUsageError('Resource type {} not found.'.format(resource_type_str))
         if len(rt) == 1 and rt[0].api_versions:
@@ -1991,7 +2071,13 @@ class _ResourceUtils(object):  # pylint: disable=too-many-instance-attributes
             .format(resource_type))
 
     @staticmethod
-    def _resolve_api_version_by_id(rcf, resource_id):
+    def _resolve_api_version_by_id(cli_ctx, rcf, resource_id):
+        namespace, parent, resource_type = _ResourceUtils.get_api_version_resource_type(resource_id)
+        return _ResourceUtils.resolve_api_version(cli_ctx, rcf, namespace, parent, resource_type)
+
+    @staticmethod
+    def get_api_version_resource_type(resource_id):
+        """ the namespace, parent path and type whose API versions apply to the resource """
         parts = parse_resource_id(resource_id)
         namespace = parts.get('child_namespace_1', parts['namespace'])
         if parts.get('child_type_2'):
@@ -2010,4 +2096,4 @@ class _ResourceUtils(object):  # pylint: disable=too-many-instance-attributes
             parent = None
             resource_type = parts['type']
 
-        return _ResourceUtils.resolve_api_version(rcf, namespace, parent, resource_type)
+        return namespace, parent, resource_type
@@ -80,7 +80,9 @@ class TestApiCheck(unittest.TestCase):
 
     def _get_mock_client(self):
         client = MagicMock()
+        client.config.subscription_id = '00000000-0000-0000-0000-000000000000'
         provider = MagicMock()
+        provider.namespace = 'Mock'
         provider.resource_types = [
             self._get_mock_resource_type('skip', ['2000-01-01-preview', '2000-01-01']),
             self._get_mock_resource_type('test', ['2016-01-01-preview', '2016-01-01']),
@@ -91,7 +93,7 @@ class TestApiCheck(unittest.TestCase):
         return client
 
     def _get_mock_resource_type(self, name, api_versions):  # pylint: disable=no-self-use
-        rt = MagicMock()
+        rt = MagicMock(spec=['resource_type', 'api_versions'])
         rt.resource_type = name
         rt.api_versions = api_versions
         return rt
@@ -18,7 +18,7 @@ except ImportError:
 from azure.cli.core.util import CLIError, get_file_json, shell_safe_json_parse
 from azure.cli.command_modules.resource.custom import \
     (_get_missing_parameters, _extract_lock_params, _process_parameters, _find_missing_parameters,
-     _prompt_for_parameters, _load_file_string_or_uri)
+     _prompt_for_parameters, _load_file_string_or_uri, show_resource, delete_resource, tag_resource)
 
 
 def _simulate_no_tty():
@@ -306,5 +306,91 @@ class TestCustom(unittest.TestCase):
         self.assertTrue(str(list(results.keys())) in param_alpha_order)
 
 
+class TestGenericResourceIds(unittest.TestCase):
+    ids = ['/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/rg/providers/Microsoft.Network/'
+           'virtualNetworks/vnet1',
+           '/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/rg/providers/Microsoft.Network/'
+           'virtualNetworks/vnet2',
+           '/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/rg/providers/Microsoft.Network/'
+           'publicIPAddresses/ip1']
+
+    def setUp(self):
+        self.cmd = mock.MagicMock()
+        self.cmd.cli_ctx.config.getint.return_value = 4
+        self.cmd.cli_ctx.config.getboolean.return_value = False
+        self.rcf = mock.MagicMock()
+        patches = [mock.patch('azure.cli.command_modules.resource.custom._resource_client_factory',
+                              return_value=self.rcf),
+                   mock.patch('azure.cli.command_modules.resource.custom.find_provider_resource_types',
+                              side_effect=self._find_provider_resource_types)]
+        self.find_provider_resource_types = patches[1].start()
+        patches[0].start()
+        for patch in patches:
+            self.addCleanup(patch.stop)
+
+    @staticmethod
+    def _find_provider_resource_types(cli_ctx, rcf, namespace, resource_type):
+        rt = mock.MagicMock(spec=['resource_type', 'api_versions'])
+        rt.resource_type = resource_type
+        rt.api_versions = ['2018-10-01' if resource_type == 'virtualNetworks' else '2018-08-01']
+        return [rt]
+
+    def test_show_resource_ids(self):
+        responses = {self.ids[0]: 'vnet1', self.ids[1]: 'vnet2', self.ids[2]: 'ip1'}
+
+        def _get_by_id(resource_id, api_version, **kwargs):
+            return responses[resource_id], api_version
+
+        self.rcf.resources.get_by_id.side_effect = _get_by_id
+        result = show_resource(self.cmd, resource_ids=self.ids)
+
+        # results keep the order of the IDs, and each resource type is resolved once
+        self.assertEqual(result, [('vnet1', '2018-10-01'), ('vnet2', '2018-10-01'), ('ip1', '2018-08-01')])
+        self.assertEqual(self.rcf.resources.get_by_id.call_count, 3)
+        self.assertEqual(self.find_provider_resource_types.call_count, 2)
+
+    @mock.patch('azure.cli.command_modules.resource.custom.logger')
+    def test_tag_resource_ids_with_failures(self, logger):
+        def _create_or_update_by_id(resource_id, api_version, parameters):
+            if resource_id != self.ids[1]:
+                raise CLIError('failed ' + resource_id.split('/')[-1])
+            return resource_id
+
+        self.rcf.resources.get_by_id.return_value = mock.MagicMock(tags={})
+        self.rcf.resources.create_or_update_by_id.side_effect = _create_or_update_by_id
+
+        # the resources which succeeded are returned, and the command exits with 1 after logging every failure
+        result = tag_resource(self.cmd, {'a': 'b'}, resource_ids=self.ids)
+        self.assertEqual((result.result, result.exit_code), (self.ids[1], 1))
+        self.assertEqual([call[0][1:] for call in logger.warning.call_args_list],
+                         [(self.ids[0], 'failed vnet1'), (self.ids[2], 'failed ip1')])
+
+        # it raises when none succeeded
+        with self.assertRaisesRegexp(CLIError, 'failed vnet1'):
+            tag_resource(self.cmd, {'a': 'b'}, resource_ids=self.ids[:1])
+        with self.assertRaisesRegexp(CLIError, 'more than one exception'):
+            tag_resource(self.cmd, {'a': 'b'}, resource_ids=[self.ids[0], self.ids[2]])
+
+    @mock.patch('azure.cli.command_modules.resource.custom.MultiLongRunningOperation')
+    def test_delete_resource_ids_in_passes(self, multi_lro):
+        from msrestazure.azure_exceptions import CloudError
+        in_use = {self.ids[2]}  # the public IP can't be deleted before the network is
+
+        def _delete_by_id(resource_id, api_version, **kwargs):
+            if resource_id in in_use:
+                raise CloudError(mock.MagicMock(status_code=400), 'InUse')
+            return resource_id
+
+        def _wait(operations):
+            in_use.clear()
+            return list(operations)
+
+        self.rcf.resources.delete_by_id.side_effect = _delete_by_id
+        multi_lro.return_value.side_effect = _wait
+        self.assertEqual(delete_resource(self.cmd, resource_ids=self.ids), self.ids)
+        self.assertEqual([call[0][0] for call in multi_lro.return_value.call_args_list],
+                         [self.ids[:2], self.ids[2:]])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -17,10 +17,10 @@ def _auth_client_factory(cli_ctx, scope=None):
 
 
 def _graph_client_factory(cli_ctx, **_):
-    from azure.cli.core._profile import Profile
+    from azure.cli.core._profile import get_profile
     from azure.cli.core.commands.client_factory import configure_common_settings
     from azure.graphrbac import GraphRbacManagementClient
-    profile = Profile(cli_ctx=cli_ctx)
+    profile = get_profile(cli_ctx)
     cred, _, tenant_id = profile.get_login_credentials(
         resource=cli_ctx.cloud.endpoints.active_directory_graph_resource_id)
     client = GraphRbacManagementClient(cred, tenant_id,
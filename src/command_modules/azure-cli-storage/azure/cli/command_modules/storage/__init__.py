@@ -196,8 +196,9 @@ If you want to use the old authentication method and allow querying for the righ
                              help='Storage account name. Related environment variable: AZURE_STORAGE_ACCOUNT. Must be '
                                   'used in conjunction with either storage account key or a SAS token. If neither are '
                                   'present, the command will try to query the storage account key using the '
-                                  'authenticated Azure account. If a large number of storage commands are executed the '
-                                  'API quota may be hit')
+                                  'authenticated Azure account. The resource group of the account is cached for the '
+                                  'number of seconds set by the storage.account_cache_ttl configuration value '
+                                  '(default 300, 0 disables the cache).')
         command.add_argument('account_key', '--account-key', required=False, default=None,
                              arg_group=group_name,
                              help='Storage account key. Must be used in conjunction with storage account name. '
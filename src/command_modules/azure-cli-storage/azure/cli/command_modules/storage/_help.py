@@ -314,9 +314,15 @@ helps['storage blob upload-batch'] = """
           short-summary: The max length in bytes permitted for an append blob.
         - name: --lease-id
           short-summary: Required if the blob has an active lease
+        - name: --skip-unchanged
+          short-summary: Only upload files that are new or differ from the blob of the same name.
+          long-summary: The destination container is listed once. Files are compared by size, then by Content-MD5
+                        when the blob has one, otherwise by last modified time.
     examples:
         - name: Upload all files that end with .py unless blob exists and has been modified since given date.
           text: az storage blob upload-batch -d MyContainer --account-name MyStorageAccount -s directory_path --pattern *.py --if-unmodified-since 2018-08-27T20:51Z
+        - name: Upload only the files that changed since the last upload.
+          text: az storage blob upload-batch -d MyContainer --account-name MyStorageAccount -s directory_path --skip-unchanged
 """
 
 helps['storage blob download-batch'] = """
@@ -380,7 +386,8 @@ helps['storage blob copy start'] = """
 
 helps['storage blob copy start-batch'] = """
     type: command
-    short-summary: Copy multiple blobs or files to a blob container. Use `az storage blob show` to check the status of the blobs.
+    short-summary: Copy multiple blobs or files to a blob container. Use `az storage blob show` or `--wait` to check the status of the blobs.
+    long-summary: The copies are started concurrently. The number of copies started at once is limited by the `storage.batch_connections` configuration value.
     parameters:
         - name: --destination-container -c
           type: string
@@ -410,6 +417,13 @@ helps['storage blob copy start-batch'] = """
         - name: --source-sas
           type: string
           short-summary: The shared access signature for the source storage account.
+        - name: --wait
+          type: bool
+          short-summary: Wait for all the copies to complete, reporting the progress of the batch.
+          long-summary: The status of the pending copies is polled in batches. The command fails if any copy fails or is aborted.
+        - name: --wait-timeout
+          type: int
+          short-summary: The number of seconds to wait for the copies to complete when `--wait` is used. The copies still pending at that point keep running.
 """
 
 helps['storage container'] = """
@@ -26,26 +26,63 @@ logger = get_logger(__name__)
 # pylint: disable=inconsistent-return-statements,too-many-lines
 def _query_account_key(cli_ctx, account_name):
     """Query the storage account key. This is used when the customer doesn't offer account key but name."""
+    from msrestazure.azure_exceptions import CloudError
+
     rg, scf = _query_account_rg(cli_ctx, account_name)
+    try:
+        keys = scf.storage_accounts.list_keys(rg, account_name)
+    except CloudError as ex:
+        if ex.status_code != 404:
+            raise
+        # the account may have been recreated in another resource group since its resource group was cached
+        _forget_account_rg(cli_ctx, account_name)
+        current_rg, scf = _query_account_rg(cli_ctx, account_name)
+        if current_rg == rg:
+            raise ex
+        keys = scf.storage_accounts.list_keys(current_rg, account_name)
+
     t_storage_account_keys = get_sdk(
         cli_ctx, ResourceType.MGMT_STORAGE, 'models.storage_account_keys#StorageAccountKeys')
-
     if t_storage_account_keys:
-        return scf.storage_accounts.list_keys(rg, account_name).key1
+        return keys.key1
     # of type: models.storage_account_list_keys_result#StorageAccountListKeysResult
-    return scf.storage_accounts.list_keys(rg, account_name).keys[0].value  # pylint: disable=no-member
+    return keys.keys[0].value  # pylint: disable=no-member
 
 
 def _query_account_rg(cli_ctx, account_name):
     """Query the storage account's resource group, which the mgmt sdk requires."""
+    from azure.cli.core.commands.client_factory import get_subscription_id
+    from azure.cli.command_modules.storage.account_cache_util import StorageAccountCache
+
     scf = get_mgmt_service_client(cli_ctx, ResourceType.MGMT_STORAGE)
-    acc = next((x for x in scf.storage_accounts.list() if x.name == account_name), None)
+    subscription_id = get_subscription_id(cli_ctx)
+    cache = StorageAccountCache(cli_ctx)
+    rg = cache.get(subscription_id, account_name)
+    if rg:
+        logger.debug("Using the cached resource group of storage account '%s'.", account_name)
+        return rg, scf
+
+    # look the account up by name rather than listing every account of the subscription
+    rcf = get_mgmt_service_client(cli_ctx, ResourceType.MGMT_RESOURCE_RESOURCES)
+    query = "name eq '{}' and resourceType eq 'Microsoft.Storage/storageAccounts'".format(account_name)
+    acc = next(iter(rcf.resources.list(filter=query)), None)
+    if not acc:
+        # accounts created moments ago may not be returned by the resources API yet
+        acc = next((x for x in scf.storage_accounts.list() if x.name == account_name), None)
     if acc:
         from msrestazure.tools import parse_resource_id
-        return parse_resource_id(acc.id)['resource_group'], scf
+        rg = parse_resource_id(acc.id)['resource_group']
+        cache.set(subscription_id, account_name, rg)
+        return rg, scf
     raise ValueError("Storage account '{}' not found.".format(account_name))
 
 
+def _forget_account_rg(cli_ctx, account_name):
+    from azure.cli.core.commands.client_factory import get_subscription_id
+    from azure.cli.command_modules.storage.account_cache_util import StorageAccountCache
+    StorageAccountCache(cli_ctx).remove(get_subscription_id(cli_ctx), account_name)
+
+
 def _create_token_credential(cli_ctx):
     from knack.cli import EVENT_CLI_POST_EXECUTE
 
@@ -0,0 +1,94 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import os
+import threading
+import time
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_ACCOUNT_CACHE_TTL = 300
+ACCOUNT_CACHE_FILE_NAME = 'storageAccounts.json'
+
+
+def get_account_cache_ttl(cli_ctx):
+    """Seconds the resource group of a queried account is reused for. 0 disables the cache."""
+    try:
+        ttl = cli_ctx.config.getint('storage', 'account_cache_ttl', fallback=DEFAULT_ACCOUNT_CACHE_TTL)
+    except ValueError:
+        logger.warning("Invalid value for 'storage.account_cache_ttl'. Using %s.", DEFAULT_ACCOUNT_CACHE_TTL)
+        ttl = DEFAULT_ACCOUNT_CACHE_TTL
+    return max(0, ttl)
+
+
+class StorageAccountCache(object):
+    """
+    Resource group of the storage accounts looked up by name, so the following data-plane commands against the same
+    account don't have to look the account up again. Entries expire after `storage.account_cache_ttl` seconds.
+
+    Account keys aren't cached: they are queried with the login credentials for every command.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, cli_ctx):
+        self.cli_ctx = cli_ctx
+        self.ttl = get_account_cache_ttl(cli_ctx)
+        self.path = os.path.join(cli_ctx.config.config_dir, ACCOUNT_CACHE_FILE_NAME)
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, subscription_id, account_name):
+        """Returns the cached resource group of an account, or None."""
+        if not self.enabled:
+            return None
+        entry = self._load().get(self._entry_id(subscription_id, account_name))
+        try:
+            if time.time() - entry['retrieved_on'] > self.ttl:
+                return None
+            return entry['resource_group']
+        except (KeyError, TypeError):
+            return None
+
+    def set(self, subscription_id, account_name, resource_group):
+        if not self.enabled:
+            return
+        entry = {'resource_group': resource_group, 'retrieved_on': time.time()}
+        self._update(self._entry_id(subscription_id, account_name), entry)
+
+    def remove(self, subscription_id, account_name):
+        self._update(self._entry_id(subscription_id, account_name), None)
+
+    def _entry_id(self, subscription_id, account_name):
+        return '/'.join([self.cli_ctx.cloud.name, subscription_id or '', account_name.lower()])
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _update(self, entry_id, entry):
+        with self._lock:
+            entries = self._load()
+            if entry:
+                entries[entry_id] = entry
+            elif entries.pop(entry_id, None) is None:
+                return
+            now = time.time()
+            entries = {k: v for k, v in entries.items()
+                       if isinstance(v, dict) and now - v.get('retrieved_on', 0) <= self.ttl}
+            try:
+                with open(self.path, 'w') as f:
+                    json.dump(entries, f)
+            except (IOError, OSError) as ex:
+                logger.debug("Failed to update the storage account cache: %s", ex)
@@ -22,10 +22,10 @@ class TokenUpdater(object):
 
     def timer_callback(self):
         # call to get a new token and set a timer
-        from azure.cli.core._profile import Profile
+        from azure.cli.core._profile import get_profile
         from datetime import datetime
         # should give back token that is valid for at least 5 mins
-        token = Profile(cli_ctx=self.cli_ctx).get_raw_token(resource="https://storage.azure.com")[0][2]
+        token = get_profile(self.cli_ctx).get_raw_token(resource="https://storage.azure.com")[0][2]
         try:
             self.token_credential.token = token['accessToken']
             seconds_left = (datetime.strptime(token['expiresOn'], "%Y-%m-%d %H:%M:%S.%f") - datetime.now()).seconds
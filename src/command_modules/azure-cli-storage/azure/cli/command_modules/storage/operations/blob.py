@@ -16,6 +16,7 @@ from azure.cli.command_modules.storage.util import (create_blob_service_from_sto
                                                     filter_none, collect_blobs, collect_files,
                                                     mkdir_p, guess_content_type, normalize_blob_file_path,
                                                     check_precondition_success)
+from azure.cli.command_modules.storage.transfer_util import TransferJournal, get_file_signature, run_batch_transfer
 from azure.cli.command_modules.storage.url_quote_util import encode_for_url, make_encoded_file_url_and_params
 
 
@@ -88,7 +89,7 @@ def set_service_properties(client, parameters, delete_retention=None, delete_ret
 
 def storage_blob_copy_batch(cmd, client, source_client, container_name=None,
                             destination_path=None, source_container=None, source_share=None,
-                            source_sas=None, pattern=None, dryrun=False):
+                            source_sas=None, pattern=None, dryrun=False, wait=False, wait_timeout=3600):
     """Copy a group of blob or files to a blob container."""
     logger = None
     if dryrun:
@@ -101,6 +102,8 @@ def storage_blob_copy_batch(cmd, client, source_client, container_name=None,
         logger.warning('    pattern %s', pattern)
         logger.warning(' operations')
 
+    destination_blobs = []
+
     if source_container:
         # copy blobs for blob container
 
@@ -110,17 +113,22 @@ def storage_blob_copy_batch(cmd, client, source_client, container_name=None,
             source_sas = create_short_lived_container_sas(cmd, source_client.account_name, source_client.account_key,
                                                           source_container)
 
-        # pylint: disable=inconsistent-return-statements
-        def action_blob_copy(blob_name):
-            if dryrun:
+        source_blobs = collect_blobs(source_client, source_container, pattern)
+        if dryrun:
+            for blob_name in source_blobs:
                 logger.warning('  - copy blob %s', blob_name)
-            else:
-                return _copy_blob_to_blob_container(client, source_client, container_name, destination_path,
-                                                    source_container, source_sas, blob_name)
+            return []
+
+        def _collect_copies():
+            for blob_name in source_blobs:
+                destination_blobs.append(normalize_blob_file_path(destination_path, blob_name))
+                yield blob_name, 0
 
-        return list(filter_none(action_blob_copy(blob) for blob in collect_blobs(source_client,
-                                                                                 source_container,
-                                                                                 pattern)))
+        results = run_batch_transfer(
+            cmd.cli_ctx, _collect_copies(),
+            lambda blob_name, *_: _copy_blob_to_blob_container(client, source_client, container_name,
+                                                               destination_path, source_container, source_sas,
+                                                               blob_name))
 
     elif source_share:
         # copy blob from file share
@@ -132,50 +140,119 @@ def storage_blob_copy_batch(cmd, client, source_client, container_name=None,
             source_sas = create_short_lived_share_sas(cmd, source_client.account_name, source_client.account_key,
                                                       source_share)
 
-        # pylint: disable=inconsistent-return-statements
-        def action_file_copy(file_info):
-            dir_name, file_name = file_info
-            if dryrun:
+        source_files = collect_files(cmd, source_client, source_share, pattern)
+        if dryrun:
+            for dir_name, file_name in source_files:
                 logger.warning('  - copy file %s', os.path.join(dir_name, file_name))
-            else:
-                return _copy_file_to_blob_container(client, source_client, container_name, destination_path,
-                                                    source_share, source_sas, dir_name, file_name)
-
-        return list(filter_none(action_file_copy(file) for file in collect_files(cmd,
-                                                                                 source_client,
-                                                                                 source_share,
-                                                                                 pattern)))
+            return []
+
+        def _collect_file_copies():
+            for dir_name, file_name in source_files:
+                source_path = os.path.join(dir_name, file_name) if dir_name else file_name
+                destination_blobs.append(normalize_blob_file_path(destination_path, source_path))
+                yield (dir_name, file_name), 0
+
+        results = run_batch_transfer(
+            cmd.cli_ctx, _collect_file_copies(),
+            lambda file_info, *_: _copy_file_to_blob_container(client, source_client, container_name,
+                                                               destination_path, source_share, source_sas,
+                                                               file_info[0], file_info[1]))
     else:
         raise ValueError('Fail to find source. Neither blob container or file share is specified')
 
+    if wait:
+        _wait_for_blob_copies(cmd, client, container_name, destination_blobs, timeout=wait_timeout)
+    return list(filter_none(results))
+
+
+def _wait_for_blob_copies(cmd, client, container_name, blob_names, timeout=None, max_interval=30):
+    """
+    Poll the copy status of the given blobs until none is pending. Each poll is a single listing of the blobs under
+    the common prefix of those still pending, rather than a request per blob, which stops once past the last of them.
+    A blob missing from a listing counts as a failed copy. Gives up after `timeout` seconds.
+    """
+    import time
+    t_include = cmd.get_models('blob.models#Include')
+
+    pending = set(blob_names)
+    failures = []
+    interval = 1
+    deadline = time.time() + timeout if timeout else None
+    progress_controller = cmd.cli_ctx.get_progress_controller()
+    progress_controller.begin()
+    try:
+        while pending:
+            # blobs are listed in lexical order, so the listing covers every pending blob once past the last one
+            prefix = os.path.commonprefix(list(pending)) or None
+            last = max(pending)
+            listed = set()
+            for blob in client.list_blobs(container_name, prefix=prefix, include=t_include(copy=True)):
+                if blob.name > last:
+                    break
+                listed.add(blob.name)
+                copy = blob.properties.copy
+                if blob.name in pending and copy.status != 'pending':
+                    pending.discard(blob.name)
+                    if copy.status != 'success':
+                        failures.append('{}: {} {}'.format(blob.name, copy.status, copy.status_description or ''))
+            for blob_name in pending - listed:
+                pending.discard(blob_name)
+                failures.append('{}: missing from the destination container'.format(blob_name))
+            progress_controller.add(message='Copying ({}/{} completed)'.format(len(blob_names) - len(pending),
+                                                                               len(blob_names)))
+            if pending:
+                if deadline and time.time() + interval > deadline:
+                    raise CLIError('Timed out after {} seconds waiting for {} of {} copies to complete. The copies '
+                                   'are still running.'.format(timeout, len(pending), len(blob_names)))
+                time.sleep(interval)
+                interval = min(interval * 2, max_interval)
+    except (KeyboardInterrupt, CLIError):
+        progress_controller.stop()
+        raise
+    progress_controller.end()
+
+    if failures:
+        raise CLIError('{} of {} copies did not succeed:\n{}'.format(len(failures), len(blob_names),
+                                                                     '\n'.join(failures)))
+
 
 # pylint: disable=unused-argument
-def storage_blob_download_batch(client, source, destination, source_container_name, pattern=None, dryrun=False,
+def storage_blob_download_batch(cmd, client, source, destination, source_container_name, pattern=None, dryrun=False,
                                 progress_callback=None, max_connections=2):
 
-    def _download_blob(blob_service, container, destination_folder, normalized_blob_name, blob_name):
+    def _download_blob(blob_service, container, destination_folder, normalized_blob_name, blob_name, connections,
+                       blob_progress_callback):
         # TODO: try catch IO exception
         destination_path = os.path.join(destination_folder, normalized_blob_name)
         destination_folder = os.path.dirname(destination_path)
         if not os.path.exists(destination_folder):
             mkdir_p(destination_folder)
 
-        blob = blob_service.get_blob_to_path(container, blob_name, destination_path, max_connections=max_connections,
-                                             progress_callback=progress_callback)
+        blob = blob_service.get_blob_to_path(container, blob_name, destination_path, max_connections=connections,
+                                             progress_callback=blob_progress_callback)
         return blob.name
 
     source_blobs = collect_blobs(client, source_container_name, pattern)
     blobs_to_download = {}
-    for blob_name in source_blobs:
-        # remove starting path seperator and normalize
-        normalized_blob_name = normalize_blob_file_path(None, blob_name)
-        if normalized_blob_name in blobs_to_download:
-            raise CLIError('Multiple blobs with download path: `{}`. As a solution, use the `--pattern` parameter '
-                           'to select for a subset of blobs to download OR utilize the `storage blob download` '
-                           'command instead to download individual blobs.'.format(normalized_blob_name))
-        blobs_to_download[normalized_blob_name] = blob_name
+
+    def _collect_blobs_to_download():
+        for blob_name in source_blobs:
+            # remove starting path seperator and normalize
+            normalized_blob_name = normalize_blob_file_path(None, blob_name)
+            if normalized_blob_name in blobs_to_download:
+                # the listing is consumed while downloading, so the blobs listed before this one may be on disk
+                # already. Raising here cancels the queued downloads and lets the running ones finish.
+                raise CLIError('Multiple blobs with download path: `{}`. The download was stopped part-way: blobs '
+                               'listed before it may already have been downloaded to `{}`. As a solution, use the '
+                               '`--pattern` parameter to select for a subset of blobs to download OR utilize the '
+                               '`storage blob download` command instead to download individual blobs.'
+                               .format(normalized_blob_name, destination))
+            blobs_to_download[normalized_blob_name] = blob_name
+            yield normalized_blob_name, None
 
     if dryrun:
+        source_blobs = list(source_blobs)
+        list(_collect_blobs_to_download())
         logger = get_logger(__name__)
         logger.warning('download action: from %s to %s', source, destination)
         logger.warning('    pattern %s', pattern)
@@ -186,8 +263,18 @@ def storage_blob_download_batch(client, source, destination, source_container_na
             logger.warning('  - %s', b)
         return []
 
-    return list(_download_blob(client, source_container_name, destination, blob_normed, blobs_to_download[blob_normed])
-                for blob_normed in blobs_to_download)
+    journal = TransferJournal(cmd.cli_ctx, 'download', client.account_name, source_container_name,
+                              os.path.realpath(destination), pattern)
+    # blobs are downloaded while the container listing is still being paged through
+    return run_batch_transfer(
+        cmd.cli_ctx, _collect_blobs_to_download(),
+        lambda blob_normed, connections, callback: _download_blob(
+            client, source_container_name, destination, blob_normed, blobs_to_download[blob_normed], connections,
+            callback),
+        max_connections=max_connections, journal=journal,
+        signature=lambda blob_normed: get_file_signature(os.path.join(destination, blob_normed)),
+        skipped_result=lambda blob_normed: blobs_to_download[blob_normed],
+        show_progress=progress_callback is not None)
 
 
 def storage_blob_upload_batch(cmd, client, source, destination, pattern=None,  # pylint: disable=too-many-locals
@@ -196,7 +283,7 @@ def storage_blob_upload_batch(cmd, client, source, destination, pattern=None,  #
                               content_settings=None, metadata=None, validate_content=False,
                               maxsize_condition=None, max_connections=2, lease_id=None, progress_callback=None,
                               if_modified_since=None, if_unmodified_since=None, if_match=None,
-                              if_none_match=None, timeout=None, dryrun=False):
+                              if_none_match=None, timeout=None, dryrun=False, skip_unchanged=False):
     def _create_return_result(blob_name, blob_content_settings, upload_result=None):
         blob_name = normalize_blob_file_path(destination_path, blob_name)
         return {
@@ -209,6 +296,14 @@ def storage_blob_upload_batch(cmd, client, source, destination, pattern=None,  #
     t_content_settings = cmd.get_models('blob.models#ContentSettings')
 
     results = []
+    source_files = source_files or []
+    if skip_unchanged:
+        total = len(source_files)
+        source_files = _filter_unchanged_files(client, destination_container_name, destination_path, source_files)
+        if len(source_files) < total:
+            logger.warning('skipping %s of %s files which are unchanged in the destination',
+                           total - len(source_files), total)
+
     if dryrun:
         logger.info('upload action: from %s to %s', source, destination)
         logger.info('    pattern %s', pattern)
@@ -216,28 +311,38 @@ def storage_blob_upload_batch(cmd, client, source, destination, pattern=None,  #
         logger.info('       type %s', blob_type)
         logger.info('      total %d', len(source_files))
         results = []
-        for src, dst in source_files or []:
+        for src, dst in source_files:
             results.append(_create_return_result(dst, guess_content_type(src, content_settings, t_content_settings)))
     else:
         @check_precondition_success
         def _upload_blob(*args, **kwargs):
             return upload_blob(*args, **kwargs)
 
-        for src, dst in source_files or []:
+        destinations = dict(source_files)
+
+        def _upload_file(src, connections, file_progress_callback):
             logger.warning('uploading %s', src)
-            guessed_content_settings = guess_content_type(src, content_settings, t_content_settings)
-
-            include, result = _upload_blob(cmd, client, destination_container_name,
-                                           normalize_blob_file_path(destination_path, dst), src,
-                                           blob_type=blob_type, content_settings=guessed_content_settings,
-                                           metadata=metadata, validate_content=validate_content,
-                                           maxsize_condition=maxsize_condition, max_connections=max_connections,
-                                           lease_id=lease_id, progress_callback=progress_callback,
-                                           if_modified_since=if_modified_since,
-                                           if_unmodified_since=if_unmodified_since, if_match=if_match,
-                                           if_none_match=if_none_match, timeout=timeout)
+            return _upload_blob(cmd, client, destination_container_name,
+                                normalize_blob_file_path(destination_path, destinations[src]), src,
+                                blob_type=blob_type,
+                                content_settings=guess_content_type(src, content_settings, t_content_settings),
+                                metadata=metadata, validate_content=validate_content,
+                                maxsize_condition=maxsize_condition, max_connections=connections,
+                                lease_id=lease_id, progress_callback=file_progress_callback,
+                                if_modified_since=if_modified_since,
+                                if_unmodified_since=if_unmodified_since, if_match=if_match,
+                                if_none_match=if_none_match, timeout=timeout)
+
+        journal = TransferJournal(cmd.cli_ctx, 'upload', client.account_name, destination_container_name,
+                                  destination_path, source, pattern)
+        uploads = run_batch_transfer(cmd.cli_ctx, [(src, os.path.getsize(src)) for src, _ in source_files],
+                                     _upload_file, max_connections=max_connections, journal=journal,
+                                     signature=get_file_signature, skipped_result=lambda src: (True, None),
+                                     show_progress=progress_callback is not None)
+        for (src, dst), (include, result) in zip(source_files, uploads):
             if include:
-                results.append(_create_return_result(dst, guessed_content_settings, result))
+                results.append(_create_return_result(
+                    dst, guess_content_type(src, content_settings, t_content_settings), result))
 
         num_failures = len(source_files) - len(results)
         if num_failures:
@@ -245,6 +350,36 @@ def storage_blob_upload_batch(cmd, client, source, destination, pattern=None,  #
     return results
 
 
+def _filter_unchanged_files(client, container_name, destination_path, source_files):
+    """
+    Leave out the files whose blob already exists with the same content. The container is listed once; files are
+    compared by size, then by Content-MD5 when the blob has one, otherwise by modification time.
+    """
+    import calendar
+    from azure.cli.command_modules.storage.transfer_util import compute_files_md5
+
+    prefix = normalize_blob_file_path(destination_path, '') + '/' if destination_path else None
+    existing = {}
+    for blob in client.list_blobs(container_name, prefix=prefix):
+        properties = blob.properties
+        existing[blob.name] = (properties.content_length, properties.content_settings.content_md5,
+                               properties.last_modified)
+
+    changed, to_hash = set(), {}
+    for src, dst in source_files:
+        blob = existing.get(normalize_blob_file_path(destination_path, dst))
+        if blob is None or blob[0] != os.path.getsize(src):
+            changed.add(src)
+        elif blob[1]:
+            to_hash[src] = blob[1]
+        elif blob[2] is None or os.path.getmtime(src) > calendar.timegm(blob[2].utctimetuple()):
+            changed.add(src)
+
+    local_md5 = compute_files_md5(list(to_hash))
+    changed.update(src for src, md5 in to_hash.items() if local_md5[src] != md5)
+    return [(src, dst) for src, dst in source_files if src in changed]
+
+
 def upload_blob(cmd, client, container_name, blob_name, file_path, blob_type=None, content_settings=None, metadata=None,
                 validate_content=False, maxsize_condition=None, max_connections=2, lease_id=None, tier=None,
                 if_modified_since=None, if_unmodified_since=None, if_match=None, if_none_match=None, timeout=None,
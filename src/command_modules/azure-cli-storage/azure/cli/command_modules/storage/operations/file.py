@@ -15,6 +15,7 @@ from azure.cli.command_modules.storage.util import (filter_none, collect_blobs,
                                                     create_short_lived_container_sas, create_short_lived_share_sas,
                                                     guess_content_type)
 from azure.cli.command_modules.storage.url_quote_util import encode_for_url, make_encoded_file_url_and_params
+from azure.cli.command_modules.storage.transfer_util import get_connection_budget, run_batch_transfer
 
 
 def create_share_url(client, share_name, unc=None, protocol=None):
@@ -66,18 +67,20 @@ def storage_file_upload_batch(cmd, client, destination, source, destination_path
                  'Type': guess_content_type(src, content_settings, settings_class).content_type} for src, dst in
                 source_files]
 
-    # TODO: Performance improvement
-    # 1. Upload files in parallel
-    def _upload_action(src, dst):
-        dst = normalize_blob_file_path(destination_path, dst)
+    destinations = dict((src, normalize_blob_file_path(destination_path, dst)) for src, dst in source_files)
+    # create the directory tree once, instead of creating the parents of every file before uploading it
+    _make_directory_tree_in_files_share(cmd.cli_ctx, client, destination,
+                                        set(os.path.dirname(dst) for dst in destinations.values()))
+
+    def _upload_action(src, connections, file_progress_callback):
+        dst = destinations[src]
         dir_name = os.path.dirname(dst)
         file_name = os.path.basename(dst)
 
-        _make_directory_in_files_share(client, destination, dir_name)
         create_file_args = {'share_name': destination, 'directory_name': dir_name, 'file_name': file_name,
-                            'local_file_path': src, 'progress_callback': progress_callback,
+                            'local_file_path': src, 'progress_callback': file_progress_callback,
                             'content_settings': guess_content_type(src, content_settings, settings_class),
-                            'metadata': metadata, 'max_connections': max_connections}
+                            'metadata': metadata, 'max_connections': connections}
 
         if cmd.supported_api_version(min_api='2016-05-31'):
             create_file_args['validate_content'] = validate_content
@@ -87,7 +90,8 @@ def storage_file_upload_batch(cmd, client, destination, source, destination_path
 
         return client.make_file_url(destination, dir_name, file_name)
 
-    return list(_upload_action(src, dst) for src, dst in source_files)
+    return run_batch_transfer(cmd.cli_ctx, [(src, os.path.getsize(src)) for src, _ in source_files], _upload_action,
+                              max_connections=max_connections, show_progress=progress_callback is not None)
 
 
 def storage_file_download_batch(cmd, client, source, destination, pattern=None, dryrun=False, validate_content=False,
@@ -116,13 +120,13 @@ def storage_file_download_batch(cmd, client, source, destination, pattern=None,
 
         return []
 
-    def _download_action(pair):
+    def _download_action(pair, connections, file_progress_callback):
         destination_dir = os.path.join(destination, pair[0])
         mkdir_p(destination_dir)
 
         get_file_args = {'share_name': source, 'directory_name': pair[0], 'file_name': pair[1],
-                         'file_path': os.path.join(destination, *pair), 'max_connections': max_connections,
-                         'progress_callback': progress_callback}
+                         'file_path': os.path.join(destination, *pair), 'max_connections': connections,
+                         'progress_callback': file_progress_callback}
 
         if cmd.supported_api_version(min_api='2016-05-31'):
             get_file_args['validate_content'] = validate_content
@@ -130,7 +134,9 @@ def storage_file_download_batch(cmd, client, source, destination, pattern=None,
         client.get_file_to_path(**get_file_args)
         return client.make_file_url(source, *pair)
 
-    return list(_download_action(f) for f in source_files)
+    # files are downloaded while the share is still being listed
+    return run_batch_transfer(cmd.cli_ctx, ((f, None) for f in source_files), _download_action,
+                              max_connections=max_connections, show_progress=progress_callback is not None)
 
 
 def storage_file_copy_batch(cmd, client, source_client, destination_share=None, destination_path=None,
@@ -236,8 +242,7 @@ def storage_file_delete_batch(cmd, client, source, pattern=None, dryrun=False, t
             logger.warning('  - %s/%s', f[0], f[1])
         return []
 
-    for f in source_files:
-        delete_action(f)
+    run_batch_transfer(cmd.cli_ctx, [(f, 0) for f in source_files], lambda f, *_: delete_action(f))
 
 
 def _create_file_and_directory_from_blob(file_service, blob_service, share, container, sas, blob_name,
@@ -302,17 +307,8 @@ def _make_directory_in_files_share(file_service, file_share, directory_path, exi
     """
     from azure.common import AzureHttpError
 
-    if not directory_path:
-        return
-
-    parents = [directory_path]
-    p = os.path.dirname(directory_path)
-    while p:
-        parents.append(p)
-        p = os.path.dirname(p)
-
-    for dir_name in reversed(parents):
-        if existing_dirs and (dir_name in existing_dirs):
+    for dir_name in reversed(_get_directory_and_parents(directory_path)):
+        if existing_dirs is not None and dir_name in existing_dirs:
             continue
 
         try:
@@ -321,5 +317,33 @@ def _make_directory_in_files_share(file_service, file_share, directory_path, exi
             from knack.util import CLIError
             raise CLIError('Failed to create directory {}'.format(dir_name))
 
-        if existing_dirs:
-            existing_dirs.add(directory_path)
+        if existing_dirs is not None:
+            existing_dirs.add(dir_name)
+
+
+def _make_directory_tree_in_files_share(cli_ctx, file_service, file_share, directory_paths, existing_dirs=None):
+    """
+    Create the given directories and all their parents. The tree is created breadth-first: the directories of each
+    level are created concurrently once the level above exists, and every directory is created only once.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    existing_dirs = existing_dirs if existing_dirs is not None else set()
+    levels = {}
+    for directory_path in directory_paths:
+        for depth, dir_name in enumerate(reversed(_get_directory_and_parents(directory_path))):
+            levels.setdefault(depth, set()).add(dir_name)
+
+    with ThreadPoolExecutor(max_workers=get_connection_budget(cli_ctx)) as executor:
+        for depth in sorted(levels):
+            list(executor.map(lambda dir_name: _make_directory_in_files_share(file_service, file_share, dir_name,
+                                                                              existing_dirs),
+                              sorted(levels[depth] - existing_dirs)))
+
+
+def _get_directory_and_parents(directory_path):
+    parents = []
+    while directory_path:
+        parents.append(directory_path)
+        directory_path = os.path.dirname(directory_path)
+    return parents
@@ -0,0 +1,134 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from azure.cli.command_modules.storage.account_cache_util import StorageAccountCache
+from azure.cli.command_modules.storage._validators import _query_account_key
+
+SUBSCRIPTION_ID = '00000000-0000-0000-0000-000000000000'
+
+
+class MockCLI(object):
+    def __init__(self, config_dir, ttl=300):
+        self.config = mock.MagicMock(config_dir=config_dir)
+        self.config.getint.return_value = ttl
+        self.cloud = mock.MagicMock()
+        self.cloud.name = 'AzureCloud'
+        self.data = {'subscription_id': SUBSCRIPTION_ID}
+
+
+class TestStorageAccountCache(unittest.TestCase):
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+
+    def test_account_cache_round_trip(self):
+        cache = StorageAccountCache(MockCLI(self.config_dir))
+        cache.set(SUBSCRIPTION_ID, 'myaccount', 'myrg')
+
+        self.assertEqual(StorageAccountCache(MockCLI(self.config_dir)).get(SUBSCRIPTION_ID, 'MyAccount'), 'myrg')
+        self.assertIsNone(cache.get('other subscription', 'myaccount'))
+
+        cache.remove(SUBSCRIPTION_ID, 'myaccount')
+        self.assertIsNone(cache.get(SUBSCRIPTION_ID, 'myaccount'))
+
+    def test_account_cache_expires(self):
+        cache = StorageAccountCache(MockCLI(self.config_dir, ttl=60))
+        with mock.patch('time.time', return_value=1000):
+            cache.set(SUBSCRIPTION_ID, 'myaccount', 'myrg')
+        with mock.patch('time.time', return_value=1059):
+            self.assertEqual(cache.get(SUBSCRIPTION_ID, 'myaccount'), 'myrg')
+        with mock.patch('time.time', return_value=1061):
+            self.assertIsNone(cache.get(SUBSCRIPTION_ID, 'myaccount'))
+
+        # a TTL of 0 disables the cache
+        StorageAccountCache(MockCLI(self.config_dir, ttl=0)).set(SUBSCRIPTION_ID, 'other', 'myrg')
+        self.assertIsNone(cache.get(SUBSCRIPTION_ID, 'other'))
+
+    def _mock_clients(self, get_client, resource_groups):
+        client = get_client.return_value
+        resources = [mock.MagicMock(id='/subscriptions/{}/resourceGroups/{}/providers/Microsoft.Storage/'
+                                       'storageAccounts/myaccount'.format(SUBSCRIPTION_ID, rg))
+                     for rg in resource_groups]
+        client.resources.list.side_effect = lambda **kwargs: iter(resources[:1])
+        client.storage_accounts.list_keys.return_value.keys = [mock.MagicMock(value='secretkey==')]
+        return client, resources
+
+    @mock.patch('azure.cli.command_modules.storage._validators.get_sdk', return_value=None)
+    @mock.patch('azure.cli.command_modules.storage._validators.get_mgmt_service_client')
+    def test_query_account_key_caches_resource_group(self, get_client, _):
+        cli = MockCLI(self.config_dir)
+        client, _ = self._mock_clients(get_client, ['myrg'])
+
+        self.assertEqual(_query_account_key(cli, 'myaccount'), 'secretkey==')
+        client.resources.list.assert_called_once_with(
+            filter="name eq 'myaccount' and resourceType eq 'Microsoft.Storage/storageAccounts'")
+        client.storage_accounts.list.assert_not_called()
+        client.storage_accounts.list_keys.assert_called_once_with('myrg', 'myaccount')
+        # keys aren't written to disk
+        with open(os.path.join(self.config_dir, 'storageAccounts.json')) as f:
+            self.assertNotIn('secretkey', f.read())
+
+        # the following commands query the key without looking the account up again
+        client.reset_mock()
+        self.assertEqual(_query_account_key(cli, 'myaccount'), 'secretkey==')
+        client.resources.list.assert_not_called()
+        client.storage_accounts.list_keys.assert_called_once_with('myrg', 'myaccount')
+
+    @mock.patch('azure.cli.command_modules.storage._validators.get_sdk', return_value=None)
+    @mock.patch('azure.cli.command_modules.storage._validators.get_mgmt_service_client')
+    def test_query_account_key_without_cache(self, get_client, _):
+        cli = MockCLI(self.config_dir, ttl=0)
+        client, _ = self._mock_clients(get_client, ['myrg'])
+
+        # the account is still looked up by name
+        self.assertEqual(_query_account_key(cli, 'myaccount'), 'secretkey==')
+        self.assertEqual(_query_account_key(cli, 'myaccount'), 'secretkey==')
+        self.assertEqual(client.resources.list.call_count, 2)
+        client.storage_accounts.list.assert_not_called()
+        self.assertFalse(os.path.exists(os.path.join(self.config_dir, 'storageAccounts.json')))
+
+    @mock.patch('azure.cli.command_modules.storage._validators.get_sdk', return_value=None)
+    @mock.patch('azure.cli.command_modules.storage._validators.get_mgmt_service_client')
+    def test_query_account_key_falls_back_to_listing_accounts(self, get_client, _):
+        cli = MockCLI(self.config_dir)
+        client, _ = self._mock_clients(get_client, [])
+        account = mock.MagicMock(id='/subscriptions/{}/resourceGroups/newrg/providers/Microsoft.Storage/'
+                                    'storageAccounts/myaccount'.format(SUBSCRIPTION_ID))
+        account.name = 'myaccount'
+        client.storage_accounts.list.return_value = iter([account])
+
+        # an account the resources API doesn't return yet is found in the list of accounts
+        self.assertEqual(_query_account_key(cli, 'myaccount'), 'secretkey==')
+        client.storage_accounts.list_keys.assert_called_once_with('newrg', 'myaccount')
+
+    @mock.patch('azure.cli.command_modules.storage._validators.get_sdk', return_value=None)
+    @mock.patch('azure.cli.command_modules.storage._validators.get_mgmt_service_client')
+    def test_query_account_key_in_other_resource_group(self, get_client, _):
+        from msrestazure.azure_exceptions import CloudError
+        cli = MockCLI(self.config_dir)
+        StorageAccountCache(cli).set(SUBSCRIPTION_ID, 'myaccount', 'oldrg')
+        client, _ = self._mock_clients(get_client, ['newrg'])
+        keys = client.storage_accounts.list_keys.return_value
+        client.storage_accounts.list_keys.side_effect = [CloudError(mock.MagicMock(status_code=404), 'not found'),
+                                                         keys]
+
+        # an account recreated in another resource group is looked up again
+        self.assertEqual(_query_account_key(cli, 'myaccount'), 'secretkey==')
+        self.assertEqual(client.storage_accounts.list_keys.call_args_list,
+                         [mock.call('oldrg', 'myaccount'), mock.call('newrg', 'myaccount')])
+        self.assertEqual(StorageAccountCache(cli).get(SUBSCRIPTION_ID, 'myaccount'), 'newrg')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,279 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import mock
+
+from azure.cli.command_modules.storage.operations.blob import (_filter_unchanged_files, _wait_for_blob_copies,
+                                                               storage_blob_download_batch)
+from azure.cli.command_modules.storage.operations.file import (_make_directory_in_files_share,
+                                                               _make_directory_tree_in_files_share)
+from azure.cli.command_modules.storage.transfer_util import (TransferJournal, TransferProgress, run_batch_transfer,
+                                                             compute_file_md5, SINGLE_CONNECTION_THRESHOLD)
+
+
+class MockCLI(object):
+    def __init__(self, config_dir, connection_budget=16):
+        self.config = mock.MagicMock(config_dir=config_dir)
+        self.config.getint.return_value = connection_budget
+        self.progress_controller = mock.MagicMock()
+
+    def get_progress_controller(self, det=False):  # pylint: disable=unused-argument
+        return self.progress_controller
+
+
+class TestStorageTransferUtil(unittest.TestCase):
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+
+    def test_run_batch_transfer_keeps_order_within_connection_budget(self):
+        cli = MockCLI(self.config_dir, connection_budget=4)
+        lock = threading.Lock()
+        in_use = [0, 0]  # current, peak
+
+        def _transfer(name, connections, callback):
+            with lock:
+                in_use[0] += connections
+                in_use[1] = max(in_use[1], in_use[0])
+            time.sleep(0.01 * (10 - int(name)))
+            with lock:
+                in_use[0] -= connections
+            return name
+
+        items = [(str(i), SINGLE_CONNECTION_THRESHOLD + 1 if i % 3 == 0 else 10) for i in range(10)]
+        results = run_batch_transfer(cli, items, _transfer, max_connections=3)
+        self.assertEqual(results, [str(i) for i in range(10)])
+        self.assertLessEqual(in_use[1], 4)
+        self.assertGreater(in_use[1], 1)
+
+    def test_run_batch_transfer_consumes_items_while_transferring(self):
+        cli = MockCLI(self.config_dir, connection_budget=2)
+        started = []
+
+        def _items():
+            for i in range(20):
+                # the queue ahead of the workers stays bounded while the listing is consumed
+                self.assertLessEqual(i - len(started), 4)
+                yield str(i), 10
+
+        def _transfer(name, connections, callback):
+            started.append(name)
+            time.sleep(0.001)
+            return name
+
+        self.assertEqual(run_batch_transfer(cli, _items(), _transfer, show_progress=True), [str(i) for i in range(20)])
+        cli.progress_controller.end.assert_called_once_with()
+
+    def test_run_batch_transfer_resumes_from_journal(self):
+        cli = MockCLI(self.config_dir)
+        signatures = {'a': [1, 1.0], 'b': [2, 2.0], 'c': [3, 3.0]}
+        failing, transferred = {'c'}, []
+
+        def _transfer(name, connections, callback):
+            if name in failing:
+                raise IOError('connection reset')
+            transferred.append(name)
+            return name
+
+        def _run():
+            journal = TransferJournal(cli, 'upload', 'account', 'container', None, '/src', None)
+            return run_batch_transfer(cli, [('a', 1), ('b', 2), ('c', 3)], _transfer, journal=journal,
+                                      signature=signatures.get, skipped_result=lambda name: 'skipped ' + name)
+
+        with self.assertRaises(IOError):
+            _run()
+        journal_path = TransferJournal(cli, 'upload', 'account', 'container', None, '/src', None).path
+        self.assertTrue(os.path.isfile(journal_path))
+
+        # files finished by the interrupted run are skipped unless they changed since
+        failing.clear()
+        transferred[:] = []
+        signatures['b'] = [5, 5.0]
+        self.assertEqual(_run(), ['skipped a', 'b', 'c'])
+        self.assertEqual(sorted(transferred), ['b', 'c'])
+        self.assertFalse(os.path.exists(journal_path))
+
+        # a different batch doesn't share the journal
+        self.assertNotEqual(TransferJournal(cli, 'upload', 'account', 'other', None, '/src', None).path,
+                            journal_path)
+
+    def test_transfer_progress_reports_throughput_and_eta(self):
+        cli = MockCLI(self.config_dir)
+        with mock.patch('timeit.default_timer', side_effect=[0, 1, 2]):
+            progress = TransferProgress(cli, total_files=2, total_bytes=2048, report_interval=0)
+            progress.callback('a')(512, 1024)
+            progress.complete('a', 1024)
+        cli.progress_controller.add.assert_any_call(message='0/2 files, 512.0 B/s, ETA 0:00:03', value=512,
+                                                    total_val=2048)
+        cli.progress_controller.add.assert_called_with(message='1/2 files, 512.0 B/s, ETA 0:00:02', value=1024,
+                                                       total_val=2048)
+
+    def test_filter_unchanged_files(self):
+        import datetime
+        from dateutil.tz import tzutc
+
+        def _write(name, content, mtime):
+            path = os.path.join(self.config_dir, name)
+            with open(path, 'w') as f:
+                f.write(content)
+            os.utime(path, (mtime, mtime))
+            return path, name
+
+        def _blob(name, content, md5=None, last_modified=None):
+            blob = mock.MagicMock()
+            blob.name = 'dir/' + name
+            blob.properties.content_length = len(content)
+            blob.properties.content_settings.content_md5 = md5
+            blob.properties.last_modified = last_modified
+            return blob
+
+        uploaded = datetime.datetime(2019, 1, 1, tzinfo=tzutc())
+        before, after = 1546300000, 1546400000  # shortly before and after the upload
+        files = [_write('same_md5', 'abc', after), _write('other_md5', 'abd', before),
+                 _write('resized', 'abcd', before), _write('old', 'abc', before),
+                 _write('touched', 'abc', after), _write('new', 'abc', before)]
+        client = mock.MagicMock()
+        md5 = 'kAFQmDzST7DWlj99KOF/cg=='
+        client.list_blobs.return_value = [
+            _blob('same_md5', 'abc', md5=md5), _blob('other_md5', 'abc', md5=md5), _blob('resized', 'abc'),
+            _blob('old', 'abc', last_modified=uploaded),
+            _blob('touched', 'abc', last_modified=uploaded)]
+        self.assertEqual(compute_file_md5(files[0][0]), md5)
+
+        result = _filter_unchanged_files(client, 'container', 'dir', files)
+        self.assertEqual([name for _, name in result], ['other_md5', 'resized', 'touched', 'new'])
+        client.list_blobs.assert_called_once_with('container', prefix='dir/')
+
+    @mock.patch('time.sleep')
+    def test_wait_for_blob_copies(self, sleep):
+        from knack.util import CLIError
+
+        def _blob(name, status, description=None):
+            blob = mock.MagicMock()
+            blob.name = name
+            blob.properties.copy.status = status
+            blob.properties.copy.status_description = description
+            return blob
+
+        cmd = mock.MagicMock()
+        cmd.cli_ctx = MockCLI(self.config_dir)
+        client = mock.MagicMock()
+        client.list_blobs.side_effect = [
+            [_blob('dir/a', 'pending'), _blob('dir/b', 'success'), _blob('dir/c', 'pending'),
+             _blob('dir/d', 'success')],
+            [_blob('dir/a', 'success'), _blob('dir/c', 'pending')],
+            [_blob('dir/c', 'failed', '500 InternalError')]]
+
+        with self.assertRaises(CLIError) as ex:
+            _wait_for_blob_copies(cmd, client, 'container', ['dir/a', 'dir/b', 'dir/c'])
+        self.assertIn('dir/c: failed 500 InternalError', str(ex.exception))
+
+        # each poll lists the blobs still pending at once, backing off between polls
+        prefixes = [call[1]['prefix'] for call in client.list_blobs.call_args_list]
+        self.assertEqual(prefixes, ['dir/', 'dir/', 'dir/c'])
+        self.assertEqual([call[0][0] for call in sleep.call_args_list], [1, 2])
+        cli_progress = cmd.cli_ctx.progress_controller
+        cli_progress.add.assert_called_with(message='Copying (3/3 completed)')
+        cli_progress.end.assert_called_once_with()
+
+        # a blob missing from the listing fails rather than stays pending, and the listing stops past the last blob
+        listed = []
+
+        def _list_blobs(container, prefix=None, include=None):
+            for blob in [_blob('dir/a', 'success'), _blob('dir/d', 'pending'), _blob('dir/e', 'pending')]:
+                listed.append(blob.name)
+                yield blob
+
+        client.list_blobs.side_effect = _list_blobs
+        with self.assertRaises(CLIError) as ex:
+            _wait_for_blob_copies(cmd, client, 'container', ['dir/a', 'dir/b'])
+        self.assertIn('1 of 2 copies did not succeed:\ndir/b: missing', str(ex.exception))
+        self.assertEqual(listed, ['dir/a', 'dir/d'])
+
+    @mock.patch('time.sleep')
+    def test_wait_for_blob_copies_times_out(self, sleep):
+        from knack.util import CLIError
+
+        blob = mock.MagicMock()
+        blob.name = 'dir/a'
+        blob.properties.copy.status = 'pending'
+        cmd = mock.MagicMock()
+        cmd.cli_ctx = MockCLI(self.config_dir)
+        client = mock.MagicMock()
+        client.list_blobs.side_effect = lambda *args, **kwargs: iter([blob])
+
+        with mock.patch('time.time', side_effect=[0, 1, 3, 7]):
+            with self.assertRaises(CLIError) as ex:
+                _wait_for_blob_copies(cmd, client, 'container', ['dir/a'], timeout=10)
+        self.assertIn('Timed out after 10 seconds waiting for 1 of 1 copies', str(ex.exception))
+        self.assertEqual([call[0][0] for call in sleep.call_args_list], [1, 2])
+        cmd.cli_ctx.progress_controller.stop.assert_called_once_with()
+
+    def test_download_batch_stops_at_colliding_download_path(self):
+        from knack.util import CLIError
+
+        destination = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, destination, True)
+        downloaded = []
+
+        def _get_blob_to_path(container, blob_name, file_path, **kwargs):
+            downloaded.append(blob_name)
+            blob = mock.MagicMock()
+            blob.name = blob_name
+            return blob
+
+        cmd = mock.MagicMock()
+        cmd.cli_ctx = MockCLI(self.config_dir, connection_budget=1)
+        client = mock.MagicMock(account_name='account')
+        client.get_blob_to_path.side_effect = _get_blob_to_path
+        listing = ['a/b', 'c', 'x/../a/b'] + ['d{}'.format(i) for i in range(20)]
+        with mock.patch('azure.cli.command_modules.storage.operations.blob.collect_blobs',
+                        return_value=iter(listing)):
+            with self.assertRaises(CLIError) as ex:
+                storage_blob_download_batch(cmd, client, 'container', destination, 'container')
+        self.assertIn('Multiple blobs with download path: `a/b`', str(ex.exception))
+        self.assertIn('stopped part-way', str(ex.exception))
+        self.assertIn(destination, str(ex.exception))
+        # downloads still queued are cancelled, and nothing listed after the collision is downloaded
+        self.assertIn('a/b', downloaded)
+        self.assertLessEqual(set(downloaded), {'a/b', 'c'})
+
+    def test_make_directory_in_files_share_remembers_parents(self):
+        client = mock.MagicMock()
+        existing_dirs = set()
+        _make_directory_in_files_share(client, 'share', 'a/b/c', existing_dirs)
+        _make_directory_in_files_share(client, 'share', 'a/b/d', existing_dirs)
+        created = [call[1]['directory_name'] for call in client.create_directory.call_args_list]
+        self.assertEqual(created, ['a', 'a/b', 'a/b/c', 'a/b/d'])
+        self.assertEqual(existing_dirs, {'a', 'a/b', 'a/b/c', 'a/b/d'})
+
+    def test_make_directory_tree_in_files_share(self):
+        lock = threading.Lock()
+        created = []
+
+        def _create_directory(share_name, directory_name, fail_on_exist):
+            with lock:
+                # parents are always created before their children
+                self.assertTrue(os.path.dirname(directory_name) in created + [''])
+                created.append(directory_name)
+
+        client = mock.MagicMock()
+        client.create_directory.side_effect = _create_directory
+        _make_directory_tree_in_files_share(MockCLI(self.config_dir, connection_budget=4), client, 'share',
+                                            ['a/b/c', 'a/b/d', 'a/e', 'f', 'a/b/c'])
+        self.assertEqual(sorted(created), ['a', 'a/b', 'a/b/c', 'a/b/d', 'a/e', 'f'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import types
+import unittest
+
+import mock
+
+from azure.cli.command_modules.storage.util import collect_blobs, glob_files_remotely
+
+
+class TestStorageUtil(unittest.TestCase):
+    def _blob_service(self, names):
+        blob_service = mock.MagicMock()
+        blobs = []
+        for name in names:
+            blob = mock.MagicMock()
+            blob.name = name
+            blobs.append(blob)
+        blob_service.list_blobs.side_effect = lambda container, prefix=None: iter(
+            [b for b in blobs if not prefix or b.name.startswith(prefix)])
+        return blob_service
+
+    def test_collect_blobs_sends_pattern_prefix(self):
+        blob_service = self._blob_service(['logs/2019/01/a.log', 'logs/2019/02/b.log', 'logs/2019/01/c.txt'])
+
+        blobs = collect_blobs(blob_service, 'container', 'logs/2019/01/*.log')
+        self.assertIsInstance(blobs, types.GeneratorType)
+        blob_service.list_blobs.assert_not_called()
+        self.assertEqual(list(blobs), ['logs/2019/01/a.log'])
+        blob_service.list_blobs.assert_called_once_with('container', prefix='logs/2019/01/')
+
+        for pattern, prefix in [(None, None), ('*', None), ('*.log', None), ('logs/20?9/*', 'logs/20'),
+                                ('logs/[0-9]*', 'logs/')]:
+            blob_service.list_blobs.reset_mock()
+            list(collect_blobs(blob_service, 'container', pattern))
+            blob_service.list_blobs.assert_called_once_with('container', prefix=prefix)
+
+    def test_collect_blobs_without_wildcards_checks_existence(self):
+        blob_service = self._blob_service([])
+        blob_service.exists.return_value = True
+        self.assertEqual(collect_blobs(blob_service, 'container', 'logs/a.log'), ['logs/a.log'])
+        blob_service.exists.assert_called_once_with('container', 'logs/a.log')
+        blob_service.list_blobs.assert_not_called()
+
+    @staticmethod
+    def _glob_files_remotely(pattern):
+        class _Directory(object):
+            def __init__(self, name):
+                self.name = name
+
+        class _File(_Directory):
+            pass
+
+        tree = {'': [_File('root.txt'), _Directory('logs'), _Directory('data')],
+                'logs': [_Directory('2019'), _Directory('2018'), _File('index.txt')],
+                'logs/2019': [_File('a.log'), _File('b.txt'), _Directory('01')],
+                'logs/2019/01': [_File('c.log')],
+                'logs/2018': [_File('d.log')],
+                'data': [_File('e.log')]}
+        cmd = mock.MagicMock()
+        cmd.get_models.return_value = (_Directory, _File)
+        cmd.cli_ctx.config.getint.return_value = 4
+        client = mock.MagicMock()
+        client.list_directories_and_files.side_effect = lambda share, directory: iter(tree[directory])
+
+        files = sorted(glob_files_remotely(cmd, client, 'share', pattern))
+        listed = sorted(call[0][1] for call in client.list_directories_and_files.call_args_list)
+        return files, listed
+
+    def test_glob_files_remotely_prunes_directories(self):
+        self.assertEqual(self._glob_files_remotely('logs/2019/*.log'),
+                         ([('logs/2019', 'a.log'), ('logs/2019/01', 'c.log')],
+                          ['', 'logs', 'logs/2019', 'logs/2019/01']))
+        self.assertEqual(self._glob_files_remotely('*.log'),
+                         ([('data', 'e.log'), ('logs/2018', 'd.log'), ('logs/2019', 'a.log'), ('logs/2019/01', 'c.log')],
+                          ['', 'data', 'logs', 'logs/2018', 'logs/2019', 'logs/2019/01']))
+        self.assertEqual(len(self._glob_files_remotely(None)[0]), 7)
+
+    def test_glob_files_remotely_on_windows(self):
+        import ntpath
+        with mock.patch('os.path', ntpath), mock.patch('os.sep', '\\'):
+            self.assertEqual(self._glob_files_remotely('logs/2019/*.log'),
+                             ([('logs/2019', 'a.log'), ('logs/2019/01', 'c.log')],
+                              ['', 'logs', 'logs/2019', 'logs/2019/01']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,289 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import os
+import threading
+import timeit
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CONNECTION_BUDGET = 16
+# larger transfers are split into ranges and use up to `max_connections` connections each
+SINGLE_CONNECTION_THRESHOLD = 64 * 1024 * 1024
+JOURNAL_FOLDER_NAME = 'batchTransfers'
+
+
+def get_connection_budget(cli_ctx):
+    """Total number of connections a batch command may have open at once, across all files."""
+    try:
+        budget = cli_ctx.config.getint('storage', 'batch_connections', fallback=DEFAULT_CONNECTION_BUDGET)
+    except ValueError:
+        logger.warning("Invalid value for 'storage.batch_connections'. Using %s.", DEFAULT_CONNECTION_BUDGET)
+        budget = DEFAULT_CONNECTION_BUDGET
+    return max(1, budget)
+
+
+def get_file_signature(path):
+    """Size and modification time of a local file, or None if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime]
+
+
+def compute_file_md5(path, chunk_size=4 * 1024 * 1024):
+    """Base64 encoded MD5 of a local file, as in the Content-MD5 property of a blob."""
+    import base64
+    import hashlib
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+    return base64.b64encode(md5.digest()).decode('utf-8')
+
+
+def compute_files_md5(paths):
+    """Hash several local files on a thread pool. Returns a dict of path to MD5."""
+    from concurrent.futures import ThreadPoolExecutor
+    from multiprocessing import cpu_count
+    if not paths:
+        return {}
+    # hashlib releases the GIL while hashing, so threads keep the disks and cores busy
+    with ThreadPoolExecutor(max_workers=min(len(paths), cpu_count() * 2)) as executor:
+        return dict(zip(paths, executor.map(compute_file_md5, paths)))
+
+
+class TransferJournal(object):
+    """
+    Records the files a batch has finished transferring, so running the same batch again after an interruption skips
+    them. The journal is keyed by the arguments identifying the batch and removed once the batch completes.
+    """
+
+    def __init__(self, cli_ctx, *batch_key):
+        import hashlib
+        digest = hashlib.sha256(json.dumps(batch_key, sort_keys=True).encode('utf-8')).hexdigest()
+        self.path = os.path.join(cli_ctx.config.config_dir, JOURNAL_FOLDER_NAME, '{}.journal'.format(digest))
+        self._lock = threading.Lock()
+        self._file = None
+        self._entries = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry['name']] = entry['signature']
+                    except (ValueError, KeyError, TypeError):
+                        # a write cut short by the interruption
+                        continue
+        except (IOError, OSError):
+            pass
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_done(self, name, signature):
+        return signature is not None and self._entries.get(name) == signature
+
+    def record(self, name, signature):
+        with self._lock:
+            if self._file is None:
+                from azure.cli.command_modules.storage.util import mkdir_p
+                mkdir_p(os.path.dirname(self.path))
+                self._file = open(self.path, 'a')
+            self._file.write(json.dumps({'name': name, 'signature': signature}) + '\n')
+            self._file.flush()
+            self._entries[name] = signature
+
+    def close(self, completed):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if completed and os.path.isfile(self.path):
+                os.remove(self.path)
+
+
+class _ConnectionBudget(object):
+
+    def __init__(self, size):
+        self.size = size
+        self._available = size
+        self._condition = threading.Condition()
+
+    def acquire(self, count):
+        count = max(1, min(count, self.size))
+        with self._condition:
+            while self._available < count:
+                self._condition.wait()
+            self._available -= count
+        return count
+
+    def release(self, count):
+        with self._condition:
+            self._available += count
+            self._condition.notify_all()
+
+
+class TransferProgress(object):
+    """Aggregates the progress of concurrent transfers and reports throughput and ETA to the progress controller."""
+
+    def __init__(self, cli_ctx, total_files, total_bytes=None, report_interval=0.5):
+        self.cli_ctx = cli_ctx
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.report_interval = report_interval
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._done_files = 0
+        self._done_bytes = 0
+        self._start_time = timeit.default_timer()
+        self._last_report = None
+
+    def add_file(self, size=None):
+        """Count another file into the totals, for batches whose files are found while the transfers run."""
+        with self._lock:
+            self.total_files += 1
+            self.total_bytes = self.total_bytes + size if None not in (size, self.total_bytes) else None
+
+    def callback(self, name):
+        def _update_progress(current, total):  # pylint: disable=unused-argument
+            with self._lock:
+                self._in_flight[name] = current
+            self._report()
+        return _update_progress
+
+    def complete(self, name, size=None):
+        with self._lock:
+            transferred = self._in_flight.pop(name, 0)
+            self._done_files += 1
+            self._done_bytes += size if size is not None else transferred
+        self._report()
+
+    def end(self):
+        self._report(force=True)
+        self.cli_ctx.get_progress_controller(det=True).end()
+
+    def _report(self, force=False):
+        now = timeit.default_timer()
+        with self._lock:
+            if not force and self._last_report is not None and now - self._last_report < self.report_interval:
+                return
+            self._last_report = now
+            transferred = self._done_bytes + sum(self._in_flight.values())
+            done_files = self._done_files
+        elapsed = max(now - self._start_time, 1e-6)
+        rate = transferred / elapsed
+
+        if self.total_bytes:
+            value, total = min(transferred, self.total_bytes), self.total_bytes
+            remaining = (total - value) / rate if rate else None
+        else:
+            value, total = done_files, self.total_files
+            remaining = (total - value) * elapsed / value if value else None
+
+        message = '{}/{} files, {}/s, ETA {}'.format(done_files, self.total_files, _format_size(rate),
+                                                     _format_duration(remaining))
+        self.cli_ctx.get_progress_controller(det=True).add(message=message, value=value, total_val=total)
+
+
+def _format_size(num_bytes):
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if num_bytes < 1024:
+            return '{:.1f} {}'.format(num_bytes, unit)
+        num_bytes /= 1024.0
+    return '{:.1f} TiB'.format(num_bytes)
+
+
+def _format_duration(seconds):
+    if seconds is None:
+        return '--:--:--'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{}:{:02d}:{:02d}'.format(hours, minutes, seconds)
+
+
+def run_batch_transfer(cli_ctx, items, transfer, max_connections=2, journal=None, signature=None,
+                       skipped_result=None, show_progress=False):
+    """
+    Transfer a batch of files concurrently and return the results in the order of `items`.
+
+    :param items: iterable of (name, size) tuples. `size` may be None when it isn't known up front. Transfers start
+                  as items arrive, so a generator lets listing and transferring overlap.
+    :param transfer: callable(name, connections, progress_callback) performing one transfer.
+    :param max_connections: connections a single large transfer may use.
+    :param journal: optional TransferJournal used to skip files finished by an interrupted run of the same batch.
+    :param signature: callable(name) returning the signature of the local file of a transfer, recorded in the journal.
+    :param skipped_result: callable(name) returning the result of a transfer skipped because of the journal.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    resume = journal is not None and len(journal) > 0
+    budget = _ConnectionBudget(get_connection_budget(cli_ctx))
+    progress = TransferProgress(cli_ctx, 0, 0) if show_progress else None
+    # bounds the transfers queued ahead of the workers, so a long listing isn't held in memory
+    queue_slots = threading.BoundedSemaphore(budget.size * 2)
+    failed = threading.Event()
+    skipped = []
+
+    def _run(name, size):
+        try:
+            if resume and journal.is_done(name, signature(name)):
+                skipped.append(name)
+                result = skipped_result(name)
+            else:
+                start_time = timeit.default_timer()
+                wanted = 1 if size is not None and size <= SINGLE_CONNECTION_THRESHOLD else max_connections
+                connections = budget.acquire(wanted)
+                try:
+                    result = transfer(name, connections, progress.callback(name) if progress else None)
+                finally:
+                    budget.release(connections)
+                logger.debug("Transferred '%s' in %.3f seconds.", name, timeit.default_timer() - start_time)
+                if journal is not None:
+                    journal.record(name, signature(name))
+            if progress:
+                progress.complete(name, size)
+            return result
+        except BaseException:
+            failed.set()
+            raise
+        finally:
+            queue_slots.release()
+
+    tasks, results = [], []
+    completed = False
+    try:
+        with ThreadPoolExecutor(max_workers=budget.size) as executor:
+            try:
+                for name, size in items:
+                    queue_slots.acquire()
+                    if failed.is_set():
+                        queue_slots.release()
+                        break
+                    if progress:
+                        progress.add_file(size)
+                    tasks.append(executor.submit(_run, name, size))
+                for task in tasks:
+                    results.append(task.result())
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                raise
+        completed = True
+    finally:
+        if skipped:
+            logger.warning('Resumed an interrupted batch: skipped %s files already transferred.', len(skipped))
+        if journal is not None:
+            journal.close(completed)
+            if not completed:
+                logger.warning('Batch interrupted after %s files. Run the same command again to resume.',
+                               len(journal))
+        if progress and completed:
+            progress.end()
+    return results
@@ -5,11 +5,14 @@
 
 
 import os
+import posixpath
 
 
 def collect_blobs(blob_service, container, pattern=None):
     """
     List the blobs in the given blob container, filter the blob by comparing their path to the given pattern.
+    Blob names are yielded as listing pages arrive, and the literal part of the pattern before its first wildcard is
+    sent to the service as the listing prefix.
     """
     if not blob_service:
         raise ValueError('missing parameter blob_service')
@@ -20,17 +23,18 @@ def collect_blobs(blob_service, container, pattern=None):
     if not _pattern_has_wildcards(pattern):
         return [pattern] if blob_service.exists(container, pattern) else []
 
-    results = []
-    for blob in blob_service.list_blobs(container):
+    return _list_matching_blobs(blob_service, container, pattern)
+
+
+def _list_matching_blobs(blob_service, container, pattern):
+    for blob in blob_service.list_blobs(container, prefix=_get_pattern_prefix(pattern)):
         try:
             blob_name = blob.name.encode('utf-8') if isinstance(blob.name, unicode) else blob.name
         except NameError:
             blob_name = blob.name
 
         if not pattern or _match_path(blob_name, pattern):
-            results.append(blob_name)
-
-    return results
+            yield blob_name
 
 
 def collect_files(cmd, file_service, share, pattern=None):
@@ -82,19 +86,42 @@ def glob_files_locally(folder_path, pattern):
 
 
 def glob_files_remotely(cmd, client, share_name, pattern):
-    """glob the files in remote file share based on the given pattern"""
-    from collections import deque
+    """
+    glob the files in remote file share based on the given pattern. Directories are listed concurrently and the files
+    are yielded as they are found. Directories which cannot contain a match of the pattern's literal prefix are skipped.
+    """
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+    from azure.cli.command_modules.storage.transfer_util import get_connection_budget
     t_dir, t_file = cmd.get_models('file.models#Directory', 'file.models#File')
+    prefix = _get_pattern_prefix(pattern)
 
-    queue = deque([""])
-    while queue:
-        current_dir = queue.pop()
-        for f in client.list_directories_and_files(share_name, current_dir):
-            if isinstance(f, t_file):
-                if not pattern or _match_path(os.path.join(current_dir, f.name), pattern):
-                    yield current_dir, f.name
-            elif isinstance(f, t_dir):
-                queue.appendleft(os.path.join(current_dir, f.name))
+    def _list_directory(current_dir):
+        return current_dir, list(client.list_directories_and_files(share_name, current_dir))
+
+    with ThreadPoolExecutor(max_workers=get_connection_budget(cmd.cli_ctx)) as executor:
+        pending = {executor.submit(_list_directory, "")}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    current_dir, entries = future.result()
+                    for f in entries:
+                        # share paths are '/' separated whatever the local platform
+                        path = posixpath.join(current_dir, f.name)
+                        if isinstance(f, t_file):
+                            if not pattern or _match_path(path, pattern):
+                                yield current_dir, f.name
+                        elif isinstance(f, t_dir) and _may_contain_match(path, prefix):
+                            pending.add(executor.submit(_list_directory, path))
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _may_contain_match(directory, prefix):
+    """Whether paths under the directory can start with the given literal prefix of a pattern."""
+    directory = posixpath.join(directory, '')
+    return not prefix or prefix.startswith(directory) or directory.startswith(prefix)
 
 
 def create_short_lived_blob_sas(cmd, account_name, account_key, container, blob):
@@ -167,6 +194,13 @@ def _pattern_has_wildcards(p):
     return not p or p.find('*') != -1 or p.find('?') != -1 or p.find('[') != -1
 
 
+def _get_pattern_prefix(pattern):
+    """The literal start of a glob pattern, before its first wildcard, or None if there isn't one."""
+    import re
+    prefix = re.split(r'[*?\[]', pattern, 1)[0] if pattern else None
+    return prefix or None
+
+
 def _match_path(path, pattern):
     from fnmatch import fnmatch
     return fnmatch(path, pattern)